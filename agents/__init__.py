@@ -1,52 +1,302 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from collections import deque
+import asyncio
+import time
 import autogen
-from openai import OpenAI
+from openai import AsyncOpenAI, APIStatusError
 import os
 from dotenv import load_dotenv
-import streamlit as st
+from services.completion_cache import CompletionCache, refresh_cache
+from services.openai_client import get_async_client, run_async
+from services.console import AgentConsole, current_console
+from services.rate_limiter import RateLimiter, LimiterTimeout, is_retryable
+from services.metrics import Metrics, current_stage
+from services.model_router import ModelRouter, Route, should_fall_back, fallback_reason
+
+try:
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # headless installs
+    st = get_script_run_ctx = None
 
 load_dotenv()
 
+# Paces every agent's requests against the account's rate limits
+rate_limiter = RateLimiter.from_env()
+
+# Fallback console for agents used outside Streamlit without a console set
+default_console = AgentConsole()
+
+# Shared by every agent; None unless COMPLETION_CACHE is "on" or "replay"
+completion_cache = CompletionCache.from_env()
+
+# Latency, token, cost and retry counters for every completion call
+metrics = Metrics()
+
+# Which model (and fallbacks) each agent uses at each pipeline stage
+model_router = ModelRouter.from_env()
+
+class CompletionStream:
+    """Collects streamed completion chunks and mirrors them into the agent console"""
+
+    def __init__(self, agent: "BaseAgent", update_interval: float = 0.25):
+        self.agent = agent
+        self.update_interval = update_interval
+        self.parts = []
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.usage = None
+        self._index = None
+        self._last_update = 0.0
+
+    def add(self, chunk):
+        """Append one chat.completion.chunk and refresh the console line"""
+        # With include_usage the last chunk carries the usage and no choices
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return
+        text = chunk.choices[0].delta.content
+        if not text:
+            return
+        self.parts.append(text)
+
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+            self._index = self.agent._console_append(self.agent._format_log(text, "receive"))
+        elif now - self._last_update >= self.update_interval:
+            self.agent._console_replace(self._index, self.agent._format_log("".join(self.parts), "receive"))
+        else:
+            return
+        self._last_update = now
+
+    def finish(self) -> str:
+        """Return the assembled completion and write its final console line"""
+        content = "".join(self.parts)
+        log_text = self.agent._format_log(content, "receive")
+        self.agent._echo(log_text)
+        if self._index is None:
+            self.agent._console_append(log_text)
+        else:
+            self.agent._console_replace(self._index, log_text, final=True)
+        self.agent._record_latency(self.started, self.first_token_at)
+        return content
+
 class BaseAgent:
     def __init__(self, name: str, role: str):
         self.name = name
         self.role = role
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.router = model_router
+        self.cache = completion_cache
+        self.limiter = rate_limiter
+        # Stream tokens into the console as they arrive (STREAM_COMPLETIONS=0 to disable)
+        self.stream = os.getenv("STREAM_COMPLETIONS", "1").lower() not in ("0", "false", "off")
+        # Recent per-call timings: time to first token and total latency in seconds
+        self.latencies = deque(maxlen=100)
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Async client shared by all agents on the running event loop"""
+        return get_async_client()
         
+    def _format_log(self, message: str, message_type: str) -> str:
+        prefix = "🗣️" if message_type == "send" else "📩"
+        return f"{prefix} {self.name} ({self.role}): {message}"
+
+    @staticmethod
+    def console() -> AgentConsole:
+        """The console of the current pipeline, Streamlit session or process"""
+        console = current_console.get()
+        if console is not None:
+            return console
+        if get_script_run_ctx is not None and get_script_run_ctx() is not None:
+            if "console" not in st.session_state:
+                st.session_state["console"] = AgentConsole()
+            return st.session_state["console"]
+        return default_console
+
+    def _echo(self, text: str):
+        """Print to stdout unless the current console is quiet"""
+        if self.console().echo:
+            print(text)
+
+    def _console_append(self, log_text: str) -> int:
+        """Add a line to the agent console, returning its id"""
+        return self.console().append(log_text)
+
+    def _console_replace(self, message_id: int, log_text: str, final: bool = False):
+        """Rewrite a console line in place, e.g. while a response streams in"""
+        self.console().replace(message_id, log_text, final)
+
     def log_message(self, message: str, message_type: str = "send"):
         """Log a message from this agent"""
-        prefix = "🗣️" if message_type == "send" else "📩"
-        log_text = f"{prefix} {self.name} ({self.role}): {message}"
+        log_text = self._format_log(message, message_type)
         
         # Print to console
-        print(log_text)
+        self._echo(log_text)
         
-        # Add to Streamlit session state
-        if "message_history" not in st.session_state:
-            st.session_state["message_history"] = []
-        st.session_state["message_history"].append(log_text)
-        
-        # Update the UI immediately if update function exists
-        if "update_terminal" in st.session_state:
-            st.session_state["update_terminal"]()
+        # Add to the agent console
+        self._console_append(log_text)
+
+    def _record_latency(self, started: float, first_token_at: Optional[float] = None):
+        """Keep time-to-first-token and total latency for the last call"""
+        total = time.perf_counter() - started
+        ttft = first_token_at - started if first_token_at is not None else None
+        self.latencies.append({"time_to_first_token": ttft, "total": total})
+        first = f"first token {ttft:.2f}s, " if ttft is not None else ""
+        self._echo(f"⏱️ {self.name}: {first}total {total:.2f}s")
         
-    def get_completion(self, messages: list) -> str:
-        """Get completion from OpenAI."""
-        # Log the prompt being sent
+    def _route(self) -> Route:
+        """Model chain and temperature for this agent at the current stage"""
+        return self.router.route(self.name, current_stage.get())
+
+    def _cached_completion(self, route: Route, messages: list, response_format: Optional[dict] = None):
+        """Look up a completion in the cache, returning (key, content)"""
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(route.model, messages, route.temperature, response_format)
+        if refresh_cache.get() and self.cache.mode != "replay":
+            # Look nothing up, but still store the new reply
+            return key, None
+        content = self.cache.get(key)
+        if content is not None:
+            self.log_message(content, "receive")
+        return key, content
+
+    def _request_options(self, model: str, temperature: float, messages: list, response_format: Optional[dict] = None) -> dict:
+        """Keyword arguments for chat.completions.create"""
+        options = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature
+        }
+        if response_format is not None:
+            options["response_format"] = response_format
+        return options
+
+    def _record_call(self, started: float, route: Route, model: str, usage, retries: int, outcome: str, fallbacks: Optional[list] = None):
+        """Add one get_completion call and its routing decision to the metrics and the current run"""
+        metrics.record_call(
+            self.name, model, time.perf_counter() - started, usage, retries, outcome,
+            route={"rule": route.rule, "requested_model": route.model, "fallbacks": fallbacks or []}
+        )
+
+    async def _aget_response(self, model: str, temperature: float, messages: list, response_format: Optional[dict] = None):
+        """Make one request, returning the content, the response headers and the usage"""
+        options = self._request_options(model, temperature, messages, response_format)
+        completions = self.async_client.chat.completions.with_raw_response
+        if self.stream:
+            collector = CompletionStream(self)
+            raw = await completions.create(
+                **options, stream=True, stream_options={"include_usage": True}, timeout=self.limiter.timeout
+            )
+            async for chunk in raw.parse():
+                collector.add(chunk)
+            content = collector.finish()
+            usage = collector.usage
+        else:
+            started = time.perf_counter()
+            raw = await completions.create(**options, timeout=self.limiter.timeout)
+            response = raw.parse()
+            content = response.choices[0].message.content
+            usage = response.usage
+            self._record_latency(started)
+            # Log the response received
+            self.log_message(content, "receive")
+        return content, raw.headers, usage
+
+    def _retry_delay(self, error: Exception, attempt: int, deadline: float, model: str, fallback: Optional[str] = None) -> Optional[float]:
+        """The wait before retrying a failed attempt, or None to give up"""
+        headers = error.response.headers if isinstance(error, APIStatusError) else None
+        if not is_retryable(error) or attempt >= self.limiter.max_retries:
+            return None
+        if fallback is not None:
+            # The next model has its own limits, so there is nothing to wait for
+            self.log_message(f"{type(error).__name__} on {model}: falling back to {fallback} (attempt {attempt + 2})")
+            return 0.0
+        delay = self.limiter.backoff(attempt, headers)
+        if time.monotonic() + delay > deadline:
+            return None
+        self.log_message(f"{type(error).__name__}: retrying in {delay:.1f}s (attempt {attempt + 2})")
+        return delay
+
+    def _next_model(self, models: List[str], model: str, error: Exception) -> Optional[str]:
+        """The model to fall back to after this error, if any"""
+        index = models.index(model)
+        if should_fall_back(error) and index + 1 < len(models):
+            return models[index + 1]
+        return None
+
+    def get_completion(self, messages: list, response_format: Optional[dict] = None) -> str:
+        """Get completion from OpenAI (blocking wrapper around aget_completion)."""
+        return run_async(self.aget_completion(messages, response_format))
+
+    async def aget_completion(self, messages: list, response_format: Optional[dict] = None) -> str:
+        """Get completion from OpenAI without blocking the event loop."""
+        # Log the prompt being sent and show it before waiting on the API
         self.log_message(messages[-1]["content"], "send")
+        self.console().flush()
         
-        response = self.client.chat.completions.create(
-            model="gpt-4-1106-preview",
-            messages=messages,
-            temperature=0.7
-        )
+        started = time.perf_counter()
+        route = self._route()
+        key, cached = self._cached_completion(route, messages, response_format)
+        if cached is not None:
+            self._record_call(started, route, route.model, None, 0, "cached")
+            return cached
         
-        content = response.choices[0].message.content
-        # Log the response received
-        self.log_message(content, "receive")
+        tokens = self.limiter.estimate_tokens(messages)
+        deadline = time.monotonic() + self.limiter.deadline
+        # Start on a model that is not paused by a recent rate limit
+        models = self.router.order(route.models, self.limiter.pause_remaining)
+        model = models[0]
+        fallbacks = []
+        attempt = 0
+        while True:
+            try:
+                await self.limiter.aacquire(tokens, model, deadline)
+            except LimiterTimeout:
+                self._record_call(started, route, model, None, attempt, "error", fallbacks)
+                raise
+            headers = error = None
+            completed = False
+            try:
+                # The deadline also covers the time spent reading a stream
+                content, headers, usage = await asyncio.wait_for(
+                    self._aget_response(model, route.temperature, messages, response_format),
+                    self.limiter.timeout
+                )
+                completed = True
+            except Exception as e:
+                error = e
+                headers = e.response.headers if isinstance(e, APIStatusError) else None
+                completed = True
+            finally:
+                # Exactly one release per acquire, including when the task is
+                # cancelled mid-request (CancelledError is not an Exception)
+                self.limiter.release(headers, error, model, completed)
+            if error is None:
+                break
+            fallback = self._next_model(models, model, error)
+            delay = self._retry_delay(error, attempt, deadline, model, fallback)
+            if delay is None:
+                self._record_call(started, route, model, None, attempt, "error", fallbacks)
+                raise error
+            if fallback is not None:
+                fallbacks.append({"from": model, "to": fallback, "reason": fallback_reason(error)})
+                model = fallback
+            await asyncio.sleep(delay)
+            attempt += 1
         
+        self._record_call(started, route, model, usage, attempt, "ok", fallbacks)
+        if key is not None:
+            self.cache.set(key, content, model)
         return content
 
     def execute(self, *args, **kwargs):
+        """To be implemented by child classes"""
+        raise NotImplementedError
+
+    async def aexecute(self, *args, **kwargs):
         """To be implemented by child classes"""
         raise NotImplementedError 
\ No newline at end of file
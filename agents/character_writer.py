@@ -1,12 +1,13 @@
 from . import BaseAgent
+from services.openai_client import run_async
 from typing import Dict, Any
 
 class CharacterWriter(BaseAgent):
     def __init__(self):
         super().__init__(name="CharacterWriter", role="Character Developer")
         
-    def execute(self, story_idea: str, creative_direction: str) -> str:
-        """Generate character details based on story idea and creative direction"""
+    def build_messages(self, story_idea: str, creative_direction: str) -> list:
+        """Build the messages to generate character details based on story idea and creative direction"""
         messages = [
             {
                 "role": "system",
@@ -35,4 +36,12 @@ class CharacterWriter(BaseAgent):
             }
         ]
         
-        return self.get_completion(messages) 
\ No newline at end of file
+        return messages
+
+    def execute(self, story_idea: str, creative_direction: str) -> str:
+        """Generate character details (blocking wrapper around aexecute)"""
+        return run_async(self.aexecute(story_idea, creative_direction))
+
+    async def aexecute(self, story_idea: str, creative_direction: str) -> str:
+        """Generate character details based on story idea and creative direction"""
+        return await self.aget_completion(self.build_messages(story_idea, creative_direction))
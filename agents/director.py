@@ -1,10 +1,50 @@
 from . import BaseAgent
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, Awaitable, Callable
+from functools import partial
+import asyncio
+import json
 import os
 from pathlib import Path
+from services.checkpoint import PipelineCheckpoint
+from services.completion_cache import refresh_cache
+from services.data_manager import DataManager, atomic_write
+from services.story_context import SceneContextBuilder
+from services.scene_outline import parse_scene_outline, format_scene_outline
+from services.metrics import RunMetrics, current_run, current_stage
+from services.screenplay_assembler import ScreenplayAssembler, make_title
+from services.duration_budget import plan_scene_durations, plan_fill, accept_fill, MIN_RUNTIME_RATIO
+from services.scene_timing import parse_timestamp
+from services.stage_graph import StageGraph
+from services.openai_client import run_async
+
+class StoryDraft:
+    """The outline, context and package shared by the scene tasks of one run"""
+
+    def __init__(self, outline: List[dict], budgets: List[int], context: SceneContextBuilder, assembler: ScreenplayAssembler):
+        self.outline = outline
+        self.scenes = [format_scene_outline(scene) for scene in outline]
+        self.budgets = budgets
+        self.context = context
+        self.assembler = assembler
+        self.timestamps: Dict[int, str] = {}
+        self.image_prompts: Dict[int, str] = {}
+        self.total_seconds = 0
+
+    @property
+    def scene_count(self) -> int:
+        return len(self.timestamps)
+
+    def add_scene(self, i: int, scene_file: Path, timestamp: str, outline: Optional[dict] = None):
+        self.timestamps[i] = timestamp
+        self.total_seconds += parse_timestamp(timestamp)
+        self.assembler.add_scene(i, scene_file, timestamp, outline)
+
+    def add_prompts(self, prompts: Dict[int, str]):
+        self.image_prompts.update(prompts)
+        self.assembler.add_prompts(prompts)
 
 class Director(BaseAgent):
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         super().__init__(name="Director", role="Creative Director and Coordinator")
         self.character_writer = None
         self.plot_writer = None
@@ -12,19 +52,18 @@ class Director(BaseAgent):
         self.time_stamper = None
         self.image_prompter = None
         self.screenwriter = None
-        
-    def execute(self, story_idea: str, length_minutes: int) -> str:
-        """Coordinate the screenplay creation process"""
-        # Create scenes directory if it doesn't exist
-        scenes_dir = Path("data/current/scenes")
-        scenes_dir.mkdir(parents=True, exist_ok=True)
-        
-        # First, establish creative direction
-        self.log_message("Starting creative direction phase...")
-        direction_messages = [
+        # Upper bound on agent tasks (scene writing, LLM timing, image prompts) running at once
+        self.max_workers = max_workers or int(os.getenv("SCENE_WORKERS", "4"))
+        # Caps on topping up a short runtime: rounds, and extra scenes per round
+        self.max_fill_rounds = int(os.getenv("FILL_ROUNDS", "2"))
+        self.max_fill_scenes = int(os.getenv("FILL_SCENES", "6"))
+
+    def direction_messages(self, story_idea: str, length_minutes: int) -> list:
+        """Build the messages to establish the creative direction"""
+        return [
             {
-                "role": "system", 
-                "content": f"""You are a creative film director. Provide creative direction for this story. 
+                "role": "system",
+                "content": f"""You are a creative film director. Provide creative direction for this story.
                 Include your vision for:
                 - Visual style and tone
                 - Key themes to emphasize
@@ -32,120 +71,458 @@ class Director(BaseAgent):
                 - Cinematographic elements
                 - Pacing and rhythm
                 - Approximate scene count (considering length)
-                
-                For a {length_minutes} minute film, we need approximately {length_minutes * 2} distinct scenes 
+
+                For a {length_minutes} minute film, we need approximately {length_minutes * 2} distinct scenes
                 to maintain proper pacing (roughly 30 seconds per scene on average).
-                
+
                 Format your response in clear sections with headers."""
             },
             {
-                "role": "user", 
+                "role": "user",
                 "content": f"Story idea: {story_idea}\nDesired length: {length_minutes} minutes\n\nProvide detailed creative direction for this film."
             }
         ]
-        
-        creative_direction = self.get_completion(direction_messages)
-        self.log_message("Creative direction established. Moving to character development...")
-
-        # Get character details
-        characters = self.character_writer.execute(story_idea, creative_direction)
-        self.log_message("Characters developed. Moving to plot development...")
-
-        # Get plot structure
-        plot = self.plot_writer.execute(story_idea, characters, creative_direction)
-        self.log_message("Plot structure created. Moving to scene breakdown...")
-
-        # Get scene outlines
-        scene_outlines = self.scene_descriptor.execute(plot, characters, creative_direction)
-        self.log_message("Scene outlines created. Writing detailed scenes...")
-
-        # Write each scene in detail and get timestamps
-        scene_files = []
-        timestamps = {}
-        image_prompts = {}
-        
-        # Split scene outlines into individual scenes
-        scenes = [s.strip() for s in scene_outlines.split('Scene') if s.strip()]
-        
-        for i, scene_outline in enumerate(scenes, 1):
-            self.log_message(f"Writing detailed scene {i}...")
-            
-            # Get detailed scene from screenwriter
-            detailed_scene = self.screenwriter.execute_scene(
-                scene_outline,
-                characters,
-                creative_direction
-            )
-            
-            # Save scene to file
-            scene_file = scenes_dir / f"scene_{i:02d}.txt"
-            with open(scene_file, 'w', encoding='utf-8') as f:
-                f.write(detailed_scene)
-            scene_files.append(scene_file)
-            
-            # Get timestamp for scene
-            timestamp = self.time_stamper.execute_single_scene(detailed_scene, length_minutes)
-            timestamps[i] = timestamp
-            
-            # Get image prompt for scene
-            image_prompt = self.image_prompter.execute(scene_outline)
-            image_prompts[i] = image_prompt
-            
+
+    async def _stage(self, checkpoint: PipelineCheckpoint, name: str, run: Callable[[], Awaitable[str]]) -> str:
+        """Run a pipeline stage unless its output is already in the checkpoint"""
+        value = checkpoint.stage(name)
+        if value is not None:
+            self.log_message(f"Reusing saved {name.replace('_', ' ')}.")
+            return value
+        value = await run()
+        checkpoint.set_stage(name, value)
+        return value
+
+    async def _scene_outline(self, plot: str, characters: str, creative_direction: str, target_scenes: int) -> str:
+        """Scene outline as JSON, the form it is checkpointed in"""
+        scenes = await self.scene_descriptor.aexecute(plot, characters, creative_direction, target_scenes)
+        return json.dumps({"scenes": scenes}, ensure_ascii=False)
+
+    async def _write_scene(self, draft: StoryDraft, i: int, checkpoint: PipelineCheckpoint) -> Path:
+        """Write one scene from its outline and save it"""
+        saved = checkpoint.scene(i)
+        if saved is not None:
+            return checkpoint.story_dir / saved["file"]
+
+        scene_outline = draft.scenes[i - 1]
+        self.log_message(f"Writing detailed scene {i}...")
+
+        # Only the characters this scene needs and a digest of the direction
+        characters, creative_direction, saved = draft.context.for_scene(scene_outline)
+        if draft.context.profiles:
+            cast = ", ".join(draft.context.names_in(scene_outline)) or "no named characters"
+        else:
+            cast = "full character sheet"
+        self.log_message(f"Scene {i} context: {cast}; ~{saved} prompt tokens saved")
+
+        # Get detailed scene from screenwriter
+        detailed_scene = await self.screenwriter.aexecute_scene(
+            scene_outline,
+            characters,
+            creative_direction,
+            draft.budgets[i - 1]
+        )
+
+        # Save scene to file
+        scene_file = self._scene_file(checkpoint, i)
+        atomic_write(scene_file, detailed_scene)
+        return scene_file
+
+    async def _time_scene(
+        self,
+        draft: StoryDraft,
+        scene_file: Path,
+        i: int,
+        length_minutes: int,
+        checkpoint: PipelineCheckpoint
+    ) -> str:
+        """Time a written scene, checkpoint it and hand it to the assembler"""
+        saved = checkpoint.scene(i)
+        if saved is not None:
+            timestamp = saved["timestamp"]
+        else:
+            scene_text = scene_file.read_text(encoding='utf-8')
+            timestamp = await self.time_stamper.aexecute_single_scene(scene_text, length_minutes)
+            checkpoint.set_scene(i, scene_file, timestamp, additional=i > len(draft.outline))
             self.log_message(f"Scene {i} completed with timestamp: {timestamp}")
+        outline = draft.outline[i - 1] if i <= len(draft.outline) else None
+        draft.add_scene(i, scene_file, timestamp, outline)
+        return timestamp
+
+    async def _image_prompts(self, draft: StoryDraft, checkpoint: PipelineCheckpoint) -> Dict[int, str]:
+        """Batch-generate the image prompts that are not saved yet; they only need the outlines"""
+        prompts = checkpoint.image_prompts()
+        outlines = dict(enumerate(draft.scenes, 1))
+        missing = {i: outline for i, outline in outlines.items() if i not in prompts}
+        if missing:
+            new_prompts = await self.image_prompter.aexecute_batch(missing)
+            checkpoint.set_image_prompts(new_prompts)
+            prompts.update(new_prompts)
+        draft.add_prompts(prompts)
+        return prompts
+
+    async def _write_additional_scene(
+        self,
+        draft: StoryDraft,
+        i: int,
+        slot: int,
+        target_seconds: int,
+        current_seconds: int,
+        length_minutes: int,
+        checkpoint: PipelineCheckpoint
+    ) -> Tuple[int, Path, str]:
+        """Write one fill scene; it is not checkpointed until accepted"""
+        cast, direction, plot_digest, saved = draft.context.for_additional_scene()
+        self.log_message(f"Scene {i} context: character summaries; ~{saved} prompt tokens saved")
+        new_scene = await self.screenwriter.aexecute_additional_scene(
+            plot_digest,
+            cast,
+            direction,
+            current_seconds,
+            length_minutes * 60,
+            target_seconds,
+            slot
+        )
+        scene_file = self._scene_file(checkpoint, i)
+        atomic_write(scene_file, new_scene)
+        return i, scene_file, new_scene
+
+    async def _rewrite_additional_scene(
+        self,
+        draft: StoryDraft,
+        i: int,
+        length_minutes: int,
+        checkpoint: PipelineCheckpoint
+    ) -> Path:
+        """A saved fill scene, written again at its old length if it was marked for rewriting"""
+        saved = checkpoint.scene(i)
+        if saved is not None:
+            return checkpoint.story_dir / saved["file"]
+        record = checkpoint.additional_scenes(i)[i]
+        self.log_message(f"Rewriting additional scene {i}...")
+        _, scene_file, _ = await self._write_additional_scene(
+            draft, i, 0, parse_timestamp(record["timestamp"]), sum(draft.budgets), length_minutes, checkpoint
+        )
+        return scene_file
+
+    async def _prompt_saved_scene(self, draft: StoryDraft, scene_file: Path, i: int, checkpoint: PipelineCheckpoint) -> str:
+        """Image prompt for a saved fill scene whose prompt is missing"""
+        image_prompt = await self._prompt_additional_scene((i, scene_file, scene_file.read_text(encoding='utf-8')))
+        checkpoint.set_image_prompts({i: image_prompt})
+        draft.add_prompts({i: image_prompt})
+        return image_prompt
+
+    async def _time_additional_scene(self, scene: Tuple[int, Path, str], length_minutes: int) -> str:
+        return await self.time_stamper.aexecute_single_scene(scene[2], length_minutes)
+
+    async def _prompt_additional_scene(self, scene: Tuple[int, Path, str]) -> str:
+        # Fill scenes have no outline, so the prompt is drawn from the scene itself
+        i, _, scene_text = scene
+        image_prompts = await self.image_prompter.aexecute_batch({i: scene_text})
+        return image_prompts[i]
+
+    @staticmethod
+    def _scene_file(checkpoint: PipelineCheckpoint, i: int) -> Path:
+        return checkpoint.story_dir / "scenes" / f"scene_{i:02d}.txt"
+
+    def execute(self, story_idea: str, length_minutes: int, story_dir=None) -> Path:
+        """Coordinate the screenplay creation process (blocking wrapper around aexecute)"""
+        return run_async(self.aexecute(story_idea, length_minutes, story_dir))
+
+    def resume(self, story_dir) -> Path:
+        """Finish an interrupted run (blocking wrapper around aresume)"""
+        return run_async(self.aresume(story_dir))
+
+    async def aresume(self, story_dir) -> Path:
+        """Finish an interrupted run, skipping every stage and scene in its manifest"""
+        checkpoint = PipelineCheckpoint(story_dir)
+        if checkpoint.story_idea is None:
+            raise ValueError(f"No saved run to resume in {story_dir}")
+        self.log_message("Resuming saved run...")
+        return await self._run(checkpoint.story_idea, checkpoint.length_minutes, checkpoint)
+
+    def regenerate(self, story_dir, artifact: str) -> Path:
+        """Recompute one artifact and its dependents (blocking wrapper around aregenerate)"""
+        return run_async(self.aregenerate(story_dir, artifact))
+
+    async def aregenerate(self, story_dir, artifact: str) -> Path:
+        """Recompute one artifact and everything downstream of it, reusing the rest of the story.
+
+        artifact is a stage ("characters", "plot", ...), "scene:7" or
+        "image_prompt:7"; see PipelineCheckpoint.dependents. The package and
+        JSON export are rebuilt from the saved scenes.
+        """
+        checkpoint = PipelineCheckpoint(story_dir)
+        if checkpoint.story_idea is None:
+            raise ValueError(f"No saved story to regenerate in {story_dir}")
+        invalidated = checkpoint.invalidate(artifact)
+        self.log_message(f"Regenerating {artifact}: recomputing {', '.join(invalidated)}")
+        token = refresh_cache.set(True)
+        try:
+            return await self._run(checkpoint.story_idea, checkpoint.length_minutes, checkpoint)
+        finally:
+            refresh_cache.reset(token)
+
+    async def aexecute(self, story_idea: str, length_minutes: int, story_dir=None) -> Path:
+        """Coordinate the screenplay creation process in its own run workspace.
 
-        # Verify total length
-        total_seconds = sum([
-            sum(int(x) * 60**i for i, x in enumerate(reversed(t.split(':'))))
-            for t in timestamps.values()
-        ])
-        
-        while total_seconds < length_minutes * 60 * 0.9:  # Allow 10% margin
-            self.log_message(f"Current length: {total_seconds//60}:{total_seconds%60:02d}. Need more content...")
-            
-            # Add a new scene
-            i = len(scene_files) + 1
-            new_scene = self.screenwriter.execute_additional_scene(
-                plot,
-                characters,
-                creative_direction,
-                total_seconds,
-                length_minutes * 60
+        Returns the path of screenplay_package.txt; screenplay.json is written beside it.
+        """
+        if story_dir is None:
+            story_dir = DataManager().create_new_story()
+        checkpoint = PipelineCheckpoint(story_dir)
+        checkpoint.reset()
+        return await self._run(story_idea, length_minutes, checkpoint)
+
+    async def _run(self, story_idea: str, length_minutes: int, checkpoint: PipelineCheckpoint) -> Path:
+        """Run the pipeline and save its metrics summary, even if it fails"""
+        run = RunMetrics()
+        token = current_run.set(run)
+        # Stage labels set below must not outlive the run in the caller's context
+        stage_token = current_stage.set(current_stage.get())
+        try:
+            return await self._run_pipeline(story_idea, length_minutes, checkpoint)
+        finally:
+            current_stage.reset(stage_token)
+            current_run.reset(token)
+            summary = run.summary()
+            atomic_write(checkpoint.story_dir / "metrics.json", json.dumps(summary, indent=2))
+            # Store writes run off the event loop; the run is not done until they are
+            await checkpoint.synced()
+            if checkpoint.store_error is not None:
+                self.log_message(
+                    f"Story store is behind ({checkpoint.store_error}); it is re-imported from the manifest when the story is next opened"
+                )
+            elif checkpoint.store is not None:
+                await asyncio.to_thread(checkpoint.store.record_calls, checkpoint.story_dir, summary["calls"])
+            totals = summary["totals"]
+            self.log_message(
+                f"Run metrics: {totals['calls']} calls, {totals['total_tokens']} tokens, "
+                f"~${totals['cost_usd']:.4f}, {totals['retries']} retries, {summary['fallbacks']} model fallbacks, "
+                f"{summary['wall_seconds']:.1f}s"
             )
-            
-            scene_file = scenes_dir / f"scene_{i:02d}.txt"
-            with open(scene_file, 'w', encoding='utf-8') as f:
-                f.write(new_scene)
-            scene_files.append(scene_file)
-            
-            timestamp = self.time_stamper.execute_single_scene(new_scene, length_minutes)
-            timestamps[i] = timestamp
-            
-            image_prompt = self.image_prompter.execute(new_scene)
-            image_prompts[i] = image_prompt
-            
-            total_seconds += sum(int(x) * 60**i for i, x in enumerate(reversed(timestamp.split(':'))))
-        
-        # Compile final screenplay
-        self.log_message("Compiling final screenplay...")
-        final_screenplay = f"""Title: {story_idea.split()[0:5]}...
-
-Character Descriptions:
-{characters}
-
-Plot Description:
-{plot}
-
-"""
-        
-        for i, scene_file in enumerate(scene_files, 1):
-            with open(scene_file, 'r', encoding='utf-8') as f:
-                scene_text = f.read()
-            
-            final_screenplay += f"""
-Scene {i}: {timestamps[i]}
-Image Prompt: {image_prompts[i]}
-{scene_text}
-"""
-        
+
+    async def _run_pipeline(self, story_idea: str, length_minutes: int, checkpoint: PipelineCheckpoint) -> Path:
+        """Run the pipeline, reusing whatever the checkpoint already holds"""
+        checkpoint.start(story_idea, length_minutes)
+
+        # Create scenes directory if it doesn't exist
+        (checkpoint.story_dir / "scenes").mkdir(parents=True, exist_ok=True)
+
+        graph = StageGraph(self.max_workers)
+        self._add_story_tasks(graph, story_idea, length_minutes, checkpoint)
+        try:
+            results = await graph.run()
+        except BaseException:
+            if "draft" in graph.results:
+                graph.results["draft"].assembler.abort()
+            raise
+        finally:
+            self._report_schedule(graph)
+
+        draft = results["draft"]
+        self.log_message(f"Context slicing saved ~{draft.context.tokens_saved} prompt tokens this run")
+        if self.cache is not None:
+            self.log_message(f"Completion cache stats: {self.cache.stats()}")
+        checkpoint.mark_complete(make_title(story_idea), draft.total_seconds)
         self.log_message("Screenplay compilation complete!")
-        return final_screenplay 
\ No newline at end of file
+        return results["screenplay"]
+
+    def _add_story_tasks(self, graph: StageGraph, story_idea: str, length_minutes: int, checkpoint: PipelineCheckpoint):
+        """Declare the story stages; the draft task adds the per-scene tasks once the outline exists"""
+        target_scenes = length_minutes * 2
+
+        async def creative_direction() -> str:
+            self.log_message("Starting creative direction phase...")
+            return await self._stage(
+                checkpoint, "creative_direction",
+                lambda: self.aget_completion(self.direction_messages(story_idea, length_minutes))
+            )
+
+        async def characters(creative_direction: str) -> str:
+            return await self._stage(
+                checkpoint, "characters",
+                lambda: self.character_writer.aexecute(story_idea, creative_direction)
+            )
+
+        async def plot(creative_direction: str, characters: str) -> str:
+            return await self._stage(
+                checkpoint, "plot",
+                lambda: self.plot_writer.aexecute(story_idea, characters, creative_direction)
+            )
+
+        async def scene_outlines(creative_direction: str, characters: str, plot: str) -> str:
+            # The numbered outline is validated before any per-scene work
+            return await self._stage(
+                checkpoint, "scene_outlines",
+                lambda: self._scene_outline(plot, characters, creative_direction, target_scenes)
+            )
+
+        async def draft(creative_direction: str, characters: str, plot: str, scene_outlines: str) -> StoryDraft:
+            # Older manifests hold the free-text outline, which the parser also reads
+            outline, _ = parse_scene_outline(scene_outlines)
+            # Each scene gets its share of the runtime before any is written
+            budgets = plan_scene_durations(outline, length_minutes * 60)
+            context = SceneContextBuilder(characters, creative_direction, plot)
+            # Scenes are written into the package in order as they complete
+            assembler = ScreenplayAssembler(checkpoint.story_dir, make_title(story_idea), length_minutes, characters, plot)
+            story = StoryDraft(outline, budgets, context, assembler)
+            self.log_message(
+                f"Scene outlines created ({len(outline)} scenes, target {target_scenes}); "
+                f"duration budgets {budgets}s. Writing detailed scenes..."
+            )
+            self._add_scene_tasks(graph, story, length_minutes, checkpoint)
+            return story
+
+        graph.add("creative_direction", creative_direction, stage="creative_direction")
+        graph.add("characters", characters, ("creative_direction",), stage="characters")
+        graph.add("plot", plot, ("creative_direction", "characters"), stage="plot")
+        graph.add("scene_outlines", scene_outlines, ("creative_direction", "characters", "plot"), stage="scene_outlines")
+        graph.add("draft", draft, ("creative_direction", "characters", "plot", "scene_outlines"), budget=False)
+
+    def _add_scene_tasks(self, graph: StageGraph, draft: StoryDraft, length_minutes: int, checkpoint: PipelineCheckpoint):
+        """Write, time and prompt every scene, then check the runtime"""
+        # Local timing needs no slot; LLM timing does
+        timing_budget = self.time_stamper.use_llm
+        # Image prompts only need the outlines, so they do not wait for any scene
+        graph.add("image_prompts", partial(self._image_prompts, checkpoint=checkpoint), ("draft",), stage="image_prompts")
+        scene_tasks = []
+        for i in range(1, len(draft.scenes) + 1):
+            graph.add(
+                f"scene_{i}", partial(self._write_scene, i=i, checkpoint=checkpoint),
+                ("draft",), stage="scenes"
+            )
+            graph.add(
+                f"timestamp_{i}", partial(self._time_scene, i=i, length_minutes=length_minutes, checkpoint=checkpoint),
+                ("draft", f"scene_{i}"), stage="scenes", budget=timing_budget
+            )
+            scene_tasks.append(f"timestamp_{i}")
+        # Fill scenes kept by an earlier run are reused, or rewritten in
+        # place when a regeneration marked them stale
+        saved_prompts = checkpoint.image_prompts()
+        for i in checkpoint.additional_scenes(len(draft.scenes) + 1):
+            graph.add(
+                f"scene_{i}", partial(self._rewrite_additional_scene, i=i, length_minutes=length_minutes, checkpoint=checkpoint),
+                ("draft",), stage="additional_scenes"
+            )
+            graph.add(
+                f"timestamp_{i}", partial(self._time_scene, i=i, length_minutes=length_minutes, checkpoint=checkpoint),
+                ("draft", f"scene_{i}"), stage="additional_scenes", budget=timing_budget
+            )
+            scene_tasks.append(f"timestamp_{i}")
+            if i not in saved_prompts:
+                graph.add(
+                    f"image_prompt_{i}", partial(self._prompt_saved_scene, i=i, checkpoint=checkpoint),
+                    ("draft", f"scene_{i}"), stage="image_prompts"
+                )
+                scene_tasks.append(f"image_prompt_{i}")
+        graph.add(
+            "fill_1", partial(self._fill_round, graph=graph, round_number=1, length_minutes=length_minutes, checkpoint=checkpoint),
+            ["draft", "image_prompts"] + scene_tasks, budget=False
+        )
+
+    async def _fill_round(
+        self,
+        draft: StoryDraft,
+        *results,
+        graph: StageGraph,
+        round_number: int,
+        length_minutes: int,
+        checkpoint: PipelineCheckpoint
+    ):
+        """Keep the previous round's extra scenes that fit, then add another round or finish.
+
+        Every extra scene of a round is written concurrently, with its
+        timestamp and image prompt as separate tasks; the rounds and the
+        overshoot are capped.
+        """
+        target_seconds = length_minutes * 60
+        if round_number > 1:
+            # Results arrive as (scene, timestamp, image prompt) per extra scene
+            new_scenes = list(zip(results[0::3], results[1::3], results[2::3]))
+            self._accept_additional_scenes(draft, new_scenes, target_seconds, checkpoint)
+            checkpoint.add_fill_round()
+
+        total_seconds = draft.total_seconds
+        durations = []
+        # Rounds from earlier runs of this story count too, so a resume or
+        # regeneration does not top the runtime up again
+        if checkpoint.fill_rounds < self.max_fill_rounds:
+            durations = plan_fill(total_seconds, target_seconds, self.max_fill_scenes)
+        if not durations:
+            if total_seconds < target_seconds * MIN_RUNTIME_RATIO:
+                self.log_message(
+                    f"Runtime {total_seconds//60}:{total_seconds%60:02d} is still short of the target "
+                    f"after {self.max_fill_rounds} fill rounds; compiling anyway"
+                )
+            graph.add("screenplay", self._finish_screenplay, ("draft", f"fill_{round_number}"), budget=False)
+            return total_seconds
+
+        self.log_message(
+            f"Current length: {total_seconds//60}:{total_seconds%60:02d}. "
+            f"Adding {len(durations)} scenes of ~{durations[0]}s (round {checkpoint.fill_rounds + 1})..."
+        )
+        first = draft.scene_count + 1
+        inputs = ["draft"]
+        for slot, seconds in enumerate(durations):
+            i = first + slot
+            name = f"additional_{round_number}_{i}"
+            graph.add(name, partial(
+                self._write_additional_scene,
+                i=i,
+                slot=slot,
+                target_seconds=seconds,
+                current_seconds=total_seconds,
+                length_minutes=length_minutes,
+                checkpoint=checkpoint
+            ), ("draft",), stage="additional_scenes")
+            graph.add(
+                f"{name}_timestamp", partial(self._time_additional_scene, length_minutes=length_minutes),
+                (name,), stage="additional_scenes", budget=self.time_stamper.use_llm
+            )
+            graph.add(f"{name}_image_prompt", self._prompt_additional_scene, (name,), stage="image_prompts")
+            inputs += [name, f"{name}_timestamp", f"{name}_image_prompt"]
+        graph.add(f"fill_{round_number + 1}", partial(
+            self._fill_round,
+            graph=graph,
+            round_number=round_number + 1,
+            length_minutes=length_minutes,
+            checkpoint=checkpoint
+        ), inputs, budget=False)
+        return total_seconds
+
+    def _accept_additional_scenes(
+        self,
+        draft: StoryDraft,
+        new_scenes: List[tuple],
+        target_seconds: int,
+        checkpoint: PipelineCheckpoint
+    ):
+        """Checkpoint the extra scenes that keep the runtime in range and delete the rest"""
+        kept = accept_fill(draft.total_seconds, target_seconds, [parse_timestamp(t) for _, t, _ in new_scenes])
+        for slot, ((i, scene_file, _), timestamp, image_prompt) in enumerate(new_scenes):
+            if slot >= kept:
+                scene_file.unlink(missing_ok=True)
+                continue
+            checkpoint.set_image_prompts({i: image_prompt})
+            checkpoint.set_scene(i, scene_file, timestamp, additional=True)
+            draft.add_prompts({i: image_prompt})
+            draft.add_scene(i, scene_file, timestamp)
+        if kept < len(new_scenes):
+            self.log_message(f"Dropped {len(new_scenes) - kept} extra scenes that would overshoot the target length")
+
+    async def _finish_screenplay(self, draft: StoryDraft, total_seconds: int) -> Path:
+        path = draft.assembler.finish()
+        self.log_message(f"Screenplay written: {draft.assembler.written} scenes in {path.name} and {draft.assembler.json_path.name}")
+        return path
+
+    def _report_schedule(self, graph: StageGraph):
+        """Log the critical path and keep the full schedule in the run's metrics"""
+        report = graph.report()
+        run = current_run.get()
+        if run is not None:
+            run.schedule = report
+        path = " -> ".join(f"{step['task']} {step['seconds']:.1f}s" for step in report["critical_path"])
+        self.log_message(
+            f"Critical path {report['critical_path_seconds']:.1f}s of {report['wall_seconds']:.1f}s wall: {path}"
+        )
@@ -1,12 +1,19 @@
 from . import BaseAgent
-from typing import Dict, Any
+from typing import Dict, Any, List
+import asyncio
+import os
+from services.openai_client import run_async
+from services.structured_output import extract_json, JSON_RESPONSE
 
 class ImagePrompter(BaseAgent):
     def __init__(self):
         super().__init__(name="ImagePrompter", role="Visual Prompter")
+        # Scenes per batched request and attempts to fill in missing scenes
+        self.batch_size = int(os.getenv("IMAGE_PROMPT_BATCH_SIZE", "12"))
+        self.max_attempts = 3
         
-    def execute(self, scenes: str) -> str:
-        """Generate image prompts for each scene"""
+    def build_messages(self, scenes: str) -> list:
+        """Build the messages to generate image prompts for each scene"""
         messages = [
             {
                 "role": "system",
@@ -41,4 +48,107 @@ class ImagePrompter(BaseAgent):
             }
         ]
         
-        return self.get_completion(messages) 
\ No newline at end of file
+        return messages
+
+    def execute(self, scenes: str) -> str:
+        """Generate image prompts for each scene (blocking wrapper around aexecute)"""
+        return run_async(self.aexecute(scenes))
+
+    async def aexecute(self, scenes: str) -> str:
+        """Generate image prompts for each scene"""
+        return await self.aget_completion(self.build_messages(scenes))
+
+    def batch_messages(self, scenes: Dict[int, str]) -> list:
+        """Build the messages to generate image prompts for several scenes as JSON"""
+        outlines = "\n\n".join(f"Scene {number}:\n{outline}" for number, outline in scenes.items())
+        keys = ", ".join(f'"{number}"' for number in scenes)
+        return [
+            {
+                "role": "system",
+                "content": """You are a visual prompt expert for screenplays. Create detailed image prompts that capture:
+                
+                - Scene composition and framing
+                - Lighting and color palette
+                - Character positioning and expressions
+                - Key visual elements and props
+                - Atmosphere and mood
+                - Camera angles and movement
+                - Special effects or unique visual elements
+                
+                Keep characters, locations, palette and visual style consistent from scene to scene.
+                
+                Respond with a JSON object whose keys are the scene numbers as strings and whose values
+                are the image prompt for that scene: one paragraph covering the primary shot, key visual
+                elements, mood and atmosphere, and technical considerations."""
+            },
+            {
+                "role": "user",
+                "content": f"""Create detailed visual prompts for these scenes:
+
+                {outlines}
+
+                Return a JSON object with exactly these keys: {keys}."""
+            }
+        ]
+
+    @staticmethod
+    def parse_batch(reply: str, expected) -> Dict[int, str]:
+        """Extract the valid per-scene prompts from a batched reply"""
+        try:
+            data = extract_json(reply)
+        except ValueError:
+            return {}
+        if isinstance(data, dict) and isinstance(data.get("scenes"), (dict, list)):
+            data = data["scenes"]
+        if isinstance(data, list):
+            data = {
+                item.get("scene_number", item.get("scene")): item.get("prompt")
+                for item in data if isinstance(item, dict)
+            }
+        if not isinstance(data, dict):
+            return {}
+
+        prompts = {}
+        for key, value in data.items():
+            try:
+                number = int(str(key).lower().replace("scene", "").strip())
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                value = "\n".join(f"{k}: {v}" for k, v in value.items())
+            if number in expected and isinstance(value, str) and value.strip():
+                prompts[number] = value.strip()
+        return prompts
+
+    def _batches(self, scenes: Dict[int, str]) -> List[Dict[int, str]]:
+        numbers = list(scenes)
+        return [
+            {number: scenes[number] for number in numbers[i:i + self.batch_size]}
+            for i in range(0, len(numbers), self.batch_size)
+        ]
+
+    def execute_batch(self, scenes: Dict[int, str]) -> Dict[int, str]:
+        """Generate image prompts for many scenes (blocking wrapper around aexecute_batch)"""
+        return run_async(self.aexecute_batch(scenes))
+
+    async def _aexecute_batch(self, batch: Dict[int, str]) -> Dict[int, str]:
+        prompts = {}
+        pending = dict(batch)
+        for attempt in range(self.max_attempts):
+            reply = await self.aget_completion(self.batch_messages(pending), response_format=JSON_RESPONSE)
+            prompts.update(self.parse_batch(reply, pending))
+            pending = {n: outline for n, outline in pending.items() if n not in prompts}
+            if not pending:
+                break
+            self.log_message(f"Re-requesting image prompts for scenes {sorted(pending)}")
+        # Last resort for scenes the batched replies kept missing
+        for number, outline in pending.items():
+            prompts[number] = await self.aexecute(outline)
+        return prompts
+
+    async def aexecute_batch(self, scenes: Dict[int, str]) -> Dict[int, str]:
+        """Generate image prompts for many scenes in as few calls as possible"""
+        prompts = {}
+        for result in await asyncio.gather(*[self._aexecute_batch(batch) for batch in self._batches(scenes)]):
+            prompts.update(result)
+        return prompts
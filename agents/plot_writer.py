@@ -1,12 +1,13 @@
 from . import BaseAgent
+from services.openai_client import run_async
 from typing import Dict, Any
 
 class PlotWriter(BaseAgent):
     def __init__(self):
         super().__init__(name="PlotWriter", role="Plot Developer")
         
-    def execute(self, story_idea: str, characters: str, creative_direction: str) -> str:
-        """Generate plot based on story idea, characters, and creative direction"""
+    def build_messages(self, story_idea: str, characters: str, creative_direction: str) -> list:
+        """Build the messages to generate plot based on story idea, characters, and creative direction"""
         messages = [
             {
                 "role": "system",
@@ -40,4 +41,12 @@ class PlotWriter(BaseAgent):
             }
         ]
         
-        return self.get_completion(messages) 
\ No newline at end of file
+        return messages
+
+    def execute(self, story_idea: str, characters: str, creative_direction: str) -> str:
+        """Generate plot (blocking wrapper around aexecute)"""
+        return run_async(self.aexecute(story_idea, characters, creative_direction))
+
+    async def aexecute(self, story_idea: str, characters: str, creative_direction: str) -> str:
+        """Generate plot based on story idea, characters, and creative direction"""
+        return await self.aget_completion(self.build_messages(story_idea, characters, creative_direction))
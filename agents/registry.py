@@ -0,0 +1,31 @@
+import threading
+from .director import Director
+from .character_writer import CharacterWriter
+from .plot_writer import PlotWriter
+from .scene_descriptor import SceneDescriptor
+from .time_stamper import TimeStamper
+from .image_prompter import ImagePrompter
+from .screenwriter import Screenwriter
+
+_lock = threading.Lock()
+_director = None
+
+def build_director() -> Director:
+    """Create a Director wired up with a fresh set of agents"""
+    director = Director()
+    director.character_writer = CharacterWriter()
+    director.plot_writer = PlotWriter()
+    director.scene_descriptor = SceneDescriptor()
+    director.time_stamper = TimeStamper()
+    director.image_prompter = ImagePrompter()
+    director.screenwriter = Screenwriter()
+    return director
+
+def get_director() -> Director:
+    """Process-wide Director, built once and reused across reruns and sessions"""
+    global _director
+    if _director is None:
+        with _lock:
+            if _director is None:
+                _director = build_director()
+    return _director
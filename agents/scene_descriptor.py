@@ -1,17 +1,25 @@
 from . import BaseAgent
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import json
+from services.openai_client import run_async
+from services.structured_output import JSON_RESPONSE
+from services.scene_outline import SCENE_SCHEMA, parse_scene_outline, is_valid, count_in_range, format_scene_outline
 
 class SceneDescriptor(BaseAgent):
     def __init__(self):
         super().__init__(name="SceneDescriptor", role="Scene Developer")
-        
-    def execute(self, plot: str, characters: str, creative_direction: str) -> str:
-        """Generate scene descriptions based on plot, characters, and creative direction"""
+        # Follow-up requests for scenes that came back incomplete
+        self.max_repairs = 2
+
+    def build_messages(self, plot: str, characters: str, creative_direction: str, target_scenes: Optional[int] = None) -> list:
+        """Build the messages to generate scene descriptions based on plot, characters, and creative direction"""
+        schema = json.dumps(SCENE_SCHEMA, indent=2)
+        count = f"Write exactly {target_scenes} scenes." if target_scenes else "Write as many scenes as the story needs."
         messages = [
             {
                 "role": "system",
-                "content": """You are a scene writer for screenplays. Break down the plot into detailed, vivid scenes that include:
-                
+                "content": f"""You are a scene writer for screenplays. Break down the plot into detailed, vivid scenes that include:
+
                 - Scene number and setting description
                 - Time of day and atmosphere
                 - Character presence and positioning
@@ -19,9 +27,11 @@ class SceneDescriptor(BaseAgent):
                 - Key dialogue points and emotional beats
                 - Visual elements and cinematography notes
                 - Scene transitions
-                
-                Format each scene clearly with numbered sections and ensure smooth flow between scenes.
-                Focus on showing rather than telling, using vivid sensory details."""
+
+                Focus on showing rather than telling, using vivid sensory details.
+
+                Respond with a JSON object {{"scenes": [...]}} where each scene has these fields:
+                {schema}"""
             },
             {
                 "role": "user",
@@ -38,8 +48,76 @@ class SceneDescriptor(BaseAgent):
 
                 Create a sequence of scenes that brings the story to life visually and emotionally.
                 Each scene should advance the plot while revealing character and theme.
-                Remember to vary the pacing and emotional intensity across scenes."""
+                Remember to vary the pacing and emotional intensity across scenes.
+                {count}"""
+            }
+        ]
+
+        return messages
+
+    def repair_messages(self, plot: str, scenes: List[dict], broken: List[int]) -> list:
+        """Build the messages to rewrite only the incomplete scenes of an outline"""
+        outline = "\n\n".join(format_scene_outline(scene) for scene in scenes)
+        numbers = ", ".join(map(str, broken))
+        return [
+            {
+                "role": "system",
+                "content": f"""You are a scene writer for screenplays. Some scenes of an outline are incomplete.
+                Rewrite only the requested scenes so they fit between their neighbours.
+
+                Respond with a JSON object {{"scenes": [...]}} where each scene has these fields:
+                {json.dumps(SCENE_SCHEMA, indent=2)}"""
+            },
+            {
+                "role": "user",
+                "content": f"""Plot:
+                {plot}
+
+                Current outline:
+                {outline}
+
+                Rewrite scenes {numbers} in full, keeping their scene numbers."""
             }
         ]
-        
-        return self.get_completion(messages) 
\ No newline at end of file
+
+    @staticmethod
+    def _closer(first: List[dict], second: List[dict], target: int) -> bool:
+        """Whether the second outline's scene count is nearer the target"""
+        return abs(len(second) - target) < abs(len(first) - target)
+
+    def _merge_repairs(self, scenes: List[dict], reply: str, broken: List[int]) -> List[int]:
+        """Swap repaired scenes into the outline and return the numbers still broken"""
+        repaired, _ = parse_scene_outline(reply, renumber=False)
+        fixed = {scene["scene_number"]: scene for scene in repaired if scene["scene_number"] in broken}
+        for scene in fixed.values():
+            if is_valid(scene):
+                scenes[scene["scene_number"] - 1] = scene
+        return [n for n in broken if not is_valid(scenes[n - 1])]
+
+    def execute(self, plot: str, characters: str, creative_direction: str, target_scenes: Optional[int] = None) -> List[dict]:
+        """Generate a validated, numbered scene outline (blocking wrapper around aexecute)"""
+        return run_async(self.aexecute(plot, characters, creative_direction, target_scenes))
+
+    async def aexecute(self, plot: str, characters: str, creative_direction: str, target_scenes: Optional[int] = None) -> List[dict]:
+        """Generate a validated, numbered scene outline"""
+        messages = self.build_messages(plot, characters, creative_direction, target_scenes)
+        reply = await self.aget_completion(messages, response_format=JSON_RESPONSE)
+        scenes, broken = parse_scene_outline(reply)
+        if target_scenes and not count_in_range(len(scenes), target_scenes):
+            self.log_message(f"Outline has {len(scenes)} scenes for a target of {target_scenes}; requesting it again")
+            retry = parse_scene_outline(await self.aget_completion(messages + [
+                {"role": "assistant", "content": reply},
+                {"role": "user", "content": f"That outline had {len(scenes)} scenes. Write exactly {target_scenes}."}
+            ], response_format=JSON_RESPONSE))
+            if self._closer(scenes, retry[0], target_scenes):
+                scenes, broken = retry
+        if not scenes:
+            raise ValueError("SceneDescriptor returned no usable scenes")
+
+        for attempt in range(self.max_repairs):
+            if not broken:
+                break
+            self.log_message(f"Re-requesting incomplete scenes {broken}")
+            reply = await self.aget_completion(self.repair_messages(plot, scenes, broken), response_format=JSON_RESPONSE)
+            broken = self._merge_repairs(scenes, reply, broken)
+        return scenes
@@ -1,16 +1,32 @@
 from . import BaseAgent
-from typing import Dict, Any
+from services.openai_client import run_async
+from typing import Dict, Any, Optional
+
+# Other scenes may be written at the same time; each takes a different angle
+FILL_FOCUS = ("character development", "subplot exploration", "theme reinforcement")
+
+def length_guidance(target_seconds: int) -> str:
+    """Translate a duration budget into a concrete size for the model"""
+    lines = max(3, target_seconds // 4)
+    return f"about {target_seconds} seconds of screen time (roughly {lines} lines of action and dialogue; ~3s per dialogue line, ~5s per action line)"
 
 class Screenwriter(BaseAgent):
     def __init__(self):
         super().__init__(name="Screenwriter", role="Final Screenplay Writer")
         
-    def execute_scene(self, scene_outline: str, characters: str, creative_direction: str) -> str:
-        """Write a detailed scene based on the outline"""
+    def scene_messages(
+        self,
+        scene_outline: str,
+        characters: str,
+        creative_direction: str,
+        target_seconds: Optional[int] = None
+    ) -> list:
+        """Build the messages to write a detailed scene based on the outline"""
+        length = length_guidance(target_seconds) if target_seconds else "30-60 seconds of screen time"
         messages = [
             {
                 "role": "system",
-                "content": """You are a professional screenwriter. Write a detailed scene that:
+                "content": f"""You are a professional screenwriter. Write a detailed scene that:
                 
                 - Uses proper screenplay formatting
                 - Includes vivid action descriptions
@@ -25,7 +41,7 @@ class Screenwriter(BaseAgent):
                 - Character dialogue with parentheticals when needed
                 - Proper transitions
                 
-                Make each scene substantial enough for proper timing (aim for 30-60 seconds of screen time)."""
+                Make each scene substantial enough for proper timing (aim for {length})."""
             },
             {
                 "role": "user",
@@ -42,22 +58,49 @@ class Screenwriter(BaseAgent):
 
                 Write a substantial scene that brings this moment to life.
                 Include detailed action and meaningful dialogue.
-                Remember this needs to fill 30-60 seconds of screen time."""
+                Remember this needs to fill {length}."""
             }
         ]
         
-        return self.get_completion(messages)
+        return messages
+
+    def execute_scene(
+        self,
+        scene_outline: str,
+        characters: str,
+        creative_direction: str,
+        target_seconds: Optional[int] = None
+    ) -> str:
+        """Write a detailed scene (blocking wrapper around aexecute_scene)"""
+        return run_async(self.aexecute_scene(scene_outline, characters, creative_direction, target_seconds))
+
+    async def aexecute_scene(
+        self,
+        scene_outline: str,
+        characters: str,
+        creative_direction: str,
+        target_seconds: Optional[int] = None
+    ) -> str:
+        """Write a detailed scene based on the outline"""
+        return await self.aget_completion(
+            self.scene_messages(scene_outline, characters, creative_direction, target_seconds)
+        )
         
-    def execute_additional_scene(
+    def additional_scene_messages(
         self,
         plot: str,
         characters: str,
         creative_direction: str,
         current_time: int,
-        target_time: int
-    ) -> str:
-        """Write an additional scene to help reach the target length"""
-        remaining_time = target_time - current_time
+        target_time: int,
+        target_seconds: Optional[int] = None,
+        slot: int = 0
+    ) -> list:
+        """Build the messages to write an additional scene to help reach the target length"""
+        if target_seconds:
+            length = length_guidance(target_seconds)
+        else:
+            length = f"approximately {(target_time - current_time)//60} minutes of screen time"
         
         messages = [
             {
@@ -66,11 +109,11 @@ class Screenwriter(BaseAgent):
                 
                 - Fits naturally within the existing plot
                 - Adds depth to characters or story
-                - Can fill approximately {remaining_time//60} minutes of screen time
+                - Can fill {length}
                 - Maintains the established tone and style
                 
                 The scene should feel essential, not like filler content.
-                Focus on character development, subplot exploration, or theme reinforcement."""
+                Focus on {FILL_FOCUS[slot % len(FILL_FOCUS)]}; other new scenes cover the other angles."""
             },
             {
                 "role": "user",
@@ -92,4 +135,34 @@ class Screenwriter(BaseAgent):
             }
         ]
         
-        return self.get_completion(messages) 
\ No newline at end of file
+        return messages
+
+    def execute_additional_scene(
+        self,
+        plot: str,
+        characters: str,
+        creative_direction: str,
+        current_time: int,
+        target_time: int,
+        target_seconds: Optional[int] = None,
+        slot: int = 0
+    ) -> str:
+        """Write an additional scene (blocking wrapper around aexecute_additional_scene)"""
+        return run_async(self.aexecute_additional_scene(
+            plot, characters, creative_direction, current_time, target_time, target_seconds, slot
+        ))
+
+    async def aexecute_additional_scene(
+        self,
+        plot: str,
+        characters: str,
+        creative_direction: str,
+        current_time: int,
+        target_time: int,
+        target_seconds: Optional[int] = None,
+        slot: int = 0
+    ) -> str:
+        """Write an additional scene to help reach the target length"""
+        return await self.aget_completion(self.additional_scene_messages(
+            plot, characters, creative_direction, current_time, target_time, target_seconds, slot
+        ))
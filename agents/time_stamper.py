@@ -1,12 +1,25 @@
 from . import BaseAgent
-from typing import Dict, Any
+from services.openai_client import run_async
+from typing import Dict, Any, Optional
+import os
+from services.scene_timing import estimate_seconds, format_timestamp
 
 class TimeStamper(BaseAgent):
-    def __init__(self):
+    def __init__(self, use_llm: Optional[bool] = None):
         super().__init__(name="TimeStamper", role="Scene Timer")
+        # Scenes are timed locally unless the LLM estimate is opted into
+        if use_llm is None:
+            use_llm = os.getenv("TIMESTAMPER_LLM", "0").lower() in ("1", "true", "on")
+        self.use_llm = use_llm
+
+    def estimate_scene(self, scene_text: str) -> str:
+        """Time a scene locally by applying the timing guidelines to its elements"""
+        timestamp = format_timestamp(estimate_seconds(scene_text))
+        self.log_message(f"Estimated scene duration: {timestamp}")
+        return timestamp
         
-    def execute_single_scene(self, scene_text: str, total_length_minutes: int) -> str:
-        """Estimate the duration of a single scene"""
+    def scene_messages(self, scene_text: str) -> list:
+        """Build the messages to estimate the duration of a single scene"""
         messages = [
             {
                 "role": "system",
@@ -40,11 +53,24 @@ class TimeStamper(BaseAgent):
             }
         ]
         
-        duration = self.get_completion(messages).strip()
-        
+        return messages
+
+    @staticmethod
+    def parse_duration(duration: str) -> str:
+        """Normalise a model reply into an MM:SS timestamp"""
         # Validate format and return
         try:
-            minutes, seconds = map(int, duration.split(':'))
+            minutes, seconds = map(int, duration.strip().split(':'))
             return f"{minutes:02d}:{seconds:02d}"
-        except:
-            return "00:45"  # Default to 45 seconds if format is invalid 
\ No newline at end of file
+        except ValueError:
+            return "00:45"  # Default to 45 seconds if format is invalid
+
+    def execute_single_scene(self, scene_text: str, total_length_minutes: int) -> str:
+        """Estimate the duration of a single scene (blocking wrapper around aexecute_single_scene)"""
+        return run_async(self.aexecute_single_scene(scene_text, total_length_minutes))
+
+    async def aexecute_single_scene(self, scene_text: str, total_length_minutes: int) -> str:
+        """Estimate the duration of a single scene"""
+        if not self.use_llm:
+            return self.estimate_scene(scene_text)
+        return self.parse_duration(await self.aget_completion(self.scene_messages(scene_text)))
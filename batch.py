@@ -0,0 +1,154 @@
+"""Headless batch generation.
+
+Reads story requests from a JSONL file, one object per line:
+
+    {"id": "desert-robot", "story_idea": "A girl finds a robot...", "length_minutes": 3}
+
+("idea" and "length" are accepted as short forms.) Many Director pipelines run
+concurrently on one event loop, and results are appended to the output JSONL
+as each story finishes.
+
+    python batch.py stories.jsonl --output results.jsonl --stories 4 --max-in-flight 8
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from agents import rate_limiter, metrics
+from agents.registry import get_director
+from services.checkpoint import PipelineCheckpoint
+from services.console import AgentConsole, current_console
+from services.metrics import percentile, serve_metrics
+from services.screenplay_assembler import PACKAGE_FILENAME, JSON_FILENAME
+
+def read_requests(path: str) -> list:
+    """Load story requests, skipping blank lines"""
+    requests = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            story_idea = data.get("story_idea") or data.get("idea")
+            if not story_idea:
+                raise ValueError(f"{path}:{line_number}: missing story_idea")
+            request_id = str(data.get("id", line_number))
+            # The ID names the story directory, so two requests must never share one
+            if request_id in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate id {request_id!r}")
+            seen.add(request_id)
+            requests.append({
+                "id": request_id,
+                "story_idea": story_idea,
+                "length_minutes": int(data.get("length_minutes") or data.get("length") or 5)
+            })
+    return requests
+
+async def run_story(director, request: dict, story_root: Path, limit: asyncio.Semaphore, verbose: bool) -> dict:
+    """Generate one screenplay into its own story directory"""
+    story_dir = story_root / f"story_{request['id']}"
+    async with limit:
+        # Each story logs to its own console instead of a Streamlit session
+        current_console.set(AgentConsole(log_dir=str(story_dir / "logs"), echo=verbose))
+        started = time.perf_counter()
+        result = dict(request, story_dir=str(story_dir))
+        try:
+            checkpoint = PipelineCheckpoint(story_dir) if PipelineCheckpoint.exists(story_dir) else None
+            screenplay_path = story_dir / PACKAGE_FILENAME
+            if checkpoint is not None and checkpoint.complete and screenplay_path.exists():
+                # Finished by an earlier batch run; rerunning the file must not regenerate it
+                result["skipped"] = True
+            elif checkpoint is not None and not checkpoint.complete:
+                screenplay_path = await director.aresume(story_dir)
+            else:
+                screenplay_path = await director.aexecute(request["story_idea"], request["length_minutes"], story_dir)
+            result.update(
+                status="ok",
+                screenplay_path=str(screenplay_path),
+                json_path=str(screenplay_path.with_name(JSON_FILENAME))
+            )
+        except Exception as e:
+            result.update(status="error", error=f"{type(e).__name__}: {e}")
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+async def run_batch(
+    requests: list,
+    output: str,
+    story_root: str = "data/batch",
+    stories: int = 4,
+    max_in_flight: Optional[int] = None,
+    verbose: bool = False
+) -> list:
+    """Run every request and stream each result to the output JSONL as it finishes"""
+    if max_in_flight:
+        rate_limiter.set_max_concurrency(max_in_flight)
+    director = get_director()
+    limit = asyncio.Semaphore(stories)
+    root = Path(story_root)
+    results = []
+
+    with open(output, 'a', encoding='utf-8') as out:
+        tasks = [asyncio.ensure_future(run_story(director, request, root, limit, verbose)) for request in requests]
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            results.append(result)
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"[{len(results)}/{len(requests)}] {result['id']}: {result['status']} in {result['seconds']:.1f}s")
+    return results
+
+def print_stats(results: list, wall_seconds: float):
+    """Summarise throughput and per-story latency"""
+    ok = [r for r in results if r["status"] == "ok"]
+    # Stories finished by an earlier run say nothing about throughput or latency
+    generated = [r for r in ok if not r.get("skipped")]
+    print(
+        f"\nStories: {len(results)} ({len(ok)} ok, {len(ok) - len(generated)} already done, "
+        f"{len(results) - len(ok)} failed)"
+    )
+    print(f"Wall time: {wall_seconds:.1f}s")
+    if wall_seconds > 0:
+        print(f"Throughput: {len(generated) / wall_seconds * 60:.2f} stories/min")
+    latencies = [r["seconds"] for r in generated]
+    if latencies:
+        print(
+            f"Latency per story: mean {statistics.mean(latencies):.1f}s, "
+            f"p50 {percentile(latencies, 50):.1f}s, p95 {percentile(latencies, 95):.1f}s, "
+            f"max {max(latencies):.1f}s"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate screenplays for a JSONL file of story requests")
+    parser.add_argument("input", help="JSONL file of story requests")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--story-root", default="data/batch", help="directory for per-story output")
+    parser.add_argument("--stories", type=int, default=4, help="screenplays generated at the same time")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="global cap on concurrent API requests")
+    parser.add_argument("--verbose", action="store_true", help="print every agent message")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port while running")
+    args = parser.parse_args(argv)
+    if args.metrics_port:
+        serve_metrics(metrics, args.metrics_port)
+
+    requests = read_requests(args.input)
+    started = time.perf_counter()
+    results = asyncio.run(run_batch(
+        requests,
+        args.output,
+        story_root=args.story_root,
+        stories=args.stories,
+        max_in_flight=args.max_in_flight,
+        verbose=args.verbose
+    ))
+    print_stats(results, time.perf_counter() - started)
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""End-to-end pipeline benchmark against a local mock OpenAI server.
+
+Starts the stub in services/mock_openai.py, points the agents at it and
+runs the Director at several film lengths and concurrency levels. Reports
+p50/p95 wall time, calls, tokens and cost per run, retries and peak
+memory, and writes the results as JSON. Pass --baseline with an earlier
+results file to see the change in p50/p95.
+
+    python benchmark.py --lengths 1,3,5 --concurrency 1,4 --runs 4 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Optional
+
+from services.metrics import percentile
+from services.mock_openai import MockConfig, MockOpenAIServer
+
+def configure_environment(base_url: str):
+    """Point the agents at the stub; must run before agents is imported"""
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "mock"
+    os.environ["COMPLETION_CACHE"] = "off"
+    # Keep benchmark stories out of the real library, but still pay for the writes
+    os.environ.setdefault("STORY_DB", str(Path(tempfile.mkdtemp(prefix="screenplay-bench-db-")) / "stories.db"))
+    os.environ.setdefault("OPENAI_RPM", "100000")
+    os.environ.setdefault("OPENAI_TPM", "100000000")
+    os.environ.setdefault("OPENAI_MAX_CONCURRENCY", "64")
+    os.environ.setdefault("OPENAI_INITIAL_CONCURRENCY", "64")
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_level(director, length_minutes: int, concurrency: int, runs: int, work_dir: Path) -> dict:
+    """Run the pipeline `runs` times with at most `concurrency` at once"""
+    from services.console import AgentConsole, current_console
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(n: int) -> dict:
+        story_dir = work_dir / f"len{length_minutes}_c{concurrency}_{n}"
+        async with limit:
+            current_console.set(AgentConsole(log_dir=str(story_dir / "logs"), echo=False))
+            started = time.perf_counter()
+            try:
+                await director.aexecute("A girl finds a robot in the desert before a storm", length_minutes, story_dir)
+                status = "ok"
+            except Exception as e:
+                status = f"{type(e).__name__}: {e}"
+            seconds = time.perf_counter() - started
+        with open(story_dir / "metrics.json", 'r', encoding='utf-8') as f:
+            totals = json.load(f)["totals"]
+        return {"status": status, "seconds": seconds, **totals}
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = await asyncio.gather(*[one(n) for n in range(runs)])
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ok = [r for r in results if r["status"] == "ok"]
+    walls = [r["seconds"] for r in ok] or [0.0]
+    mean = lambda field: round(sum(r[field] for r in ok) / len(ok), 3) if ok else 0
+    return {
+        "length_minutes": length_minutes,
+        "concurrency": concurrency,
+        "runs": runs,
+        "failures": len(results) - len(ok),
+        "errors": sorted({r["status"] for r in results if r["status"] != "ok"}),
+        "wall_p50": round(percentile(walls, 50), 3),
+        "wall_p95": round(percentile(walls, 95), 3),
+        "wall_max": round(max(walls), 3),
+        "elapsed": round(elapsed, 3),
+        "runs_per_minute": round(len(ok) / elapsed * 60, 2) if elapsed else 0,
+        "calls_per_run": mean("calls"),
+        "tokens_per_run": mean("total_tokens"),
+        "prompt_tokens_per_run": mean("prompt_tokens"),
+        "cost_usd_per_run": mean("cost_usd"),
+        "retries_per_run": mean("retries"),
+        "peak_memory_mb": round(peak / 2**20, 2)
+    }
+
+def compare(results: list, baseline_path: str):
+    """Print the p50/p95 change against an earlier results file"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r["length_minutes"], r["concurrency"]): r for r in json.load(f)["results"]}
+    print(f"\nAgainst {baseline_path}:")
+    for r in results:
+        before = baseline.get((r["length_minutes"], r["concurrency"]))
+        if before is None:
+            continue
+        changes = []
+        for field in ("wall_p50", "wall_p95", "calls_per_run", "tokens_per_run"):
+            if before[field]:
+                changes.append(f"{field} {(r[field] - before[field]) / before[field] * 100:+.1f}%")
+        print(f"  {r['length_minutes']} min x{r['concurrency']}: " + ", ".join(changes))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the screenplay pipeline against a mock OpenAI server")
+    parser.add_argument("--lengths", default="1,3,5", help="comma-separated film lengths in minutes")
+    parser.add_argument("--concurrency", default="1,4", help="comma-separated numbers of pipelines run at once")
+    parser.add_argument("--runs", type=int, default=4, help="pipelines per length and concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=200, help="median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread of the latency")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="completion token throughput")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with a 429")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for latency and error injection")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    server = MockOpenAIServer(config).start()
+    configure_environment(server.base_url)
+    from agents.registry import build_director
+    from services.openai_client import run_async
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="screenplay-bench-") as work_dir:
+        for length_minutes in [int(x) for x in args.lengths.split(",")]:
+            for concurrency in [int(x) for x in args.concurrency.split(",")]:
+                before = server.snapshot()
+                # A fresh Director per level so agent state does not carry over
+                result = run_async(run_level(build_director(), length_minutes, concurrency, args.runs, Path(work_dir)))
+                after = server.snapshot()
+                result["server"] = {name: after[name] - before[name] for name in after}
+                results.append(result)
+                print(
+                    f"{length_minutes} min x{concurrency}: p50 {result['wall_p50']:.2f}s, p95 {result['wall_p95']:.2f}s, "
+                    f"{result['calls_per_run']:.0f} calls/run, {result['tokens_per_run']:.0f} tokens/run, "
+                    f"{result['retries_per_run']:.1f} retries/run, peak {result['peak_memory_mb']:.1f} MB, "
+                    f"{result['failures']} failed"
+                )
+    server.shutdown()
+
+    report = {
+        "created_at": time.time(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "mock": config.as_dict(),
+        "results": results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0 if all(r["failures"] == 0 for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,39 @@
 import streamlit as st
-from agents.director import Director
-from agents.character_writer import CharacterWriter
-from agents.plot_writer import PlotWriter
-from agents.scene_descriptor import SceneDescriptor
-from agents.time_stamper import TimeStamper
-from agents.image_prompter import ImagePrompter
-from agents.screenwriter import Screenwriter
 from services.data_manager import DataManager
+from services.console import AgentConsole, format_terminal_message
+from services.checkpoint import PipelineCheckpoint
+from services.job_queue import get_job_queue, ACTIVE, LEASE_SECONDS
+from services.story_store import StoryStore, get_story_store
+from services.screenplay_assembler import PACKAGE_FILENAME, JSON_FILENAME
+from services.metrics import serve_metrics
+from agents import metrics
+from pathlib import Path
+from typing import Optional
 import os
-import base64
+import json
+import math
+import zipfile
+import time
+
+# Seconds between job status checks while a screenplay is generating
+POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+# Stop watching a job whose lease has not been renewed for this long
+# (no process is running it, and none has recovered it)
+STALE_JOB_SECONDS = float(os.getenv("JOB_STALE_SECONDS", str(3 * LEASE_SECONDS)))
+
+# Console lines kept for a watched job
+JOB_EVENT_LIMIT = 500
+
+# Stories listed per page of the sidebar library
+LIBRARY_PAGE_SIZE = int(os.getenv("LIBRARY_PAGE_SIZE", "10"))
+
+# Matches shown for a library search
+SEARCH_RESULTS = int(os.getenv("LIBRARY_SEARCH_RESULTS", "10"))
+
+# Prometheus scrape endpoint, e.g. METRICS_PORT=9100 -> http://host:9100/metrics
+if os.getenv("METRICS_PORT"):
+    serve_metrics(metrics, int(os.getenv("METRICS_PORT")))
 
 # Custom CSS for terminal-like styling
 TERMINAL_STYLE = """
@@ -301,64 +326,242 @@ TERMINAL_STYLE = """
 """
 
 # Initialize session state
-if "message_history" not in st.session_state:
-    st.session_state["message_history"] = []
+if "console" not in st.session_state:
+    st.session_state["console"] = AgentConsole()
 if "data_manager" not in st.session_state:
     st.session_state["data_manager"] = DataManager()
+if "library_page" not in st.session_state:
+    st.session_state["library_page"] = 0
+if "job_id" not in st.session_state:
+    # The job id is kept in the URL so a reloaded page finds its job again
+    st.session_state["job_id"] = st.experimental_get_query_params().get("job", [None])[0]
+
+# Whole-story artifacts that can be regenerated, with everything after them
+STAGE_LABELS = {
+    "characters": "Character sheet",
+    "plot": "Plot",
+    "scene_outlines": "Scene outline",
+    "creative_direction": "Creative direction"
+}
+
+@st.cache_resource
+def story_library() -> Optional[StoryStore]:
+    """The story store, after importing story directories that predate it (once per process)"""
+    store = get_story_store()
+    if store is not None:
+        store.import_story_dirs(DataManager().data_dir)
+    return store
+
+def submit_job(story_idea: str, length_minutes: int, story_dir, artifact: Optional[str] = None) -> str:
+    """Queue a generation and remember it for this session and URL"""
+    job_id = get_job_queue().submit(story_idea, length_minutes, story_dir, artifact)
+    st.session_state["job_id"] = job_id
+    st.experimental_set_query_params(job=job_id)
+    return job_id
+
+def show_screenplay(package_path: Path):
+    """Show the finished screenplay one scene at a time, with both exports to download"""
+    with open(package_path.with_name(JSON_FILENAME), 'r', encoding='utf-8') as f:
+        screenplay = json.load(f)
+    st.subheader(f"Generated Screenplay: {screenplay['title']}")
+    st.caption(f"{len(screenplay['scenes'])} scenes, runtime {screenplay['runtime']}")
+    
+    timestamps = {t["scene_number"]: t for t in screenplay["timestamps"]}
+    prompts = {p["scene_number"]: p["prompt"] for p in screenplay["scene_prompts"]}
+    numbers = [scene["scene_number"] for scene in screenplay["scenes"]]
+    number = st.selectbox(
+        "Scene",
+        numbers,
+        format_func=lambda n: f"Scene {n} ({timestamps[n]['start_time']}–{timestamps[n]['end_time']})"
+    )
+    scene = screenplay["scenes"][numbers.index(number)]
+    st.markdown(f"**{scene.get('setting', '')}**")
+    st.text_area("Image Prompt", value=prompts.get(number, ""), height=100)
+    st.text_area("Scene", value=scene["script"], height=400)
+    
+    col1, col2 = st.columns(2)
+    with col1, open(package_path, 'rb') as f:
+        st.download_button("Download Screenplay (.txt)", data=f, file_name=package_path.name, mime="text/plain")
+    with col2, open(package_path.with_name(JSON_FILENAME), 'rb') as f:
+        st.download_button("Download Screenplay (.json)", data=f, file_name=JSON_FILENAME, mime="application/json")
+    
+    show_regenerate(package_path.parent, number)
+
+def show_regenerate(story_dir: Path, number: int):
+    """Redo one piece of the finished story; only it and what depends on it are recomputed"""
+    checkpoint = PipelineCheckpoint(story_dir)
+    if not checkpoint.complete:
+        return
+    options = {
+        f"scene:{number}": f"Scene {number}",
+        f"image_prompt:{number}": f"Image prompt for scene {number}",
+        **STAGE_LABELS
+    }
+    with st.expander("Regenerate"):
+        artifact = st.selectbox("Artifact", list(options), format_func=options.get)
+        dependents = checkpoint.dependents(artifact)[1:]
+        parts = [STAGE_LABELS[d].lower() for d in dependents if d in STAGE_LABELS]
+        for kind, label in (("scene:", "scenes"), ("image_prompt:", "image prompts")):
+            count = sum(d.startswith(kind) for d in dependents)
+            if count:
+                parts.append(f"{count} {label}" if count > 1 else label[:-1])
+        st.caption("Also recomputed: " + (", ".join(parts) or "nothing else"))
+        if st.button("Regenerate"):
+            submit_job(checkpoint.story_idea, checkpoint.length_minutes, story_dir, artifact)
+            st.experimental_rerun()
+
+# Searchable artifacts, as named in search results
+SEARCH_KINDS = {"idea": "Idea", "characters": "Characters", "plot": "Plot", "scene": "Scene"}
+
+def select_story(data_manager: DataManager, story_id: int, story_dir: str):
+    """Reopen a library story in place of the current one"""
+    data_manager.current_story_dir = Path(story_dir)
+    st.session_state["story_id"] = story_id
+    st.session_state["job_id"] = None
+    st.experimental_set_query_params()
+    st.experimental_rerun()
+
+def show_search(store: StoryStore, data_manager: DataManager, query: str):
+    """Ranked matches across the library; each can reopen its story or seed the next one"""
+    results = store.search(query, SEARCH_RESULTS)
+    if not results:
+        st.caption("No matches")
+    for hit in results:
+        label = SEARCH_KINDS[hit["kind"]] + (f" {hit['number']}" if hit["kind"] == "scene" else "")
+        st.markdown(f"**{hit['title'] or 'Untitled'}** · {label}")
+        st.caption(hit["snippet"])
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Open", key=f"hit_open_{hit['id']}"):
+                select_story(data_manager, hit["story_id"], hit["story_dir"])
+        with col2:
+            if st.button("Use as seed", key=f"hit_seed_{hit['id']}"):
+                seed = store.document(hit["id"])["content"]
+                if hit["kind"] != "idea":
+                    # Keep what was typed and carry the matched text over as material to build on
+                    seed = f"{st.session_state.get('story_idea', '')}\n\n{label} to reuse:\n{seed}".strip()
+                st.session_state["story_idea"] = seed
 
-def format_terminal_message(message: str) -> str:
-    """Format a message for terminal display"""
-    if "Error" in message:
-        return f'<div class="terminal-message error-message">{message}</div>'
-    elif any(role in message for role in ["Director", "Writer", "Developer", "Timer", "Prompter"]):
-        return f'<div class="terminal-message agent-message">{message}</div>'
-    else:
-        return f'<div class="terminal-message system-message">{message}</div>'
-
-def get_binary_file_downloader_html(bin_file, file_label='File'):
-    with open(bin_file, 'rb') as f:
-        data = f.read()
-    bin_str = base64.b64encode(data).decode()
-    href = f'<a href="data:application/octet-stream;base64,{bin_str}" download="{os.path.basename(bin_file)}">Download {file_label}</a>'
-    return href
-
-def initialize_agents():
-    """Initialize all agents"""
-    director = Director()
-    director.character_writer = CharacterWriter()
-    director.plot_writer = PlotWriter()
-    director.scene_descriptor = SceneDescriptor()
-    director.time_stamper = TimeStamper()
-    director.image_prompter = ImagePrompter()
-    director.screenwriter = Screenwriter()
-    return director
+def show_library(store: StoryStore, data_manager: DataManager):
+    """One page of saved stories, newest first, or search results; picking one reopens it"""
+    st.subheader("Story Library")
+    query = st.text_input("Search stories", key="library_query")
+    if query.strip():
+        show_search(store, data_manager, query)
+        return
+    page = st.session_state["library_page"]
+    stories, total = store.list_stories(page, LIBRARY_PAGE_SIZE)
+    for story in stories:
+        label = f"{story['title'] or 'Untitled'} · {time.strftime('%Y-%m-%d %H:%M', time.localtime(story['updated_at']))}"
+        if story["status"] != "complete":
+            label += " (incomplete)"
+        if st.button(label, key=f"story_{story['id']}"):
+            select_story(data_manager, story["id"], story["story_dir"])
+    pages = max(1, math.ceil(total / LIBRARY_PAGE_SIZE))
+    col1, col2 = st.columns(2)
+    with col1:
+        if page > 0 and st.button("Newer", key="library_newer"):
+            st.session_state["library_page"] = page - 1
+            st.experimental_rerun()
+    with col2:
+        if page + 1 < pages and st.button("Older", key="library_older"):
+            st.session_state["library_page"] = page + 1
+            st.experimental_rerun()
+    st.caption(f"Page {page + 1} of {pages}, {total} stories")
+
+def open_story(store: StoryStore, story_dir: Path) -> Optional[Path]:
+    """Package of a finished story from the library, rebuilt from the store if its files are gone"""
+    checkpoint = PipelineCheckpoint(story_dir)
+    if not checkpoint.complete:
+        return None
+    # The manifest is the source of truth; catch the store up if it missed a change
+    checkpoint.sync_store()
+    package_path = story_dir / PACKAGE_FILENAME
+    if not (package_path.exists() and (story_dir / JSON_FILENAME).exists()):
+        package_path = store.export_story(st.session_state["story_id"], story_dir)
+    return package_path
+
+def job_stale(job: dict) -> bool:
+    """An active job whose lease nobody has renewed in STALE_JOB_SECONDS"""
+    lease = job["heartbeat_at"] or job["started_at"] or job["created_at"]
+    return job["status"] in ACTIVE and time.time() - lease > STALE_JOB_SECONDS
+
+def job_events(queue, job_id: str) -> bool:
+    """Fetch a job's new or rewritten console lines; True if anything changed"""
+    seen = st.session_state.get("job_events")
+    if seen is None or seen["job_id"] != job_id:
+        seen = st.session_state["job_events"] = {"job_id": job_id, "version": -1, "lines": {}}
+    changed, seen["version"] = queue.events_since(job_id, seen["version"])
+    # Only the changed lines are formatted again
+    seen["lines"].update((seq, format_terminal_message(message)) for seq, message in changed.items())
+    for seq in sorted(seen["lines"])[:-JOB_EVENT_LIMIT]:
+        del seen["lines"][seq]
+    return bool(changed)
 
 def main():
+    # Styles are sent once per run, not with every console update
+    st.markdown(TERMINAL_STYLE, unsafe_allow_html=True)
     st.title("Creative Director Screenwriter")
+    console = st.session_state["console"]
+    data_manager = st.session_state["data_manager"]
+    queue = get_job_queue()
+    store = story_library()
+    job = queue.get(st.session_state["job_id"]) if st.session_state["job_id"] else None
+    if job and data_manager.current_story_dir is None:
+        # Page reloaded: reattach to the job's workspace
+        data_manager.current_story_dir = Path(job["story_dir"])
     
     # Sidebar
     with st.sidebar:
         st.title("Story Controls")
         if st.button("Start New Story"):
-            st.session_state["data_manager"].clear_current_story()
-            st.session_state["data_manager"].create_new_story()
-            st.session_state["message_history"] = []
+            if store is None and not (job and job["status"] in ACTIVE):
+                data_manager.clear_current_story()
+            # With a library the story stays listed; just detach from it
+            data_manager.current_story_dir = None
+            st.session_state["story_id"] = None
+            st.session_state["job_id"] = None
+            st.experimental_set_query_params()
+            console.clear()
             st.experimental_rerun()
             
         if st.button("Save Story"):
             try:
                 zip_path = st.session_state["data_manager"].create_zip_archive()
-                st.markdown(get_binary_file_downloader_html(zip_path, 'Story Archive'), unsafe_allow_html=True)
+                # Served from Streamlit's media endpoint, not inlined as base64
+                with open(zip_path, 'rb') as f:
+                    st.download_button(
+                        "Download Story Archive",
+                        data=f,
+                        file_name=os.path.basename(zip_path),
+                        mime="application/zip"
+                    )
             except ValueError as e:
                 st.error("No story to save yet!")
-    
-    # Initialize agents
-    director = initialize_agents()
+            except (OSError, zipfile.BadZipFile) as e:
+                st.error(f"Could not build the story archive: {e}")
+        
+        # Offer to finish a run that failed part-way through
+        resume_button = False
+        story_dir = data_manager.current_story_dir
+        job_active = job is not None and job["status"] in ACTIVE and not job_stale(job)
+        if not job_active and story_dir and PipelineCheckpoint.exists(story_dir) and not PipelineCheckpoint(story_dir).complete:
+            resume_button = st.button("Resume Interrupted Run")
+
+        if store is not None:
+            if not job_active and story_dir and st.button("Delete Story"):
+                store.delete_story(story_dir)
+                data_manager.clear_current_story()
+                st.session_state["story_id"] = None
+                st.session_state["job_id"] = None
+                st.experimental_set_query_params()
+                st.experimental_rerun()
+            show_library(store, data_manager)
     
     # User inputs and generate button
     col1, col2 = st.columns([3, 1])
     with col1:
-        story_idea = st.text_area("Enter your story idea:", height=100)
+        story_idea = st.text_area("Enter your story idea:", height=100, key="story_idea")
     with col2:
         length_minutes = st.slider("Film length (minutes):", min_value=1, max_value=10, value=5)
         generate_button = st.button("Generate Screenplay")
@@ -366,41 +569,58 @@ def main():
     # Create message container
     message_container = st.empty()
     
-    # Function to update terminal display
-    def update_terminal():
-        messages_html = "\n".join([format_terminal_message(msg) for msg in st.session_state["message_history"]])
+    # Function to draw the terminal; the console decides when to call it
+    def render_terminal(messages_html: str):
         message_container.markdown(
-            f"{TERMINAL_STYLE}<div class='console-title'>Agent Communication Console</div><div class='terminal'><div id='terminal-messages'>{messages_html}</div></div>",
+            f"<div class='console-title'>Agent Communication Console</div><div class='terminal'><div id='terminal-messages'>{messages_html}</div></div>",
             unsafe_allow_html=True
         )
+    console.renderer = render_terminal
     
     # Initial terminal display
-    update_terminal()
+    console.refresh(force=True)
     
-    if generate_button:
-        if not story_idea:
+    if generate_button or resume_button:
+        if generate_button and not story_idea:
             st.error("Please enter a story idea.")
             return
             
-        try:
-            # Store container reference for agents
-            st.session_state["message_container"] = message_container
-            st.session_state["update_terminal"] = update_terminal
-            
-            screenplay = director.execute(story_idea, length_minutes)
-            st.session_state["data_manager"].save_output(screenplay, "screenplay_package.txt")
-            
-            # Final terminal update
-            update_terminal()
-            
-            # Display final screenplay in a separate text area
-            st.subheader("Generated Screenplay")
-            st.text_area("Final Screenplay", value=screenplay, height=400)
-            
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
-            st.session_state["message_history"].append(f"❌ Error: {str(e)}")
-            update_terminal()
+        if resume_button:
+            checkpoint = PipelineCheckpoint(data_manager.current_story_dir)
+            submit_job(checkpoint.story_idea, checkpoint.length_minutes, data_manager.current_story_dir)
+        else:
+            # Every generation gets its own workspace, so concurrent
+            # sessions and instances never share scene files
+            story_dir = data_manager.create_new_story()
+            submit_job(story_idea, length_minutes, story_dir)
+        job = queue.get(st.session_state["job_id"])
+
+    if job:
+        # The job runs on the queue's worker pool; this script run only
+        # watches it, so reruns and reloads leave the generation untouched
+        status = st.empty()
+        job_events(queue, job["id"])
+        lines = st.session_state["job_events"]["lines"]
+        render_terminal("\n".join(lines[seq] for seq in sorted(lines)))
+        while job["status"] in ACTIVE and not job_stale(job):
+            status.info(f"Screenplay job {job['status']}…")
+            time.sleep(POLL_SECONDS)
+            job = queue.get(job["id"])
+            # Redraw only when lines were added or rewritten
+            if job_events(queue, job["id"]):
+                render_terminal("\n".join(lines[seq] for seq in sorted(lines)))
+        status.empty()
+
+        if job_stale(job):
+            st.error("The screenplay job stopped responding. Use \"Resume Interrupted Run\" to finish it.")
+        elif job["status"] == "done":
+            show_screenplay(Path(job["result_path"]))
+        else:
+            st.error(f"An error occurred: {job['error']}")
+    elif store is not None and st.session_state.get("story_id") and data_manager.current_story_dir:
+        package_path = open_story(store, data_manager.current_story_dir)
+        if package_path is not None:
+            show_screenplay(package_path)
 
     # Add footer
     st.markdown("""
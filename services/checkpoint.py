@@ -0,0 +1,290 @@
+import copy
+import json
+import asyncio
+import threading
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.exc import SQLAlchemyError
+from services.data_manager import atomic_write
+from services.story_store import StoryStore, get_story_store
+
+# Pipeline stages in order; each feeds every stage after it
+STAGES = ("creative_direction", "characters", "plot", "scene_outlines")
+
+def parse_artifact(artifact: str) -> Tuple[str, Optional[int]]:
+    """Split an artifact id: a stage name, scene:7 or image_prompt:7"""
+    kind, _, number = artifact.partition(":")
+    if kind in STAGES and not number:
+        return kind, None
+    if kind in ("scene", "image_prompt") and number.isdigit():
+        return kind, int(number)
+    raise ValueError(f"Unknown artifact {artifact!r}")
+
+class PipelineCheckpoint:
+    """Manifest of finished pipeline work, stored as manifest.json in a story directory.
+
+    Stage outputs (creative direction, characters, plot, scene outlines) are
+    kept in the manifest itself; scene text lives in scenes/scene_XX.txt and
+    the manifest records its file and timestamp once the scene is complete.
+    invalidate() forgets one artifact and everything computed from it, so
+    the next run recomputes just those.
+
+    The manifest is the source of truth. Every change is also written
+    through to the story store, which indexes the library, tagged with the
+    manifest revision it applies. On an event loop those writes run in a
+    worker thread, one at a time and in order; synced() waits for them.
+    A store that missed a change is re-imported from the manifest when a
+    run starts or sync_store() is called.
+    """
+
+    FILENAME = "manifest.json"
+
+    def __init__(self, story_dir, store: Optional[StoryStore] = None):
+        self.story_dir = Path(story_dir)
+        self.path = self.story_dir / self.FILENAME
+        self.store = store if store is not None else get_story_store()
+        self._lock = threading.RLock()
+        self.data = self._load()
+        self.revision = self.data.get("revision", 0)
+        # Last pending store write; each one waits for the write before it
+        self._writes: Optional[asyncio.Future] = None
+        # Set when a store write failed; later writes are skipped until the store is re-imported
+        self.store_error: Optional[Exception] = None
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, indexed: bool = True):
+        """Write the manifest; indexed is False for fields the store does not keep"""
+        if indexed:
+            self.revision += 1
+        self.data["revision"] = self.revision
+        atomic_write(self.path, json.dumps(self.data, ensure_ascii=False, indent=2))
+
+    def _write_through(self, write: Callable, resync: bool = False):
+        """Apply the change just saved to the manifest to the story store.
+
+        Without a running event loop the write happens now; on one it runs
+        via asyncio.to_thread, chained after the previous write. resync
+        marks writes that bring the whole story up to date.
+        """
+        apply = partial(self._apply, write, resync)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            apply()
+            return
+        self._writes = asyncio.ensure_future(self._chain(self._writes, apply))
+
+    @staticmethod
+    async def _chain(previous: Optional[asyncio.Future], apply: Callable):
+        if previous is not None:
+            await previous
+        await asyncio.to_thread(apply)
+
+    def _apply(self, write: Callable, resync: bool = False):
+        if self.store_error is not None and not resync:
+            # The store already lags the manifest; sync_store() catches it up
+            return
+        try:
+            write()
+            if resync:
+                self.store_error = None
+        except (SQLAlchemyError, OSError) as e:
+            self.store_error = e
+
+    async def synced(self):
+        """Wait for pending store writes, then re-import the manifest if any of them failed"""
+        if self._writes is not None:
+            await self._writes
+        if self.store_error is not None:
+            await asyncio.to_thread(self.sync_store)
+
+    def sync_store(self):
+        """Re-import the manifest into the story store if the store does not hold its latest revision.
+
+        Called when a story is opened; also registers stories the store has
+        never seen.
+        """
+        if self.store is None or self.story_idea is None:
+            return
+        with self._lock:
+            manifest = copy.deepcopy(self.data)
+        if self.store_error is None and self.store.revision(self.story_dir) == manifest["revision"]:
+            return
+        self._apply(partial(self.store.sync_story, self.story_dir, manifest, replace=True), resync=True)
+
+    def _sync(self, manifest: dict, replace: bool):
+        """Register a starting run, re-importing it if the store missed a change"""
+        replace = replace or self.store.revision(self.story_dir) != manifest["revision"]
+        self.store.sync_story(self.story_dir, manifest, replace=replace)
+
+    @classmethod
+    def exists(cls, story_dir) -> bool:
+        return (Path(story_dir) / cls.FILENAME).exists()
+
+    def start(self, story_idea: str, length_minutes: int):
+        """Begin a fresh run, discarding progress saved for different inputs"""
+        with self._lock:
+            changed = self.data.get("story_idea") != story_idea or self.data.get("length_minutes") != length_minutes
+            if changed:
+                self.data = {
+                    "story_idea": story_idea,
+                    "length_minutes": length_minutes,
+                    "stages": {},
+                    "scenes": {},
+                    "image_prompts": {},
+                    "complete": False
+                }
+            self._save(indexed=changed)
+            if self.store is not None:
+                self._write_through(partial(self._sync, copy.deepcopy(self.data), changed), resync=True)
+
+    def reset(self):
+        """Forget all saved progress"""
+        with self._lock:
+            self.data = {}
+            self._save()
+            if self.store is not None:
+                self._write_through(partial(self.store.delete_story, self.story_dir), resync=True)
+
+    @property
+    def story_idea(self) -> Optional[str]:
+        return self.data.get("story_idea")
+
+    @property
+    def length_minutes(self) -> Optional[int]:
+        return self.data.get("length_minutes")
+
+    @property
+    def complete(self) -> bool:
+        return self.data.get("complete", False)
+
+    def stage(self, name: str) -> Optional[str]:
+        """Saved output of a stage, or None if it has not finished"""
+        return self.data.get("stages", {}).get(name)
+
+    def set_stage(self, name: str, value: str):
+        with self._lock:
+            self.data.setdefault("stages", {})[name] = value
+            self._save()
+            if self.store is not None:
+                self._write_through(partial(self.store.save_stage, self.story_dir, name, value, self.revision))
+
+    def scene(self, i: int) -> Optional[dict]:
+        """Saved record of a finished scene whose file is still on disk"""
+        record = self.data.get("scenes", {}).get(str(i))
+        if record is None or record.get("stale") or not (self.story_dir / record["file"]).exists():
+            return None
+        return record
+
+    def additional_scenes(self, first: int) -> Dict[int, dict]:
+        """Records of the fill scenes numbered on from first, including ones marked for rewriting"""
+        scenes = self.data.get("scenes", {})
+        found = {}
+        i = first
+        while str(i) in scenes and scenes[str(i)].get("additional"):
+            found[i] = scenes[str(i)]
+            i += 1
+        return found
+
+    def set_scene(self, i: int, scene_file: Path, timestamp: str, additional: bool = False):
+        with self._lock:
+            self.data.setdefault("scenes", {})[str(i)] = {
+                "file": str(Path(scene_file).relative_to(self.story_dir)),
+                "timestamp": timestamp,
+                "additional": additional
+            }
+            self._save()
+            if self.store is not None:
+                self._write_through(partial(self._save_scene, i, Path(scene_file), timestamp, additional, self.revision))
+
+    def _save_scene(self, i: int, scene_file: Path, timestamp: str, additional: bool, revision: int):
+        text = scene_file.read_text(encoding='utf-8')
+        self.store.save_scene(self.story_dir, i, text, timestamp, additional, revision)
+
+    def image_prompts(self) -> Dict[int, str]:
+        return {int(i): prompt for i, prompt in self.data.get("image_prompts", {}).items()}
+
+    def set_image_prompts(self, prompts: Dict[int, str]):
+        with self._lock:
+            saved = self.data.setdefault("image_prompts", {})
+            saved.update({str(i): prompt for i, prompt in prompts.items()})
+            self._save()
+            if self.store is not None:
+                self._write_through(partial(self.store.save_image_prompts, self.story_dir, dict(prompts), self.revision))
+
+    @property
+    def fill_rounds(self) -> int:
+        """Rounds of extra scenes accepted so far"""
+        return self.data.get("fill_rounds", 0)
+
+    def add_fill_round(self):
+        with self._lock:
+            self.data["fill_rounds"] = self.data.get("fill_rounds", 0) + 1
+            self._save(indexed=False)
+
+    def dependents(self, artifact: str) -> List[str]:
+        """The artifact and every saved artifact computed from it, in pipeline order"""
+        kind, number = parse_artifact(artifact)
+        scenes = self.data.get("scenes", {})
+        if kind in STAGES:
+            # Later stages take this one as input, and the outline drives every scene and prompt
+            return (
+                list(STAGES[STAGES.index(kind):])
+                + [f"scene:{i}" for i in sorted(map(int, scenes))]
+                + [f"image_prompt:{i}" for i in sorted(self.image_prompts())]
+            )
+        if str(number) not in scenes:
+            raise ValueError(f"Scene {number} has not been written")
+        if kind == "scene" and scenes[str(number)].get("additional"):
+            # Fill scenes have no outline; their image prompt is drawn from the scene text
+            return [artifact, f"image_prompt:{number}"]
+        return [artifact]
+
+    def invalidate(self, artifact: str) -> List[str]:
+        """Forget an artifact and its dependents so the next run recomputes them"""
+        with self._lock:
+            invalidated = self.dependents(artifact)
+            stages = self.data.setdefault("stages", {})
+            scenes = self.data.setdefault("scenes", {})
+            prompts = self.data.setdefault("image_prompts", {})
+            rewrite_all = parse_artifact(artifact)[0] in STAGES
+            for item in invalidated:
+                kind, number = parse_artifact(item)
+                if kind in STAGES:
+                    stages.pop(kind, None)
+                elif kind == "image_prompt":
+                    prompts.pop(str(number), None)
+                elif rewrite_all:
+                    # A new outline may have fewer scenes, so old files go too,
+                    # and the runtime is topped up from scratch
+                    self.data["fill_rounds"] = 0
+                    record = scenes.pop(str(number))
+                    (self.story_dir / record["file"]).unlink(missing_ok=True)
+                elif scenes[str(number)].get("additional"):
+                    # Kept so the fill scene is rewritten in its place, at its old length
+                    scenes[str(number)]["stale"] = True
+                else:
+                    scenes.pop(str(number))
+            self.data["complete"] = False
+            self._save()
+            if self.store is not None:
+                self._write_through(partial(self.store.forget, self.story_dir, invalidated, self.revision))
+        return invalidated
+
+    def mark_complete(self, title: Optional[str] = None, runtime_seconds: Optional[int] = None):
+        with self._lock:
+            self.data["complete"] = True
+            if title is not None:
+                self.data["title"] = title
+            if runtime_seconds is not None:
+                self.data["runtime_seconds"] = runtime_seconds
+            self._save()
+            if self.store is not None:
+                self._write_through(partial(self.store.mark_complete, self.story_dir, title, runtime_seconds, self.revision))
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+MODES = ("off", "on", "replay")
+
+# Set while regenerating an artifact, so it is not served the reply it was made from
+refresh_cache: ContextVar[bool] = ContextVar("refresh_cache", default=False)
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a prompt has no recorded completion"""
+
+class CompletionCache:
+    """Two-tier (memory LRU + disk) cache for chat completions.
+
+    Entries are content-addressed by a hash of model, messages, temperature
+    and response format.
+    In "replay" mode the cache is read-only, ignores the TTL and raises
+    CacheMissError instead of letting a call reach the API.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "data/cache/completions",
+        mode: str = "on",
+        max_memory_items: int = 256,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.cache_dir = Path(cache_dir)
+        self.mode = mode
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._disk_bytes = sum(p.stat().st_size for p in self.cache_dir.glob("*/*.json"))
+
+    @classmethod
+    def from_env(cls) -> Optional["CompletionCache"]:
+        """Build the cache from COMPLETION_CACHE* settings, or None when disabled"""
+        mode = os.getenv("COMPLETION_CACHE", "off").lower()
+        if mode == "off":
+            return None
+        ttl = float(os.getenv("COMPLETION_CACHE_TTL", str(7 * 24 * 3600)))
+        return cls(
+            cache_dir=os.getenv("COMPLETION_CACHE_DIR", "data/cache/completions"),
+            mode=mode,
+            max_memory_items=int(os.getenv("COMPLETION_CACHE_MEMORY_ITEMS", "256")),
+            max_disk_bytes=int(float(os.getenv("COMPLETION_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            ttl_seconds=ttl if ttl > 0 else None
+        )
+
+    @staticmethod
+    def key(model: str, messages: list, temperature: float, response_format: Optional[dict] = None) -> str:
+        """Content hash identifying a completion request"""
+        request = {"model": model, "messages": messages, "temperature": temperature}
+        # Only hashed when set, so plain requests keep the keys they were cached under
+        if response_format is not None:
+            request["response_format"] = response_format
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _expired(self, created: float) -> bool:
+        if self.mode == "replay" or not self.ttl_seconds:
+            return False
+        return time.time() - created > self.ttl_seconds
+
+    def _remember(self, key: str, created: float, content: str):
+        self._memory[key] = (created, content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for key, or None on a miss"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                record = None
+
+            if record is not None and self._expired(record["created"]):
+                self._discard(path)
+                record = None
+
+            if record is None:
+                self.misses += 1
+                if self.mode == "replay":
+                    raise CacheMissError(f"No recorded completion for {key}")
+                return None
+
+            # Touch the file so disk eviction is least-recently-used
+            os.utime(path, None)
+            self._remember(key, record["created"], record["content"])
+            self.disk_hits += 1
+            return record["content"]
+
+    def set(self, key: str, content: str, model: str = ""):
+        """Store a completion in both tiers"""
+        if self.mode == "replay":
+            return
+        created = time.time()
+        data = json.dumps(
+            {"created": created, "model": model, "content": content},
+            ensure_ascii=False
+        ).encode("utf-8")
+
+        with self._lock:
+            self._remember(key, created, content)
+            path = self._path(key)
+            path.parent.mkdir(exist_ok=True)
+            previous = path.stat().st_size if path.exists() else 0
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._disk_bytes += len(data) - previous
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _discard(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            self._disk_bytes -= size
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drop least recently used disk entries until under 90% of the size limit"""
+        entries = sorted(self.cache_dir.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+        for path in entries:
+            if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            self._memory.pop(path.stem, None)
+            self._discard(path)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process"""
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "disk_bytes": self._disk_bytes
+        }
@@ -0,0 +1,120 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Optional
+
+def format_terminal_message(message: str) -> str:
+    """Format a message for terminal display"""
+    if "Error" in message:
+        return f'<div class="terminal-message error-message">{message}</div>'
+    elif any(role in message for role in ["Director", "Writer", "Developer", "Timer", "Prompter"]):
+        return f'<div class="terminal-message agent-message">{message}</div>'
+    else:
+        return f'<div class="terminal-message system-message">{message}</div>'
+
+class AgentConsole:
+    """Bounded, incrementally rendered log of agent messages.
+
+    Only the newest max_messages are kept, each message is formatted once,
+    and renders are coalesced to at most one every refresh_ms. Messages
+    longer than max_chars are shortened for display; the full text is
+    written under log_dir once the message is final, so a long streamed
+    reply is not rewritten to disk on every update.
+    """
+
+    def __init__(
+        self,
+        max_messages: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        refresh_ms: Optional[int] = None,
+        log_dir: Optional[str] = None,
+        echo: bool = True
+    ):
+        self.max_messages = max_messages or int(os.getenv("CONSOLE_MAX_MESSAGES", "500"))
+        self.max_chars = max_chars or int(os.getenv("CONSOLE_MAX_CHARS", "2000"))
+        self.refresh_interval = (refresh_ms or int(os.getenv("CONSOLE_REFRESH_MS", "200"))) / 1000
+        self.log_dir = Path(log_dir or "data/logs") / uuid.uuid4().hex
+        # Also print every message to stdout
+        self.echo = echo
+        # Called with the console HTML whenever it should be redrawn
+        self.renderer: Optional[Callable[[str], None]] = None
+        self._entries = OrderedDict()  # message id -> formatted HTML
+        self._next_id = 0
+        self._last_render = 0.0
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _shorten(self, message_id: int, text: str, final: bool = True) -> str:
+        """Truncate long text for display, keeping the full text on disk once it is final"""
+        if len(text) <= self.max_chars:
+            return text
+        hidden = len(text) - self.max_chars
+        if not final:
+            return f"{text[:self.max_chars]}… [{hidden} more characters so far]"
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        path = self.log_dir / f"message_{message_id:05d}.txt"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return f"{text[:self.max_chars]}… [{hidden} more characters in {path}]"
+
+    def append(self, text: str) -> int:
+        """Add a message and return its id"""
+        with self._lock:
+            message_id = self._next_id
+            self._next_id += 1
+            self._entries[message_id] = format_terminal_message(self._shorten(message_id, text))
+            while len(self._entries) > self.max_messages:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        self.refresh()
+        return message_id
+
+    def replace(self, message_id: int, text: str, final: bool = False):
+        """Rewrite a message in place, e.g. while a response streams in; final marks its last text"""
+        with self._lock:
+            if message_id not in self._entries:
+                # Already scrolled out of the buffer, but the full text still goes to disk
+                if final:
+                    self._shorten(message_id, text)
+                return
+            self._entries[message_id] = format_terminal_message(self._shorten(message_id, text, final))
+            self._dirty = True
+        self.refresh()
+
+    def clear(self):
+        """Drop all messages"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.refresh(force=True)
+
+    def html(self) -> str:
+        """HTML for the buffered messages, oldest first"""
+        with self._lock:
+            return "\n".join(self._entries.values())
+
+    def refresh(self, force: bool = False):
+        """Redraw if there are pending changes and the refresh interval has passed"""
+        if self.renderer is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and (not self._dirty or now - self._last_render < self.refresh_interval):
+                return
+            self._last_render = now
+            self._dirty = False
+            html = "\n".join(self._entries.values())
+        self.renderer(html)
+
+    def flush(self):
+        """Draw any coalesced changes now, e.g. before waiting on a slow call"""
+        if self._dirty:
+            self.refresh(force=True)
+
+# Console for the pipeline running in the current thread or asyncio task;
+# headless runs set this so agents never need a Streamlit session
+current_console: ContextVar[Optional[AgentConsole]] = ContextVar("current_console", default=None)
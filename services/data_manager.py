@@ -1,13 +1,107 @@
 import os
 import json
+import uuid
 import shutil
+import tempfile
+import zipfile
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, Tuple
+
+# Story subdirectories left out of the archive
+ARCHIVE_EXCLUDE = ("logs",)
+
+def new_run_id() -> str:
+    """Unique, sortable run ID: timestamp plus a random suffix, so runs started
+    in the same second (or on another instance sharing the disk) never collide"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+def atomic_write(path, content: str):
+    """Write a text file so readers only ever see the old or the new content"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _archive_files(story_dir: Path) -> Dict[str, Tuple[int, int]]:
+    """Archive entry name -> (size, mtime_ns) for every file worth archiving"""
+    files = {}
+    for path in sorted(story_dir.rglob("*")):
+        relative = path.relative_to(story_dir)
+        if not path.is_file() or relative.parts[0] in ARCHIVE_EXCLUDE or path.name.startswith("."):
+            continue
+        stat = path.stat()
+        files[relative.as_posix()] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+def update_story_archive(story_dir) -> Path:
+    """Bring story_dir.zip up to date and return its path.
+
+    The archive is cached next to an index of what it holds. Nothing is
+    done if no file changed; files that are only new are appended to a
+    copy of the archive. Any other change, or a copy that is not a valid
+    zip, rebuilds it from scratch. Either way the result is written to a
+    temp file that replaces the old archive, so a crash never leaves a
+    half-written zip behind. Files are streamed from disk, so memory
+    stays flat however large the story gets.
+    """
+    story_dir = Path(story_dir)
+    zip_path = Path(f"{story_dir}.zip")
+    index_path = Path(f"{zip_path}.index.json")
+    files = _archive_files(story_dir)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = {name: tuple(value) for name, value in json.load(f).items()}
+    except (OSError, ValueError):
+        index = None
+    if not zip_path.exists():
+        index = None
+
+    if index == files:
+        return zip_path
+    append = (
+        index is not None
+        and all(files.get(name) == value for name, value in index.items())
+        # Mode 'a' would tack a second archive onto a file that is not a zip
+        and zipfile.is_zipfile(zip_path)
+    )
+    fd, tmp_path = tempfile.mkstemp(dir=zip_path.parent, prefix=f".{zip_path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        if append:
+            shutil.copyfile(zip_path, tmp_path)
+            try:
+                with zipfile.ZipFile(tmp_path, 'a', zipfile.ZIP_DEFLATED) as archive:
+                    for name in files:
+                        if name not in index:
+                            archive.write(story_dir / name, name)
+            except zipfile.BadZipFile:
+                append = False
+        if not append:
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for name in files:
+                    archive.write(story_dir / name, name)
+        os.replace(tmp_path, zip_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    atomic_write(index_path, json.dumps(files))
+    return zip_path
 
 class DataManager:
-    def __init__(self):
-        self.data_dir = Path("data")
+    """Owns the per-run workspaces under data/: one story_<run id> directory
+    per generation, holding its manifest, scenes and outputs"""
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = Path(data_dir)
         self.current_story_dir = None
+        self.run_id = None
         self.ensure_data_directory()
     
     def ensure_data_directory(self):
@@ -15,10 +109,11 @@ class DataManager:
         self.data_dir.mkdir(exist_ok=True)
     
     def create_new_story(self):
-        """Create a new story directory"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.current_story_dir = self.data_dir / f"story_{timestamp}"
-        self.current_story_dir.mkdir(exist_ok=True)
+        """Create a new story directory with a fresh run ID"""
+        self.run_id = new_run_id()
+        self.current_story_dir = self.data_dir / f"story_{self.run_id}"
+        # exist_ok=False: a workspace is never shared between runs
+        (self.current_story_dir / "scenes").mkdir(parents=True)
         return self.current_story_dir
     
     def save_output(self, content: str, filename: str):
@@ -27,21 +122,23 @@ class DataManager:
             self.create_new_story()
         
         filepath = self.current_story_dir / filename
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        atomic_write(filepath, content)
         return filepath
     
     def create_zip_archive(self) -> str:
-        """Create a zip archive of the current story"""
+        """Zip archive of the current story, rebuilt only when the story changed"""
         if not self.current_story_dir:
             raise ValueError("No current story to archive")
         
-        zip_path = str(self.current_story_dir) + ".zip"
-        shutil.make_archive(str(self.current_story_dir), 'zip', self.current_story_dir)
-        return zip_path
+        return str(update_story_archive(self.current_story_dir))
     
     def clear_current_story(self):
         """Clear the current story data"""
         if self.current_story_dir and self.current_story_dir.exists():
             shutil.rmtree(self.current_story_dir)
-        self.current_story_dir = None 
\ No newline at end of file
+        if self.current_story_dir:
+            # Cached archive and its index
+            for suffix in (".zip", ".zip.index.json"):
+                Path(f"{self.current_story_dir}{suffix}").unlink(missing_ok=True)
+        self.current_story_dir = None
+        self.run_id = None
@@ -0,0 +1,94 @@
+import math
+from typing import List
+
+# Screen-time limits for one scene, in seconds
+MIN_SCENE_SECONDS = 15
+MAX_SCENE_SECONDS = 120
+TYPICAL_SCENE_SECONDS = 45
+
+# Acceptable runtime window, as fractions of the target
+MIN_RUNTIME_RATIO = 0.9
+MAX_RUNTIME_RATIO = 1.1
+
+def _round5(seconds: float) -> int:
+    return int(5 * round(seconds / 5))
+
+def _share(weights: List[float], target_seconds: float) -> List[float]:
+    """Split target_seconds in proportion to weights, holding scenes that hit a limit at it"""
+    budgets = [None] * len(weights)
+    while None in budgets:
+        free = [i for i, budget in enumerate(budgets) if budget is None]
+        share = (target_seconds - sum(b for b in budgets if b is not None)) / sum(weights[i] for i in free)
+        over = [i for i in free if weights[i] * share > MAX_SCENE_SECONDS]
+        under = [i for i in free if weights[i] * share < MIN_SCENE_SECONDS]
+        if not over and not under:
+            for i in free:
+                budgets[i] = weights[i] * share
+        # Pin one side at a time; the rest are shared out again on the next pass
+        for i in over or under:
+            budgets[i] = MAX_SCENE_SECONDS if over else MIN_SCENE_SECONDS
+    return budgets
+
+def _round_to_total(budgets: List[float], target_seconds: int) -> List[int]:
+    """Round each budget to 5 seconds so that they still add up to the target (rounded to 5)"""
+    steps = [int(b // 5) for b in budgets]
+    low, high = MIN_SCENE_SECONDS // 5, MAX_SCENE_SECONDS // 5
+    wanted = min(len(budgets) * high, max(len(budgets) * low, round(target_seconds / 5)))
+    # Largest remainders round up first, smallest round down first
+    order = sorted(range(len(budgets)), key=lambda i: budgets[i] - 5 * steps[i], reverse=True)
+    for i in order:
+        if sum(steps) >= wanted:
+            break
+        if steps[i] < high:
+            steps[i] += 1
+    for i in reversed(order):
+        if sum(steps) <= wanted:
+            break
+        if steps[i] > low:
+            steps[i] -= 1
+    return [5 * step for step in steps]
+
+def plan_scene_durations(scenes: List[dict], target_seconds: int) -> List[int]:
+    """Split the target runtime across the outlined scenes.
+
+    Scenes with more outlined action and dialogue get a larger share (at
+    most twice, at least half the average) and every budget stays within
+    MIN/MAX_SCENE_SECONDS, rounded to 5 seconds. The budgets add up to the
+    target (to the nearest 5 seconds) whenever the limits allow it.
+    """
+    if not scenes:
+        return []
+    sizes = [len(scene.get("action", "")) + len(scene.get("dialogue_summary", "")) for scene in scenes]
+    mean = sum(sizes) / len(sizes) or 1
+    weights = [min(2.0, max(0.5, size / mean)) for size in sizes]
+    return _round_to_total(_share(weights, target_seconds), target_seconds)
+
+def plan_fill(current_seconds: int, target_seconds: int, max_scenes: int) -> List[int]:
+    """Durations of the extra scenes needed to bring the runtime into range.
+
+    Empty when the runtime already reaches MIN_RUNTIME_RATIO of the target.
+    Otherwise enough scenes (at most max_scenes) to cover the shortfall
+    without going past MAX_RUNTIME_RATIO, splitting it evenly.
+    """
+    if current_seconds >= target_seconds * MIN_RUNTIME_RATIO or max_scenes < 1:
+        return []
+    shortfall = target_seconds - current_seconds
+    count = min(max_scenes, max(1, math.ceil(shortfall / MAX_SCENE_SECONDS), round(shortfall / TYPICAL_SCENE_SECONDS)))
+    each = min(MAX_SCENE_SECONDS, shortfall / count)
+    return [max(MIN_SCENE_SECONDS, _round5(each))] * count
+
+def accept_fill(current_seconds: int, target_seconds: int, durations: List[int]) -> int:
+    """How many of the new scenes (in order) to keep.
+
+    Scenes are added while the runtime stays within MAX_RUNTIME_RATIO of
+    the target, and adding stops once it reaches MIN_RUNTIME_RATIO. A scene
+    that would take the runtime past MAX_RUNTIME_RATIO is never kept.
+    """
+    kept = 0
+    total = current_seconds
+    for seconds in durations:
+        if total >= target_seconds * MIN_RUNTIME_RATIO or total + seconds > target_seconds * MAX_RUNTIME_RATIO:
+            break
+        total += seconds
+        kept += 1
+    return kept
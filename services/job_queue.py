@@ -0,0 +1,285 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from agents.registry import get_director
+from services.checkpoint import PipelineCheckpoint
+from services.console import AgentConsole, current_console
+from services.data_manager import update_story_archive
+
+ACTIVE = ("queued", "running")
+
+# A process refreshes the lease on its active jobs this often; a job whose
+# lease is older than JOB_LEASE_SECONDS is taken to be orphaned
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    story_idea TEXT NOT NULL,
+    length_minutes INTEGER NOT NULL,
+    story_dir TEXT NOT NULL,
+    artifact TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    result_path TEXT,
+    owner TEXT,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    message TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS job_events_version ON job_events (job_id, version);
+"""
+
+def _owner() -> str:
+    # Unique per process start: a restarted container is PID 1 on the same
+    # hostname again, so hostname:pid alone would look like the old owner
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class JobConsole(AgentConsole):
+    """Console that records a job's messages as progress events.
+
+    Streamed replies rewrite the same event row; writes ride on the
+    console's coalesced refresh, so a streaming reply costs one write per
+    refresh interval rather than one per chunk.
+    """
+
+    def __init__(self, queue: "JobQueue", job_id: str, log_dir: str):
+        super().__init__(log_dir=log_dir, echo=False)
+        self.queue = queue
+        self.job_id = job_id
+        self._pending = {}
+        self.renderer = self._persist
+
+    def append(self, text: str) -> int:
+        with self._lock:
+            self._pending[self._next_id] = text[:self.max_chars]
+            return super().append(text)
+
+    def replace(self, message_id: int, text: str, final: bool = False):
+        with self._lock:
+            self._pending[message_id] = text[:self.max_chars]
+            super().replace(message_id, text, final)
+
+    def _persist(self, html: str):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.queue.record_events(self.job_id, pending)
+
+class JobQueue:
+    """In-process worker pool for screenplay generation, backed by SQLite.
+
+    Jobs and their progress events live in the database, so a Streamlit
+    session can rerun, reload or reconnect and pick its job up again by id.
+    Each process holds a lease on its active jobs, renewed every
+    HEARTBEAT_SECONDS. Jobs whose lease has expired (their process died,
+    on this host or any other sharing the database) are re-queued by
+    whichever process notices first and resume from their story checkpoint.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/jobs.db",
+        max_jobs: Optional[int] = None,
+        heartbeat_seconds: float = HEARTBEAT_SECONDS,
+        lease_seconds: float = LEASE_SECONDS
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_jobs = max_jobs or int(os.getenv("GENERATION_JOBS", "2"))
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = _owner()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="job")
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            # Databases from before leases and event versions; columns go
+            # in before the schema script, which indexes job_events.version
+            for table, column, definition in (
+                ("jobs", "artifact", "TEXT"),
+                ("jobs", "heartbeat_at", "REAL"),
+                ("job_events", "version", "INTEGER NOT NULL DEFAULT 0")
+            ):
+                columns = {row["name"] for row in db.execute(f"PRAGMA table_info({table})")}
+                if columns and column not in columns:
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            db.executescript(SCHEMA)
+        self._stopped = threading.Event()
+        self._recover()
+        self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation; sqlite3 connections are
+        # not shared across threads
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _beat(self):
+        """Renew the lease on this process's jobs and adopt any whose lease ran out"""
+        while not self._stopped.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+                self._recover()
+            except sqlite3.Error:
+                pass  # database busy; the lease has slack for a missed beat
+
+    def heartbeat(self):
+        with self._connect() as db:
+            db.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ({','.join('?' * len(ACTIVE))})",
+                (time.time(), self.owner, *ACTIVE)
+            )
+
+    def stop(self):
+        """Stop renewing leases (the jobs are then recovered elsewhere once they expire)"""
+        self._stopped.set()
+
+    def _recover(self):
+        """Re-queue jobs whose owner stopped renewing their lease"""
+        expired = time.time() - self.lease_seconds
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT id, owner FROM jobs WHERE status IN ({','.join('?' * len(ACTIVE))}) "
+                "AND owner IS NOT ? AND COALESCE(heartbeat_at, started_at, created_at) < ? ORDER BY created_at",
+                (*ACTIVE, self.owner, expired)
+            ).fetchall()
+        for row in rows:
+            # Conditional on the old owner and lease, so two processes
+            # noticing at once cannot both adopt the same job
+            with self._connect() as db:
+                claimed = db.execute(
+                    "UPDATE jobs SET status = 'queued', owner = ?, heartbeat_at = ? WHERE id = ? AND owner IS ? "
+                    "AND COALESCE(heartbeat_at, started_at, created_at) < ?",
+                    (self.owner, time.time(), row["id"], row["owner"], expired)
+                ).rowcount
+            if claimed:
+                self._executor.submit(self._run, row["id"])
+
+    def _set(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def submit(self, story_idea: str, length_minutes: int, story_dir, artifact: Optional[str] = None) -> str:
+        """Queue a screenplay for story_dir and return the job id.
+
+        With artifact, only that artifact of the finished story and what
+        depends on it are regenerated (see Director.regenerate).
+        """
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, story_idea, length_minutes, story_dir, artifact, status, owner, heartbeat_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, story_idea, length_minutes, str(story_dir), artifact, self.owner, time.time(), time.time())
+            )
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def events(self, job_id: str, limit: int = 500) -> List[str]:
+        """The newest progress messages of a job, oldest first"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT message FROM job_events WHERE job_id = ? ORDER BY seq DESC LIMIT ?",
+                (job_id, limit)
+            ).fetchall()
+        return [row["message"] for row in reversed(rows)]
+
+    def events_since(self, job_id: str, version: int = -1) -> Tuple[Dict[int, str], int]:
+        """Progress messages added or rewritten after version, keyed by seq, and the latest version"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT seq, message, version FROM job_events WHERE job_id = ? AND version > ? ORDER BY seq",
+                (job_id, version)
+            ).fetchall()
+        return {row["seq"]: row["message"] for row in rows}, max((row["version"] for row in rows), default=version)
+
+    def record_events(self, job_id: str, messages: Dict[int, str]):
+        """Insert or update progress messages, keyed by console message id"""
+        now = time.time()
+        with self._connect() as db:
+            # Each batch gets the next version, so watchers fetch only what changed
+            version = db.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            db.executemany(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, created_at, message, version) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, seq, now, message, version) for seq, message in messages.items()]
+            )
+
+    def _run(self, job_id: str):
+        """Worker body: generate, resume or regenerate part of the job's screenplay"""
+        with self._connect() as db:
+            claimed = db.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = 'queued' AND owner = ?",
+                (time.time(), time.time(), job_id, self.owner)
+            ).rowcount
+        if not claimed:
+            return
+        job = self.get(job_id)
+        story_dir = Path(job["story_dir"])
+        console = JobConsole(self, job_id, log_dir=str(story_dir / "logs"))
+        current_console.set(console)
+        director = get_director()
+        try:
+            checkpoint = PipelineCheckpoint(story_dir)
+            if job["artifact"] and checkpoint.complete:
+                result_path = director.regenerate(story_dir, job["artifact"])
+            # Also picks up a regeneration interrupted after its invalidation was saved
+            elif checkpoint.story_idea == job["story_idea"] and not checkpoint.complete:
+                result_path = director.resume(story_dir)
+            else:
+                result_path = director.execute(job["story_idea"], job["length_minutes"], story_dir)
+            # Build the archive now so "Save Story" only has to serve it
+            update_story_archive(story_dir)
+            self._set(job_id, status="done", result_path=str(result_path), finished_at=time.time())
+        except Exception as e:
+            console.append(f"❌ Error: {e}")
+            self._set(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        finally:
+            console.refresh(force=True)
+            current_console.set(None)
+
+_lock = threading.Lock()
+_queue = None
+
+def get_job_queue() -> JobQueue:
+    """Process-wide job queue shared by every Streamlit session"""
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
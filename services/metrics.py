@@ -0,0 +1,219 @@
+import time
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+# USD per 1K prompt / completion tokens; unknown models are costed as gpt-4-turbo
+MODEL_PRICES = {
+    "gpt-4-1106-preview": (0.01, 0.03),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015)
+}
+DEFAULT_PRICE = MODEL_PRICES["gpt-4-turbo"]
+
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_KINDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of one call"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, DEFAULT_PRICE)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+def usage_tokens(usage) -> Dict[str, int]:
+    """Token counts from a response.usage object (zeros when it is missing)"""
+    return {kind: int(getattr(usage, kind, 0) or 0) for kind in TOKEN_KINDS}
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class RunMetrics:
+    """Every call made during one pipeline run, summarised per agent and stage"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.calls = []
+        # Task timings and critical path from the pipeline scheduler, when it reports one
+        self.schedule = None
+        self._lock = threading.Lock()
+
+    def record(self, call: dict):
+        with self._lock:
+            self.calls.append(call)
+
+    @staticmethod
+    def _totals(calls: list) -> dict:
+        totals = {"calls": len(calls), "seconds": 0.0, "cost_usd": 0.0, "retries": 0}
+        totals.update({kind: 0 for kind in TOKEN_KINDS})
+        outcomes = defaultdict(int)
+        for call in calls:
+            for field in ("seconds", "cost_usd", "retries") + TOKEN_KINDS:
+                totals[field] += call[field]
+            outcomes[call["outcome"]] += 1
+        totals["seconds"] = round(totals["seconds"], 3)
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        totals["outcomes"] = dict(outcomes)
+        return totals
+
+    def summary(self) -> dict:
+        """JSON-ready summary; "seconds" sums call time, so it exceeds wall time when calls overlap"""
+        with self._lock:
+            calls = list(self.calls)
+        by_agent, by_stage, by_model = defaultdict(list), defaultdict(list), defaultdict(list)
+        for call in calls:
+            by_agent[call["agent"]].append(call)
+            by_stage[call["stage"]].append(call)
+            by_model[call["model"]].append(call)
+        return {
+            "started_at": self.started,
+            "wall_seconds": round(time.time() - self.started, 3),
+            "totals": self._totals(calls),
+            "by_agent": {name: self._totals(group) for name, group in by_agent.items()},
+            "by_stage": {name: self._totals(group) for name, group in by_stage.items()},
+            "by_model": {name: self._totals(group) for name, group in by_model.items()},
+            "fallbacks": sum(len(call["fallbacks"]) for call in calls),
+            "schedule": self.schedule,
+            "calls": calls
+        }
+
+class Metrics:
+    """Process-wide counters and latency histograms for LLM calls.
+
+    Labelled by agent and pipeline stage, exported in the Prometheus text
+    format by prometheus_text() and the optional scrape server.
+    """
+
+    def __init__(self, prefix: str = "screenwriter"):
+        self.prefix = prefix
+        self.calls = defaultdict(int)  # (agent, stage, outcome) -> calls
+        self.tokens = defaultdict(int)  # (agent, stage, kind) -> tokens
+        self.cost = defaultdict(float)  # (agent, stage) -> USD
+        self.retries = defaultdict(int)  # (agent, stage) -> retries
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.routes = defaultdict(int)  # (agent, stage, model, rule) -> calls
+        self.fallbacks = defaultdict(int)  # (agent, from, to, reason) -> fallbacks
+        self._lock = threading.Lock()
+
+    def record_call(
+        self, agent: str, model: str, seconds: float, usage, retries: int, outcome: str, route: Optional[dict] = None
+    ) -> dict:
+        """Count one get_completion call and add it to the current run.
+
+        route describes the routing decision: the rule that matched, the
+        model it asked for and any fallbacks taken on the way to `model`.
+        """
+        stage = current_stage.get()
+        route = route or {"rule": "default", "requested_model": model, "fallbacks": []}
+        tokens = usage_tokens(usage)
+        cost = estimate_cost(model, tokens["prompt_tokens"], tokens["completion_tokens"])
+        with self._lock:
+            self.calls[(agent, stage, outcome)] += 1
+            for kind, count in tokens.items():
+                self.tokens[(agent, stage, kind)] += count
+            self.cost[(agent, stage)] += cost
+            self.retries[(agent, stage)] += retries
+            self.latency.setdefault((agent, stage), Histogram()).observe(seconds)
+            self.routes[(agent, stage, model, route["rule"])] += 1
+            for fallback in route["fallbacks"]:
+                self.fallbacks[(agent, fallback["from"], fallback["to"], fallback["reason"])] += 1
+        call = dict(
+            agent=agent, stage=stage, model=model, requested_model=route["requested_model"],
+            route_rule=route["rule"], fallbacks=route["fallbacks"], seconds=round(seconds, 3),
+            retries=retries, outcome=outcome, cost_usd=round(cost, 6), **tokens
+        )
+        run = current_run.get()
+        if run is not None:
+            run.record(call)
+        return call
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines += [f"# HELP {p}_llm_calls_total LLM completion calls by outcome", f"# TYPE {p}_llm_calls_total counter"]
+            for (agent, stage, outcome), count in sorted(self.calls.items()):
+                lines.append(f"{p}_llm_calls_total{{{self._labels(agent=agent, stage=stage, outcome=outcome)}}} {count}")
+            lines += [f"# HELP {p}_llm_tokens_total Tokens reported in response.usage", f"# TYPE {p}_llm_tokens_total counter"]
+            for (agent, stage, kind), count in sorted(self.tokens.items()):
+                lines.append(f"{p}_llm_tokens_total{{{self._labels(agent=agent, stage=stage, kind=kind)}}} {count}")
+            lines += [f"# HELP {p}_llm_cost_usd_total Estimated spend", f"# TYPE {p}_llm_cost_usd_total counter"]
+            for (agent, stage), cost in sorted(self.cost.items()):
+                lines.append(f"{p}_llm_cost_usd_total{{{self._labels(agent=agent, stage=stage)}}} {cost:.6f}")
+            lines += [f"# HELP {p}_llm_retries_total Retried attempts", f"# TYPE {p}_llm_retries_total counter"]
+            for (agent, stage), count in sorted(self.retries.items()):
+                lines.append(f"{p}_llm_retries_total{{{self._labels(agent=agent, stage=stage)}}} {count}")
+            lines += [f"# HELP {p}_llm_call_seconds Wall time per call, including queueing and retries", f"# TYPE {p}_llm_call_seconds histogram"]
+            for (agent, stage), histogram in sorted(self.latency.items()):
+                labels = self._labels(agent=agent, stage=stage)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{p}_llm_call_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{p}_llm_call_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{p}_llm_call_seconds_sum{{{labels}}} {histogram.sum:.3f}")
+                lines.append(f"{p}_llm_call_seconds_count{{{labels}}} {histogram.count}")
+            lines += [f"# HELP {p}_llm_routed_calls_total Calls by the model that served them and the routing rule", f"# TYPE {p}_llm_routed_calls_total counter"]
+            for (agent, stage, model, rule), count in sorted(self.routes.items()):
+                lines.append(f"{p}_llm_routed_calls_total{{{self._labels(agent=agent, stage=stage, model=model, rule=rule)}}} {count}")
+            lines += [f"# HELP {p}_llm_fallbacks_total Switches to the next model after a timeout or rate limit", f"# TYPE {p}_llm_fallbacks_total counter"]
+            for (agent, from_model, to_model, reason), count in sorted(self.fallbacks.items()):
+                lines.append(f"{p}_llm_fallbacks_total{{{self._labels(agent=agent, from_model=from_model, to_model=to_model, reason=reason)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+# Pipeline stage and run the current task's calls are attributed to
+current_stage: ContextVar[str] = ContextVar("current_stage", default="other")
+current_run: ContextVar[Optional[RunMetrics]] = ContextVar("current_run", default=None)
+
+_server = None
+_server_lock = threading.Lock()
+
+def serve_metrics(metrics: Metrics, port: int, host: str = "0.0.0.0"):
+    """Serve GET /metrics on a background thread (once per process)"""
+    global _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep scrapes out of the app log
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server
@@ -0,0 +1,243 @@
+"""Local OpenAI-compatible stub for benchmarks.
+
+Serves POST /v1/chat/completions (plain and streamed) with canned,
+screenplay-shaped replies chosen from the agent's system prompt, so the
+whole pipeline runs without API calls. Latency, token throughput and
+error/429 injection are configurable; x-ratelimit-* headers are sent like
+the real API.
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+SCENE_TEXT = """INT. WORKSHOP - NIGHT
+
+Sparks fly as MAYA (17, grease-stained, stubborn) welds the last plate onto a battered robot.
+The radio crackles with storm warnings.
+
+MAYA
+(muttering)
+Come on. Just one more.
+
+The robot's eyes flicker amber. It turns its head toward the rattling window.
+
+ROBOT
+The storm is early, Maya.
+
+She freezes, torch still hissing, and slowly lowers her mask.
+
+MAYA
+You... talked.
+
+Sand hammers the glass. Somewhere outside, a siren begins to wail.
+
+CUT TO:
+"""
+
+PROSE = (
+    "The story unfolds across a wind-scoured desert town where memory and machinery blur. "
+    "Every choice pushes the characters closer to the storm at the heart of the film. "
+)
+
+class MockConfig:
+    """Behaviour of the stub server"""
+
+    def __init__(
+        self,
+        latency_ms: float = 200,
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 400,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after_ms: int = 200,
+        seed: Optional[int] = None
+    ):
+        # Time to first token is log-normal around latency_ms
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_ms = retry_after_ms
+        self.random = random.Random(seed)
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "latency_sigma": self.latency_sigma,
+            "tokens_per_second": self.tokens_per_second,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "retry_after_ms": self.retry_after_ms
+        }
+
+def canned_reply(messages: list) -> str:
+    """A reply shaped like what the agent that sent these messages expects"""
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+    if "exactly these keys" in user:
+        keys = re.findall(r'"(\d+)"', user.split("exactly these keys", 1)[1])
+        return json.dumps({key: f"Wide shot of scene {key}: amber light, drifting sand, {PROSE}" for key in keys})
+    if "scene writer" in system:
+        match = re.search(r"exactly (\d+) scenes", user, re.IGNORECASE)
+        count = int(match.group(1)) if match else 6
+        scenes = [
+            {
+                "scene_number": n,
+                "setting": f"{'INT' if n % 2 else 'EXT'}. LOCATION {n} - {'NIGHT' if n % 3 else 'DAY'}",
+                "characters": ["Maya", "Robot"],
+                "action": f"Scene {n} beat. {PROSE}",
+                "dialogue_summary": "Maya argues with the robot about leaving town.",
+                "visuals": "Handheld close-ups, dust in the key light.",
+                "transition": "CUT TO:"
+            }
+            for n in range(1, count + 1)
+        ]
+        return json.dumps({"scenes": scenes})
+    if "professional screenwriter" in system:
+        return SCENE_TEXT
+    if "timing expert" in system:
+        return "00:40"
+    if "character writer" in system:
+        return "\n\n".join(
+            f"## {name}\n- Role: {role}\n- Background: {PROSE}\n- Motivation: {PROSE}"
+            for name, role in (("Maya", "protagonist"), ("Robot", "companion"), ("Elder Ruiz", "mentor"))
+        )
+    return "\n".join(f"## Section {n}\n{PROSE * 3}" for n in range(1, 6))
+
+def approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockOpenAIServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: Optional[dict] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        config = self.server.config
+        roll = config.random.random()
+        if roll < config.rate_limit_rate:
+            self.server.count("rate_limited")
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"retry-after-ms": str(config.retry_after_ms)}
+            )
+            return
+        if roll < config.rate_limit_rate + config.error_rate:
+            self.server.count("errors")
+            self._send_json(500, {"error": {"message": "Injected server error (mock)", "type": "server_error"}})
+            return
+
+        self.server.count("requests")
+        messages = request.get("messages", [])
+        content = canned_reply(messages)
+        prompt_tokens = approx_tokens("".join(m.get("content") or "" for m in messages))
+        completion_tokens = approx_tokens(content)
+        self.server.count("completion_tokens", completion_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        headers = {
+            "x-ratelimit-remaining-requests": "10000",
+            "x-ratelimit-remaining-tokens": "10000000",
+            "x-ratelimit-reset-requests": "6ms",
+            "x-ratelimit-reset-tokens": "0s"
+        }
+        time.sleep(config.random.lognormvariate(math.log(config.latency_ms / 1000), config.latency_sigma))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        base = {"id": completion_id, "created": int(time.time()), "model": request.get("model", "mock")}
+
+        if not request.get("stream"):
+            time.sleep(completion_tokens / config.tokens_per_second)
+            self._send_json(200, dict(
+                base,
+                object="chat.completion",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                usage=usage
+            ), headers)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        # ~16 characters (4 tokens) per chunk, paced at tokens_per_second
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+        delay = 4 / config.tokens_per_second
+        for piece in pieces:
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+            ])
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            time.sleep(delay)
+        final = dict(base, object="chat.completion.chunk", choices=[
+            {"index": 0, "delta": {}, "finish_reason": "stop"}
+        ])
+        self._write_chunk(f"data: {json.dumps(final)}\n\n")
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_chunk(f"data: {json.dumps(dict(base, object='chat.completion.chunk', choices=[], usage=usage))}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Threaded stub server; counters record what was served and injected"""
+
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), MockOpenAIHandler)
+        self.config = config
+        self.counters = {"requests": 0, "rate_limited": 0, "errors": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        threading.Thread(target=self.serve_forever, name="mock-openai", daemon=True).start()
+        return self
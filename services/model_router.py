@@ -0,0 +1,110 @@
+import os
+import json
+import asyncio
+from typing import Callable, Dict, List, Optional, Union
+
+from openai import APITimeoutError, RateLimitError
+
+DEFAULT_MODEL = "gpt-4-1106-preview"
+FAST_MODEL = "gpt-4o-mini"
+DEFAULT_FALLBACK_MODELS = ("gpt-4o",)
+DEFAULT_TEMPERATURE = 0.7
+
+# Agents whose replies are a few tokens (an MM:SS timestamp, short image
+# prompts) and gain nothing from the flagship model
+FAST_AGENTS = ("TimeStamper", "ImagePrompter")
+
+def should_fall_back(error: Exception) -> bool:
+    """Timeouts and rate limits are worth trying on the next model in the chain"""
+    return isinstance(error, (RateLimitError, APITimeoutError, asyncio.TimeoutError))
+
+def fallback_reason(error: Exception) -> str:
+    return "rate_limit" if isinstance(error, RateLimitError) else "timeout"
+
+class Route:
+    """Models to try in order, and the temperature, for one agent at one stage"""
+
+    def __init__(self, models: List[str], temperature: float, rule: str):
+        self.models = models
+        self.temperature = temperature
+        # Which configuration entry chose this route, for the metrics
+        self.rule = rule
+
+    @property
+    def model(self) -> str:
+        return self.models[0]
+
+class ModelRouter:
+    """Chooses the model chain for each completion call.
+
+    Routes are looked up by "Agent:stage", then "Agent", then "stage:name",
+    then the fast tier for FAST_AGENTS, then the default model. A route is a
+    model name (the shared fallbacks are appended), an explicit list of
+    models, or {"models": ..., "temperature": ...}.
+    """
+
+    def __init__(
+        self,
+        default_model: str = DEFAULT_MODEL,
+        fast_model: str = FAST_MODEL,
+        fallback_models=DEFAULT_FALLBACK_MODELS,
+        fast_agents=FAST_AGENTS,
+        routes: Optional[Dict[str, Union[str, list, dict]]] = None,
+        temperature: float = DEFAULT_TEMPERATURE
+    ):
+        self.default_model = default_model
+        self.fast_model = fast_model
+        self.fallback_models = list(fallback_models)
+        self.fast_agents = set(fast_agents)
+        self.routes = routes or {}
+        self.temperature = temperature
+        self._cache: Dict[tuple, Route] = {}
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """Build the router from OPENAI_*MODEL* settings and the MODEL_ROUTES JSON"""
+        fallbacks = os.getenv("OPENAI_FALLBACK_MODELS", ",".join(DEFAULT_FALLBACK_MODELS))
+        fast_agents = os.getenv("FAST_AGENTS", ",".join(FAST_AGENTS))
+        return cls(
+            default_model=os.getenv("OPENAI_MODEL", DEFAULT_MODEL),
+            fast_model=os.getenv("OPENAI_FAST_MODEL", FAST_MODEL),
+            fallback_models=[m.strip() for m in fallbacks.split(",") if m.strip()],
+            fast_agents=[a.strip() for a in fast_agents.split(",") if a.strip()],
+            routes=json.loads(os.getenv("MODEL_ROUTES") or "{}"),
+            temperature=float(os.getenv("OPENAI_TEMPERATURE", str(DEFAULT_TEMPERATURE)))
+        )
+
+    def _chain(self, model: str) -> List[str]:
+        return [model] + [m for m in self.fallback_models if m != model]
+
+    def _build(self, value: Union[str, list, dict], rule: str) -> Route:
+        temperature = self.temperature
+        if isinstance(value, dict):
+            temperature = float(value.get("temperature", temperature))
+            value = value.get("models", value.get("model", self.default_model))
+        models = self._chain(value) if isinstance(value, str) else list(value)
+        if not models:
+            raise ValueError(f"Model route {rule!r} has no models")
+        return Route(models, temperature, rule)
+
+    def route(self, agent: str, stage: str) -> Route:
+        """The route for an agent's call during a pipeline stage"""
+        key = (agent, stage)
+        route = self._cache.get(key)
+        if route is None:
+            for rule in (f"{agent}:{stage}", agent, f"stage:{stage}"):
+                if rule in self.routes:
+                    route = self._build(self.routes[rule], rule)
+                    break
+            else:
+                if agent in self.fast_agents:
+                    route = self._build(self.fast_model, "fast")
+                else:
+                    route = self._build(self.default_model, "default")
+            self._cache[key] = route
+        return route
+
+    @staticmethod
+    def order(models: List[str], paused: Callable[[str], float]) -> List[str]:
+        """Models ready now first; ones still paused by a rate limit go last"""
+        return sorted(models, key=lambda model: paused(model) > 0)
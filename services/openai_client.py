@@ -0,0 +1,55 @@
+import os
+import asyncio
+import threading
+import weakref
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# httpx connection pools cannot be shared across event loops, so there is
+# one async client per loop; entries go away with their loop
+_async_clients = weakref.WeakKeyDictionary()
+# Each thread keeps one event loop for all its runs, so the client made for
+# that loop (and its open connections) is reused instead of rebuilt per run
+_thread_loops = threading.local()
+
+def _limits() -> httpx.Limits:
+    """Connection pool sizing, tunable through OPENAI_* environment variables"""
+    return httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "50")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120"))
+    )
+
+def get_async_client() -> AsyncOpenAI:
+    """AsyncOpenAI client shared by every agent running on the current event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0,  # retries are handled by BaseAgent and the rate limiter
+            http_client=DefaultAsyncHttpxClient(limits=_limits())
+        )
+        _async_clients[loop] = client
+    return client
+
+def run_async(coro):
+    """Run a coroutine to completion on this thread's long-lived event loop.
+
+    Use instead of asyncio.run, which makes and closes a fresh loop (and so a
+    fresh AsyncOpenAI connection pool that is never closed) on every call.
+    """
+    loop = getattr(_thread_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_loops.loop = loop
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # Let cleanup scheduled during the run (closing response streams) finish
+        # now rather than sit on the loop until the next run
+        pending = asyncio.all_tasks(loop)
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        asyncio.set_event_loop(None)
@@ -0,0 +1,234 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from typing import Dict, Mapping, Optional
+
+from openai import APIConnectionError, APIStatusError, RateLimitError
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset values such as "20ms", "1s" or "6m0s" into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * UNITS[unit] for amount, unit in parts)
+
+def retry_after(headers: Optional[Mapping]) -> Optional[float]:
+    """Server-suggested wait in seconds, if any"""
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, timeouts, connection failures and 5xx responses are worth retrying"""
+    if isinstance(error, (RateLimitError, APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return False
+
+class LimiterTimeout(TimeoutError):
+    """No request slot became free before the call's deadline"""
+
+class RateLimiter:
+    """Shared pacing for OpenAI requests from every agent, thread and event loop.
+
+    Requests and tokens are metered with token buckets refilled at the
+    configured per-minute rates and corrected from the x-ratelimit-* response
+    headers. Concurrency adapts AIMD-style: it grows by one slot per window
+    of successful calls and halves on every 429. OpenAI limits each model
+    separately, so a 429 or an exhausted quota pauses only that model.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 300000,
+        max_concurrency: int = 16,
+        initial_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+        timeout: float = 180.0,
+        deadline: float = 600.0,
+        expected_completion_tokens: int = 1000
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(min(initial_concurrency, max_concurrency))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # Seconds allowed for one attempt, and for a call including retries
+        self.timeout = timeout
+        self.deadline = deadline
+        self.expected_completion_tokens = expected_completion_tokens
+        self.in_flight = 0
+        self.rate_limited = 0
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._refilled = time.monotonic()
+        self._paused_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Build the limiter from OPENAI_* settings"""
+        return cls(
+            requests_per_minute=float(os.getenv("OPENAI_RPM", "500")),
+            tokens_per_minute=float(os.getenv("OPENAI_TPM", "300000")),
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+            initial_concurrency=int(os.getenv("OPENAI_INITIAL_CONCURRENCY", "4")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "5")),
+            timeout=float(os.getenv("OPENAI_TIMEOUT", "180")),
+            deadline=float(os.getenv("OPENAI_DEADLINE", "600"))
+        )
+
+    def set_max_concurrency(self, max_concurrency: int):
+        """Cap the number of requests in flight at once"""
+        with self._lock:
+            self.max_concurrency = max_concurrency
+            self.concurrency = min(self.concurrency, max_concurrency)
+
+    def estimate_tokens(self, messages: list) -> int:
+        """Rough token cost of a request: ~4 characters per prompt token plus the expected reply"""
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        return prompt_chars // 4 + self.expected_completion_tokens
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled
+        self._refilled = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def pause_remaining(self, model: str = "") -> float:
+        """Seconds until requests for this model may be sent again"""
+        with self._lock:
+            return max(0.0, self._paused_until.get(model, 0.0) - time.monotonic())
+
+    def _pause(self, model: str, until: float):
+        self._paused_until[model] = max(self._paused_until.get(model, 0.0), until)
+
+    def _try_acquire(self, tokens: int, model: str = "") -> float:
+        """Take a slot and return 0, or return how long to wait before trying again"""
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            paused_until = self._paused_until.get(model, 0.0)
+            if now < paused_until:
+                return paused_until - now
+            if self.in_flight >= max(1, int(self.concurrency)):
+                return 0.05
+            if self._requests < 1:
+                return (1 - self._requests) * 60 / self.requests_per_minute
+            if self._tokens < tokens:
+                return (tokens - self._tokens) * 60 / self.tokens_per_minute
+            self._requests -= 1
+            self._tokens -= tokens
+            self.in_flight += 1
+            return 0.0
+
+    def _wait(self, tokens: int, model: str, deadline: float) -> float:
+        """Take a slot and return 0, or how long to sleep; raises LimiterTimeout past the deadline"""
+        wait = self._try_acquire(tokens, model)
+        if not wait:
+            return 0.0
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LimiterTimeout(f"No request slot for {model or 'the API'} before the deadline")
+        return min(wait, remaining)
+
+    def acquire(self, tokens: int, model: str = "", deadline: Optional[float] = None):
+        """Block until a request for this model may be sent, or until deadline (time.monotonic())"""
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+        while True:
+            wait = self._wait(tokens, model, deadline)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int, model: str = "", deadline: Optional[float] = None):
+        """Wait without blocking the event loop until a request for this model may be sent, or until deadline"""
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+        while True:
+            wait = self._wait(tokens, model, deadline)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(
+        self,
+        headers: Optional[Mapping] = None,
+        error: Optional[Exception] = None,
+        model: str = "",
+        completed: bool = True
+    ):
+        """Return a slot, adapting concurrency and budgets to the outcome.
+
+        completed is False when the request was abandoned (its task was
+        cancelled), which frees the slot without counting as a success.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if not completed:
+                return
+            now = time.monotonic()
+            if isinstance(error, RateLimitError):
+                self.rate_limited += 1
+                self.concurrency = max(1.0, self.concurrency / 2)
+                # Everyone using this model backs off, not just the caller that hit the limit
+                self._pause(model, now + (retry_after(headers) or self.backoff_base))
+            elif error is None:
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+            if headers:
+                self._apply_headers(headers, now, model)
+
+    def _apply_headers(self, headers: Mapping, now: float, model: str = ""):
+        """Align the local buckets with the server's view of remaining quota"""
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            if kind == "requests":
+                self._requests = min(self._requests, remaining)
+            else:
+                self._tokens = min(self._tokens, remaining)
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining < 1 and reset:
+                self._pause(model, now + reset)
+
+    def backoff(self, attempt: int, headers: Optional[Mapping] = None) -> float:
+        """Jittered exponential delay before retry number attempt + 1"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after(headers) or 0)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": int(self.concurrency),
+            "in_flight": self.in_flight,
+            "rate_limited": self.rate_limited
+        }
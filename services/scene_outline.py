@@ -0,0 +1,106 @@
+import re
+from typing import List, Tuple
+
+from services.structured_output import extract_json
+
+# Fields of one scene in the SceneDescriptor's JSON reply (see prd.md)
+SCENE_SCHEMA = {
+    "scene_number": "integer, starting at 1",
+    "setting": "INT/EXT, location and time of day",
+    "characters": "array of the character names present",
+    "action": "what happens in the scene",
+    "dialogue_summary": "key dialogue points and emotional beats",
+    "visuals": "cinematography and visual notes",
+    "transition": "how the scene hands off to the next one"
+}
+REQUIRED_FIELDS = ("setting", "action")
+TEXT_FIELDS = ("setting", "action", "dialogue_summary", "visuals", "transition")
+
+# "Scene 3:" / "## Scene 3 -" / "**Scene 3**" only at the start of a line, so
+# prose such as "the scene shifts" never starts a new scene
+SCENE_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s*)?(?:\*\*)?Scene\s+(\d+)\b\**\s*[:.\-–—]?\s*(.*)$", re.IGNORECASE | re.MULTILINE)
+
+def _clean_scene(item) -> dict:
+    """Normalise one scene object; missing required fields are left empty"""
+    if not isinstance(item, dict):
+        return {}
+    scene = {}
+    for field in TEXT_FIELDS:
+        value = item.get(field)
+        if field == "action" and not value:
+            value = item.get("description") or item.get("summary")
+        if isinstance(value, (list, dict)):
+            value = "; ".join(map(str, value.values() if isinstance(value, dict) else value))
+        scene[field] = str(value).strip() if value else ""
+    characters = item.get("characters") or []
+    if isinstance(characters, str):
+        characters = [c.strip() for c in characters.split(",")]
+    scene["characters"] = [str(c).strip() for c in characters if str(c).strip()]
+    try:
+        scene["scene_number"] = int(item.get("scene_number", item.get("scene")))
+    except (TypeError, ValueError):
+        scene["scene_number"] = None
+    return scene
+
+def is_valid(scene: dict) -> bool:
+    return all(scene.get(field) for field in REQUIRED_FIELDS)
+
+def _from_text(reply: str) -> list:
+    """Fallback for free-text outlines: split on line-leading "Scene N" headings"""
+    matches = list(SCENE_HEADING_RE.finditer(reply))
+    scenes = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        body = reply[match.end():following.start() if following else len(reply)].strip()
+        setting = match.group(2).strip(" *")
+        if not setting and body:
+            setting, _, body = body.partition("\n")
+        scenes.append({
+            "scene_number": int(match.group(1)),
+            "setting": setting.strip(" *"),
+            "action": body.strip(),
+            "characters": []
+        })
+    return scenes
+
+def parse_scene_outline(reply: str, renumber: bool = True) -> Tuple[List[dict], List[int]]:
+    """Parse a SceneDescriptor reply into scenes ordered by number.
+
+    Returns every scene found (renumbered 1..N unless renumber is False) and
+    the numbers of the scenes missing required fields, which should be
+    re-requested.
+    """
+    try:
+        data = extract_json(reply)
+    except ValueError:
+        data = _from_text(reply)
+    if isinstance(data, dict):
+        data = data.get("scenes", [])
+    if not isinstance(data, list):
+        data = []
+
+    scenes = [scene for scene in map(_clean_scene, data) if any(scene.get(f) for f in TEXT_FIELDS)]
+    # Keep the model's order where numbers are missing or duplicated
+    scenes.sort(key=lambda scene: scene["scene_number"] if scene["scene_number"] is not None else float("inf"))
+    if renumber:
+        for number, scene in enumerate(scenes, 1):
+            scene["scene_number"] = number
+    broken = [scene["scene_number"] for scene in scenes if not is_valid(scene)]
+    return scenes, broken
+
+def format_scene_outline(scene: dict) -> str:
+    """Plain-text outline of one scene for the downstream agents"""
+    lines = [f"Scene {scene['scene_number']}: {scene['setting']}"]
+    if scene.get("characters"):
+        lines.append(f"Characters: {', '.join(scene['characters'])}")
+    lines.append(scene["action"])
+    if scene.get("dialogue_summary"):
+        lines.append(f"Dialogue: {scene['dialogue_summary']}")
+    if scene.get("visuals"):
+        lines.append(f"Visuals: {scene['visuals']}")
+    if scene.get("transition"):
+        lines.append(f"Transition: {scene['transition']}")
+    return "\n".join(lines)
+
+def count_in_range(count: int, target: int) -> bool:
+    """Whether a scene count is close enough to the pacing target to start writing"""
+    return target * 0.75 <= count <= target * 1.5
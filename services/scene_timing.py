@@ -0,0 +1,90 @@
+import math
+import re
+from typing import List, NamedTuple
+
+# Timing rules from the TimeStamper guidelines, in seconds
+SECONDS_PER_DIALOGUE_LINE = 3
+SECONDS_PER_ACTION_LINE = 5
+SECONDS_PER_ESTABLISHING_SHOT = 10
+SECONDS_PER_TRANSITION = 5
+
+# Unwrapped model output often puts a whole paragraph on one line; count
+# anything longer than these widths as several lines
+DIALOGUE_LINE_WIDTH = 80
+ACTION_LINE_WIDTH = 120
+
+HEADING_RE = re.compile(r"^(INT\.?/EXT\.?|EXT\.?/INT\.?|I/E\.?|INT\.|EXT\.|INT |EXT |EST\.|ESTABLISHING)", re.IGNORECASE)
+TRANSITION_RE = re.compile(r"^(FADE (IN|OUT|TO BLACK)|[A-Z ]+ TO:$|CUT TO BLACK|THE END)")
+CUE_RE = re.compile(r"^[A-Z][A-Z0-9 .'\-]*(\s*\([A-Z.' ]+\))?$")
+INLINE_DIALOGUE_RE = re.compile(r"^([A-Z][A-Z0-9 .'\-]*)(\s*\([^)]*\))?:\s*(.+)$")
+MARKUP_RE = re.compile(r"^[#>*_\s]+|[*_\s]+$")
+
+class ScreenplayElement(NamedTuple):
+    kind: str  # heading, action, character, dialogue, parenthetical or transition
+    text: str
+
+def _clean(line: str) -> str:
+    """Strip indentation and markdown emphasis the model tends to add"""
+    return MARKUP_RE.sub("", line)
+
+def parse_screenplay(scene_text: str) -> List[ScreenplayElement]:
+    """Split screenplay-formatted text into its elements"""
+    elements = []
+    in_dialogue = False
+
+    for raw_line in scene_text.splitlines():
+        line = _clean(raw_line)
+        if not line:
+            in_dialogue = False
+            continue
+
+        if HEADING_RE.match(line):
+            elements.append(ScreenplayElement("heading", line))
+            in_dialogue = False
+        elif line.isupper() and TRANSITION_RE.match(line):
+            elements.append(ScreenplayElement("transition", line))
+            in_dialogue = False
+        elif in_dialogue and line.startswith("(") and line.endswith(")"):
+            elements.append(ScreenplayElement("parenthetical", line))
+        elif len(line) <= 40 and CUE_RE.match(line) and not line.endswith("."):
+            elements.append(ScreenplayElement("character", line))
+            in_dialogue = True
+        elif in_dialogue:
+            elements.append(ScreenplayElement("dialogue", line))
+        else:
+            inline = INLINE_DIALOGUE_RE.match(line)
+            if inline and len(inline.group(1)) <= 40:
+                # "NAME: line" or "NAME (softly): line" on a single row
+                elements.append(ScreenplayElement("character", inline.group(1).strip()))
+                if inline.group(2):
+                    elements.append(ScreenplayElement("parenthetical", inline.group(2).strip()))
+                elements.append(ScreenplayElement("dialogue", inline.group(3)))
+            else:
+                elements.append(ScreenplayElement("action", line))
+
+    return elements
+
+def _lines(text: str, width: int) -> int:
+    return max(1, math.ceil(len(text) / width))
+
+def estimate_seconds(scene_text: str) -> int:
+    """Estimate the screen time of a scene from its screenplay elements"""
+    seconds = 0
+    for element in parse_screenplay(scene_text):
+        if element.kind == "heading":
+            seconds += SECONDS_PER_ESTABLISHING_SHOT
+        elif element.kind == "transition":
+            seconds += SECONDS_PER_TRANSITION
+        elif element.kind == "dialogue":
+            seconds += SECONDS_PER_DIALOGUE_LINE * _lines(element.text, DIALOGUE_LINE_WIDTH)
+        elif element.kind == "action":
+            seconds += SECONDS_PER_ACTION_LINE * _lines(element.text, ACTION_LINE_WIDTH)
+    return seconds
+
+def format_timestamp(seconds: int) -> str:
+    """Format seconds as MM:SS"""
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+def parse_timestamp(timestamp: str) -> int:
+    """Convert an MM:SS (or HH:MM:SS) timestamp into seconds"""
+    return sum(int(x) * 60**i for i, x in enumerate(reversed(timestamp.split(':'))))
@@ -0,0 +1,145 @@
+import os
+import re
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+from services.scene_timing import parse_screenplay, parse_timestamp, format_timestamp
+from services.story_context import split_character_profiles, profile_fields
+
+PACKAGE_FILENAME = "screenplay_package.txt"
+JSON_FILENAME = "screenplay.json"
+SMALL_WORDS = {"a", "an", "and", "as", "at", "but", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+def make_title(story_idea: str, max_words: int = 6) -> str:
+    """Short title-cased title from the first clause of the story idea"""
+    clause = re.split(r"[.!?;:\n]", story_idea.strip(), maxsplit=1)[0]
+    words = re.sub(r"[^\w\s'-]", "", clause).split()[:max_words]
+    # Do not end on a dangling "the" or "of"
+    while len(words) > 1 and words[-1].lower() in SMALL_WORDS:
+        words.pop()
+    titled = [
+        word if word.isupper() else word.capitalize() if i == 0 or word.lower() not in SMALL_WORDS else word.lower()
+        for i, word in enumerate(words)
+    ]
+    return " ".join(titled) or "Untitled"
+
+def _setting(scene_text: str) -> str:
+    """Scene heading of a written scene, for scenes that had no outline"""
+    for element in parse_screenplay(scene_text):
+        if element.kind == "heading":
+            return element.text
+    return ""
+
+class ScreenplayAssembler:
+    """Writes the screenplay package and its JSON export as scenes complete.
+
+    Scenes may finish in any order; each is written out once it and every
+    scene before it have their text, timestamp and image prompt, so only
+    scenes waiting on an earlier one are held. screenplay_package.txt
+    keeps the plain-text layout, and screenplay.json follows the schema in
+    prd.md (see the notes there for the extra keys it carries). Both are
+    written to temp files and moved into place by finish().
+    """
+
+    def __init__(self, story_dir, title: str, length_minutes: int, characters: str, plot: str):
+        self.story_dir = Path(story_dir)
+        self.package_path = self.story_dir / PACKAGE_FILENAME
+        self.json_path = self.story_dir / JSON_FILENAME
+        self._package_tmp = self.story_dir / f".{PACKAGE_FILENAME}.tmp"
+        self._json_tmp = self.story_dir / f".{JSON_FILENAME}.tmp"
+        self._pending: Dict[int, dict] = {}
+        self._prompts: Dict[int, str] = {}
+        self._next = 1
+        self._elapsed = 0
+        self.timestamps = []
+        self.scene_prompts = []
+
+        self._package = open(self._package_tmp, 'w', encoding='utf-8')
+        self._package.write(f"Title: {title}\n\nCharacter Descriptions:\n{characters}\n\nPlot Description:\n{plot}\n\n")
+
+        profiles = split_character_profiles(characters)
+        cast = [dict(name=name, **profile_fields(profile), profile=profile) for name, profile in profiles.items()]
+        self._json = open(self._json_tmp, 'w', encoding='utf-8')
+        head = json.dumps({
+            "title": title,
+            "length_minutes": length_minutes,
+            "characters": cast,
+            "plot": {"synopsis": plot, "major_events": []}
+        }, ensure_ascii=False, indent=2)
+        # Leave the object open; scenes are appended to its "scenes" array
+        self._json.write(head[:-2] + ',\n  "scenes": [')
+
+    def add_scene(self, i: int, scene_file, timestamp: str, outline: Optional[dict] = None):
+        """Record a finished scene and write out whatever is now in order"""
+        self._pending[i] = {"file": Path(scene_file), "timestamp": timestamp, "outline": outline}
+        self._flush()
+
+    def add_prompts(self, prompts: Dict[int, str]):
+        self._prompts.update(prompts)
+        self._flush()
+
+    def _flush(self):
+        while self._next in self._pending and self._next in self._prompts:
+            self._write_scene(self._next, self._pending.pop(self._next), self._prompts[self._next])
+            self._next += 1
+
+    def _write_scene(self, i: int, scene: dict, prompt: str):
+        # Read each scene once: the JSON needs its script inline anyway
+        with open(scene["file"], 'r', encoding='utf-8') as f:
+            script = f.read()
+        self._package.write(f"\nScene {i}: {scene['timestamp']}\nImage Prompt: {prompt}\n{script}\n")
+        self._package.flush()
+
+        start = self._elapsed
+        self._elapsed += parse_timestamp(scene["timestamp"])
+        outline = scene["outline"] or {"setting": _setting(script), "additional": True}
+        entry = dict(outline, scene_number=i, script=script, script_file=scene["file"].relative_to(self.story_dir).as_posix())
+        separator = "," if i > 1 else ""
+        self._json.write(f"{separator}\n    " + json.dumps(entry, ensure_ascii=False))
+        self._json.flush()
+        self.timestamps.append({
+            "scene_number": i,
+            "start_time": format_timestamp(start),
+            "end_time": format_timestamp(self._elapsed),
+            "duration": scene["timestamp"]
+        })
+        self.scene_prompts.append({"scene_number": i, "prompt": prompt})
+
+    @property
+    def written(self) -> int:
+        """Number of scenes written out so far"""
+        return self._next - 1
+
+    def finish(self) -> Path:
+        """Close both files and move them into place; every scene must have been added"""
+        if self._pending:
+            missing = self._next if self._next not in self._pending else f"the image prompt for {self._next}"
+            raise ValueError(f"Cannot finish screenplay: waiting on scene {missing}")
+        self._package.close()
+        self._json.write("\n  ],\n")
+        tail = json.dumps({
+            "timestamps": self.timestamps,
+            "scene_prompts": self.scene_prompts,
+            "runtime": format_timestamp(self._elapsed)
+        }, ensure_ascii=False, indent=2)
+        self._json.write(tail[2:-2] + ',\n  "final_script_text": "')
+        self._write_script_text()
+        self._json.write('"\n}')
+        self._json.close()
+        os.replace(self._package_tmp, self.package_path)
+        os.replace(self._json_tmp, self.json_path)
+        return self.package_path
+
+    def _write_script_text(self):
+        """Copy the finished package into the open JSON string in chunks, so memory stays flat"""
+        with open(self._package_tmp, 'r', encoding='utf-8') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), ""):
+                # JSON escapes each character on its own, so encoded chunks concatenate
+                self._json.write(json.dumps(chunk, ensure_ascii=False)[1:-1])
+
+    def abort(self):
+        """Discard the partial output"""
+        for f, path in ((self._package, self._package_tmp), (self._json, self._json_tmp)):
+            f.close()
+            path.unlink(missing_ok=True)
@@ -0,0 +1,163 @@
+import time
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from services.metrics import current_stage
+
+# The task whose code is running, so tasks it adds can be traced back to it
+_running_task: ContextVar[Optional[str]] = ContextVar("running_task", default=None)
+
+class StageTask:
+    """One unit of pipeline work and the tasks whose results it takes"""
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[..., Awaitable[Any]],
+        inputs: Sequence[str],
+        stage: str,
+        budget: bool,
+        depth: int,
+        order: int,
+        added_by: Optional[str] = None
+    ):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.stage = stage
+        # Whether the task holds one of the graph's concurrency slots
+        self.budget = budget
+        # Longest chain of inputs leading to this task; deeper tasks start first
+        self.depth = depth
+        self.order = order
+        # Task that declared this one while the graph was running, if any
+        self.added_by = added_by
+        self.added = time.perf_counter()
+        self.ready_at: Optional[float] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+class StageGraph:
+    """Runs pipeline tasks as soon as their inputs are available.
+
+    Each task is called with the results of its inputs, in the order they
+    were declared, and its own result is stored under its name. Tasks that
+    make LLM calls count against max_concurrency. Among ready tasks the
+    deepest starts first, so a scene in progress is finished before a new
+    one is begun; ties go to the task added first. Tasks may add more tasks
+    while the graph runs, but only on top of tasks that already exist, so
+    the graph cannot have cycles.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.tasks: Dict[str, StageTask] = {}
+        self.results: Dict[str, Any] = {}
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def add(
+        self,
+        name: str,
+        run: Callable[..., Awaitable[Any]],
+        inputs: Sequence[str] = (),
+        stage: str = "other",
+        budget: bool = True
+    ):
+        """Declare a task; run is called with the results of inputs"""
+        if name in self.tasks:
+            raise ValueError(f"Duplicate pipeline task {name!r}")
+        unknown = [i for i in inputs if i not in self.tasks]
+        if unknown:
+            raise ValueError(f"Pipeline task {name!r} depends on unknown tasks {unknown}")
+        added_by = _running_task.get()
+        depth = 1 + max((self.tasks[i].depth for i in self._after(inputs, added_by)), default=0)
+        self.tasks[name] = StageTask(name, run, inputs, stage, budget, depth, len(self.tasks), added_by)
+
+    @staticmethod
+    def _after(inputs: Sequence[str], added_by: Optional[str]) -> List[str]:
+        """Tasks that had to finish, or at least run, before a task could start"""
+        return list(inputs) + ([added_by] if added_by is not None else [])
+
+    def _ready(self) -> List[StageTask]:
+        ready = [
+            task for task in self.tasks.values()
+            if task.started is None and all(i in self.results for i in task.inputs)
+        ]
+        return sorted(ready, key=lambda task: (-task.depth, task.order))
+
+    async def _call(self, task: StageTask) -> Any:
+        # Each task runs in its own asyncio task, so these stay local to it
+        current_stage.set(task.stage)
+        _running_task.set(task.name)
+        return await task.run(*[self.results[i] for i in task.inputs])
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every task, including ones added along the way; the first failure cancels the rest"""
+        self.started = time.perf_counter()
+        running: Dict[asyncio.Task, StageTask] = {}
+        try:
+            while True:
+                slots = self.max_concurrency - sum(task.budget for task in running.values())
+                for task in self._ready():
+                    if task.budget and slots < 1:
+                        continue
+                    slots -= task.budget
+                    task.ready_at = max([self.tasks[i].finished for i in task.inputs] + [task.added, self.started])
+                    task.started = time.perf_counter()
+                    running[asyncio.create_task(self._call(task))] = task
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                error = None
+                for future in done:
+                    task = running.pop(future)
+                    task.finished = time.perf_counter()
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                    else:
+                        self.results[task.name] = future.result()
+                if error is not None:
+                    raise error
+        finally:
+            self.finished = time.perf_counter()
+            for future in running:
+                future.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        return self.results
+
+    def critical_path(self) -> List[StageTask]:
+        """The chain of tasks that set the wall time, traced back from the last to finish"""
+        finished = [task for task in self.tasks.values() if task.finished is not None]
+        if not finished:
+            return []
+        task = max(finished, key=lambda t: t.finished)
+        path = [task]
+        while task.inputs or task.added_by:
+            task = max((self.tasks[i] for i in self._after(task.inputs, task.added_by)), key=lambda t: t.finished or 0)
+            path.append(task)
+        return path[::-1]
+
+    def report(self) -> dict:
+        """JSON-ready timings: the critical path and every task's start, end and wait for a slot"""
+        def timing(task: StageTask) -> dict:
+            return {
+                "stage": task.stage,
+                "start": round(task.started - self.started, 3),
+                "end": round(task.finished - self.started, 3),
+                "seconds": round(task.finished - task.started, 3),
+                # Time spent ready but waiting for a concurrency slot
+                "waited": round(task.started - task.ready_at, 3)
+            }
+
+        done = [task for task in self.tasks.values() if task.finished is not None]
+        path = self.critical_path()
+        return {
+            "wall_seconds": round((self.finished or time.perf_counter()) - self.started, 3) if self.started else 0.0,
+            "max_concurrency": self.max_concurrency,
+            "critical_path": [dict(task=task.name, **timing(task)) for task in path],
+            "critical_path_seconds": round(sum(task.finished - task.started for task in path), 3),
+            "tasks": {task.name: dict(inputs=list(task.inputs), **timing(task)) for task in done}
+        }
@@ -0,0 +1,217 @@
+import re
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+HEADER_RE = re.compile(r"^\s*(?:(#{1,6})\s+(.+?)|\*\*(.+?)\*\*:?|__(.+?)__:?|\d+[.)]\s+(.{1,60}))\s*$")
+PREFIX_RE = re.compile(r"^(?:\d+[.)]\s*|character\s*\d*\s*[:.\-–]\s*)", re.IGNORECASE)
+NAME_END_RE = re.compile(r"\s+[-–—(]|[,:(]")
+# Headers that label a field of a profile rather than name a character
+FIELD_WORDS = (
+    "character", "profile", "description", "personality", "background", "history", "motivation",
+    "goal", "relationship", "demographic", "trait", "mannerism", "arc", "appearance", "overview",
+    "name", "role", "summary", "note", "main", "supporting", "key", "cast"
+)
+# "Label: text" lines inside a profile, optionally bulleted or bold
+LABEL_RE = re.compile(r"^\s*(?:[-*]\s+)?(?:\*\*|__)?([A-Za-z][A-Za-z /&'-]{1,40}?)(?:\*\*|__)?\s*:\s*(?:\*\*|__)?\s*(.*)$")
+# screenplay.json character fields (prd.md) and the label words that fill them
+PROFILE_FIELDS = (
+    ("physical_description", ("physical", "appearance", "look")),
+    ("motivations", ("motivation", "goal", "want")),
+    ("history", ("history", "background", "backstory")),
+    ("mannerisms", ("mannerism", "habit", "quirk"))
+)
+SECTION_HEADER_RE = re.compile(r"^\s*(?:#{1,6}\s+.+|\*\*[^*]+\*\*:?|[A-Z][A-Za-z /&]{2,40}:)\s*$")
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4
+
+def _character_name(header: str) -> Optional[str]:
+    """Character name in a profile header, or None if the header is a field label"""
+    name = PREFIX_RE.sub("", re.sub(r"[*_#`]", "", header).strip())
+    name = NAME_END_RE.split(name, 1)[0].strip()
+    words = name.split()
+    if not words or len(words) > 4 or not name[0].isupper():
+        return None
+    if any(word.lower().rstrip("s") in FIELD_WORDS for word in words):
+        return None
+    return name
+
+def _header(line: str) -> Optional[Tuple[int, str]]:
+    """Level and text of a header line: markdown levels 1-6, then numbered items, then bold lines"""
+    match = HEADER_RE.match(line)
+    if not match:
+        return None
+    hashes, heading, bold, underline, numbered = match.groups()
+    if hashes:
+        return len(hashes), heading
+    if numbered:
+        return 7, numbered
+    return 8, bold or underline
+
+def split_character_profiles(characters: str) -> "OrderedDict[str, str]":
+    """Split the character document into one profile per character, keyed by name.
+
+    Only headers at the shallowest level that names anyone start a profile,
+    so sub-headers such as "### Fears" stay inside the profile above them.
+    """
+    lines = characters.splitlines()
+    names = {}
+    for index, line in enumerate(lines):
+        header = _header(line)
+        name = _character_name(header[1]) if header else None
+        if name:
+            names[index] = (header[0], name)
+    if not names:
+        return OrderedDict()
+    level = min(header_level for header_level, _ in names.values())
+
+    profiles = OrderedDict()
+    name, profile = None, []
+    for index, line in enumerate(lines):
+        header_level, new_name = names.get(index, (None, None))
+        if header_level == level:
+            if name:
+                profiles[name] = "\n".join(profile).strip()
+            name, profile = new_name, [line]
+        elif name:
+            profile.append(line)
+    if name:
+        profiles[name] = "\n".join(profile).strip()
+    return profiles
+
+def _profile_field(label: str) -> Optional[str]:
+    label = label.lower()
+    for field, words in PROFILE_FIELDS:
+        if any(word in label for word in words):
+            return field
+    return None
+
+def profile_fields(profile: str) -> dict:
+    """The prd.md character fields found under labelled sections of one profile.
+
+    A section starts at a header or "Label:" line and runs to the next
+    one; labels that match no field close the current section. Without a
+    labelled appearance section the whole profile body is the physical
+    description, so the required field is never empty.
+    """
+    lines = profile.splitlines()
+    found = {}
+    field = None
+    for line in lines[1:]:
+        header = _header(line)
+        label = LABEL_RE.match(line) if header is None else None
+        if header is not None or label is not None:
+            field = _profile_field(header[1].rstrip(":") if header else label.group(1))
+            text = label.group(2) if label is not None else ""
+            if field is not None:
+                found.setdefault(field, [])
+                if text:
+                    found[field].append(text)
+            continue
+        if field is not None and line.strip():
+            found[field].append(line.strip().lstrip("-* "))
+    fields = {name: " ".join(parts) for name, parts in found.items() if parts}
+    if "physical_description" not in fields:
+        fields["physical_description"] = " ".join(
+            re.sub(r"[*_#`]", "", line).strip() for line in lines[1:] if line.strip()
+        )
+    return {name: fields[name] for name, _ in PROFILE_FIELDS if name in fields}
+
+def _name_patterns(name: str) -> list:
+    """Full name plus first and last name, matched as whole words"""
+    words = [w for w in name.split() if len(w) > 2 and not w.endswith(".")]
+    variants = {name} | set(words[:1]) | set(words[-1:])
+    return [re.compile(rf"\b{re.escape(v)}\b") for v in variants]
+
+def digest(text: str, max_chars: int) -> str:
+    """Extractive digest: section headers and the first sentence under each, capped at max_chars"""
+    if len(text) <= max_chars:
+        return text.strip()
+    kept = []
+    want_sentence = True
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if SECTION_HEADER_RE.match(stripped):
+            kept.append(stripped)
+            want_sentence = True
+        elif want_sentence:
+            sentence = re.split(r"(?<=[.!?])\s", stripped.lstrip("-* "), maxsplit=1)[0]
+            kept.append(sentence)
+            want_sentence = False
+    result = "\n".join(kept) if kept else text
+    if len(result) > max_chars:
+        cut = result[:max_chars]
+        result = cut[:cut.rfind(".") + 1] or cut
+    return result.strip()
+
+class SceneContextBuilder:
+    """Per-scene prompt context cut down from the full story bible.
+
+    Built once per run: the creative direction and plot are digested once,
+    and the character document is split into per-character profiles so each
+    scene only carries the characters named in its outline.
+    """
+
+    def __init__(
+        self,
+        characters: str,
+        creative_direction: str,
+        plot: str = "",
+        direction_chars: int = 1200,
+        plot_chars: int = 2000,
+        summary_chars: int = 200
+    ):
+        self.characters = characters
+        self.creative_direction = creative_direction
+        self.plot = plot
+        self.profiles = split_character_profiles(characters)
+        self.patterns = {name: _name_patterns(name) for name in self.profiles}
+        self.direction_digest = digest(creative_direction, direction_chars)
+        self.plot_digest = digest(plot, plot_chars)
+        self.summary_chars = summary_chars
+        self.tokens_saved = 0
+
+    def _saved(self, full: Tuple[str, ...], sliced: Tuple[str, ...]) -> int:
+        saved = approx_tokens("".join(full)) - approx_tokens("".join(sliced))
+        self.tokens_saved += saved
+        return saved
+
+    def _summary(self, profile: str) -> str:
+        """Opening of a profile without its header line or markup"""
+        body = profile.split("\n", 1)[1] if "\n" in profile else ""
+        return re.sub(r"[*_#`]", "", " ".join(body.split()))[:self.summary_chars]
+
+    def names_in(self, outline: str) -> list:
+        """Characters mentioned in a scene outline, in profile order"""
+        return [name for name, patterns in self.patterns.items() if any(p.search(outline) for p in patterns)]
+
+    def for_scene(self, outline: str) -> Tuple[str, str, int]:
+        """Characters and direction for one scene, plus the prompt tokens saved"""
+        if not self.profiles:
+            # Unrecognised character format: keep the whole document
+            sliced = (self.characters, self.direction_digest)
+            return sliced + (self._saved((self.characters, self.creative_direction), sliced),)
+
+        names = self.names_in(outline)
+        sections = [self.profiles[name] for name in names]
+        others = [name for name in self.profiles if name not in names]
+        if others:
+            sections.append("Other characters: " + ", ".join(others))
+        characters = "\n\n".join(sections)
+        sliced = (characters, self.direction_digest)
+        return sliced + (self._saved((self.characters, self.creative_direction), sliced),)
+
+    def for_additional_scene(self) -> Tuple[str, str, str, int]:
+        """Character summaries, direction and plot digests for a new scene, plus the tokens saved"""
+        if self.profiles:
+            characters = "\n".join(
+                f"- {name}: {self._summary(profile)}" for name, profile in self.profiles.items()
+            )
+        else:
+            characters = self.characters
+        sliced = (characters, self.direction_digest, self.plot_digest)
+        full = (self.characters, self.creative_direction, self.plot)
+        return sliced + (self._saved(full, sliced),)
@@ -0,0 +1,543 @@
+import os
+import re
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Boolean, Float, ForeignKey, Index, Integer, String, Text,
+    create_engine, delete, event, func, insert, inspect, select, text
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+
+from services.data_manager import atomic_write
+from services.scene_outline import parse_scene_outline
+from services.screenplay_assembler import ScreenplayAssembler, PACKAGE_FILENAME, make_title
+
+class Base(DeclarativeBase):
+    pass
+
+class Story(Base):
+    __tablename__ = "stories"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    story_dir: Mapped[str] = mapped_column(String, unique=True)
+    story_idea: Mapped[str] = mapped_column(Text)
+    length_minutes: Mapped[int] = mapped_column(Integer)
+    title: Mapped[Optional[str]] = mapped_column(String)
+    status: Mapped[str] = mapped_column(String(16), default="running")
+    scene_count: Mapped[int] = mapped_column(Integer, default=0)
+    runtime_seconds: Mapped[Optional[int]] = mapped_column(Integer)
+    # Revision of the story's manifest.json this row reflects
+    manifest_revision: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[float] = mapped_column(Float)
+    updated_at: Mapped[float] = mapped_column(Float)
+
+    __table_args__ = (
+        Index("stories_updated", "updated_at"),
+        Index("stories_status_updated", "status", "updated_at"),
+    )
+
+class StageOutput(Base):
+    __tablename__ = "story_stages"
+
+    story_id: Mapped[int] = mapped_column(ForeignKey("stories.id", ondelete="CASCADE"), primary_key=True)
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    content: Mapped[str] = mapped_column(Text)
+
+class SceneRecord(Base):
+    __tablename__ = "story_scenes"
+
+    story_id: Mapped[int] = mapped_column(ForeignKey("stories.id", ondelete="CASCADE"), primary_key=True)
+    number: Mapped[int] = mapped_column(Integer, primary_key=True)
+    text: Mapped[str] = mapped_column(Text)
+    timestamp: Mapped[str] = mapped_column(String(8))
+    additional: Mapped[bool] = mapped_column(Boolean, default=False)
+
+class ImagePromptRecord(Base):
+    __tablename__ = "story_image_prompts"
+
+    story_id: Mapped[int] = mapped_column(ForeignKey("stories.id", ondelete="CASCADE"), primary_key=True)
+    number: Mapped[int] = mapped_column(Integer, primary_key=True)
+    prompt: Mapped[str] = mapped_column(Text)
+
+class CallRecord(Base):
+    __tablename__ = "llm_calls"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    story_id: Mapped[int] = mapped_column(ForeignKey("stories.id", ondelete="CASCADE"))
+    agent: Mapped[str] = mapped_column(String(32))
+    stage: Mapped[str] = mapped_column(String(32))
+    model: Mapped[str] = mapped_column(String(64))
+    requested_model: Mapped[Optional[str]] = mapped_column(String(64))
+    outcome: Mapped[str] = mapped_column(String(16))
+    seconds: Mapped[float] = mapped_column(Float)
+    retries: Mapped[int] = mapped_column(Integer, default=0)
+    fallbacks: Mapped[int] = mapped_column(Integer, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    total_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+    recorded_at: Mapped[float] = mapped_column(Float)
+
+    __table_args__ = (
+        Index("llm_calls_story", "story_id"),
+        Index("llm_calls_agent_stage", "agent", "stage"),
+    )
+
+class SearchDocument(Base):
+    """Text of one searchable artifact; the story_search FTS5 index is built over content"""
+    __tablename__ = "search_documents"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    story_id: Mapped[int] = mapped_column(ForeignKey("stories.id", ondelete="CASCADE"))
+    kind: Mapped[str] = mapped_column(String(16))
+    number: Mapped[int] = mapped_column(Integer, default=0)
+    content: Mapped[str] = mapped_column(Text)
+
+    __table_args__ = (Index("search_documents_artifact", "story_id", "kind", "number", unique=True),)
+
+# Stage outputs worth searching; the rest are instructions to other agents
+SEARCHED_STAGES = ("characters", "plot")
+
+# External-content FTS5 index over search_documents, kept in step by triggers
+# so every write path (including cascaded deletes) updates it in the same transaction
+SEARCH_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS story_search USING fts5("
+    "content, content='search_documents', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO story_search(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO story_search(story_search, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO story_search(story_search, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO story_search(rowid, content) VALUES (new.id, new.content); END"
+)
+
+def search_query(query: str) -> Optional[str]:
+    """FTS5 query matching every word typed, the last one as a prefix; None if there are no words"""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    # Quoting each word keeps FTS5 operators and punctuation in user input from being parsed
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+def _key(story_dir) -> str:
+    return str(Path(story_dir).resolve())
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text(encoding='utf-8')
+    except OSError:
+        return None
+
+class StoryStore:
+    """SQLite library of every story: stages, scenes, image prompts and call metrics.
+
+    The pipeline's checkpoint writes through to it, one short transaction
+    per change, so stories can be listed, paged and reopened without
+    walking data/. A story's manifest.json stays the source of truth: every
+    write records the manifest revision it applies, and a story whose row
+    lags its manifest is re-imported with sync_story(). The scene files,
+    screenplay package, JSON and zip are a derived view that
+    export_story() can rebuild. The
+    database runs in WAL mode so concurrent sessions and job workers can
+    write while others read. Ideas, characters, plots and scenes are
+    full-text indexed as they are saved; see search().
+    """
+
+    def __init__(self, db_path: str = "data/stories.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.engine = create_engine(
+            f"sqlite:///{self.db_path}",
+            connect_args={"timeout": 30, "check_same_thread": False}
+        )
+        event.listen(self.engine, "connect", self._configure)
+        inspector = inspect(self.engine)
+        indexed = inspector.has_table("search_documents")
+        if inspector.has_table("stories") and "manifest_revision" not in {
+            column["name"] for column in inspector.get_columns("stories")
+        }:
+            # Library created before rows tracked their manifest revision
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql("ALTER TABLE stories ADD COLUMN manifest_revision INTEGER NOT NULL DEFAULT 0")
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            for statement in SEARCH_SCHEMA:
+                connection.exec_driver_sql(statement)
+        self._sessions = sessionmaker(self.engine, expire_on_commit=False)
+        if not indexed:
+            # Library created before the search index existed
+            self.reindex()
+
+    @staticmethod
+    def _configure(connection, record):
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps the database consistent with NORMAL; only the last commits may be lost on power failure
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    @classmethod
+    def from_env(cls) -> Optional["StoryStore"]:
+        """Build the store from STORY_DB, or None when it is "off\""""
+        path = os.getenv("STORY_DB", "data/stories.db")
+        if path.lower() == "off":
+            return None
+        return cls(path)
+
+    def _story_id(self, session, story_dir) -> Optional[int]:
+        return session.scalar(select(Story.id).where(Story.story_dir == _key(story_dir)))
+
+    def _touch(self, session, story_id: int, revision: Optional[int] = None, **fields):
+        story = session.get(Story, story_id)
+        for name, value in fields.items():
+            setattr(story, name, value)
+        if revision is not None:
+            story.manifest_revision = revision
+        story.updated_at = time.time()
+
+    def revision(self, story_dir) -> Optional[int]:
+        """Manifest revision the store holds for a story, or None if it is not registered"""
+        with self._sessions() as session:
+            return session.scalar(select(Story.manifest_revision).where(Story.story_dir == _key(story_dir)))
+
+    @staticmethod
+    def _index(session, story_id: int, kind: str, number: int, content: str):
+        session.execute(delete(SearchDocument).where(
+            SearchDocument.story_id == story_id, SearchDocument.kind == kind, SearchDocument.number == number
+        ))
+        session.add(SearchDocument(story_id=story_id, kind=kind, number=number, content=content))
+
+    def sync_story(self, story_dir, manifest: dict, replace: bool = False):
+        """Register a run, importing its manifest and scene files if the store does not have them yet.
+
+        replace re-imports a registered story from the manifest, dropping
+        whatever the store held for it.
+        """
+        story_dir = Path(story_dir)
+        now = time.time()
+        revision = manifest.get("revision", 0)
+        with self._sessions.begin() as session:
+            story_id = self._story_id(session, story_dir)
+            if story_id is not None and not replace:
+                self._touch(session, story_id, revision, status="complete" if manifest.get("complete") else "running")
+                return
+            if story_id is None:
+                story = Story(story_dir=_key(story_dir), created_at=now, updated_at=now)
+                session.add(story)
+            else:
+                story = session.get(Story, story_id)
+                for table in (StageOutput, SceneRecord, ImagePromptRecord, SearchDocument):
+                    session.execute(delete(table).where(table.story_id == story_id))
+            story.story_idea = manifest.get("story_idea", "")
+            story.length_minutes = manifest.get("length_minutes") or 0
+            story.title = manifest.get("title") or (make_title(story.story_idea) if story.story_idea else None)
+            story.status = "complete" if manifest.get("complete") else "running"
+            story.runtime_seconds = manifest.get("runtime_seconds")
+            story.manifest_revision = revision
+            story.updated_at = now
+            session.flush()
+
+            stages = [
+                {"story_id": story.id, "name": name, "content": content}
+                for name, content in manifest.get("stages", {}).items()
+            ]
+            scenes = []
+            for number, record in manifest.get("scenes", {}).items():
+                text = _read(story_dir / record["file"])
+                if text is None or record.get("stale"):
+                    continue
+                scenes.append({
+                    "story_id": story.id, "number": int(number), "text": text,
+                    "timestamp": record["timestamp"], "additional": record.get("additional", False)
+                })
+            prompts = [
+                {"story_id": story.id, "number": int(number), "prompt": prompt}
+                for number, prompt in manifest.get("image_prompts", {}).items()
+            ]
+            documents = [{"story_id": story.id, "kind": "idea", "number": 0, "content": story.story_idea}] + [
+                {"story_id": story.id, "kind": row["name"], "number": 0, "content": row["content"]}
+                for row in stages if row["name"] in SEARCHED_STAGES
+            ] + [
+                {"story_id": story.id, "kind": "scene", "number": row["number"], "content": row["text"]}
+                for row in scenes
+            ]
+            # One executemany per table
+            for table, rows in (
+                (StageOutput, stages), (SceneRecord, scenes), (ImagePromptRecord, prompts), (SearchDocument, documents)
+            ):
+                if rows:
+                    session.execute(insert(table), rows)
+            story.scene_count = len(scenes)
+
+    def save_stage(self, story_dir, name: str, content: str, revision: Optional[int] = None):
+        with self._sessions.begin() as session:
+            story_id = self._story_id(session, story_dir)
+            if story_id is None:
+                return
+            session.merge(StageOutput(story_id=story_id, name=name, content=content))
+            if name in SEARCHED_STAGES:
+                self._index(session, story_id, name, 0, content)
+            self._touch(session, story_id, revision)
+
+    def save_scene(self, story_dir, number: int, text: str, timestamp: str, additional: bool = False,
+                   revision: Optional[int] = None):
+        with self._sessions.begin() as session:
+            story_id = self._story_id(session, story_dir)
+            if story_id is None:
+                return
+            session.merge(SceneRecord(story_id=story_id, number=number, text=text, timestamp=timestamp, additional=additional))
+            self._index(session, story_id, "scene", number, text)
+            session.flush()
+            count = session.scalar(select(func.count()).select_from(SceneRecord).where(SceneRecord.story_id == story_id))
+            self._touch(session, story_id, revision, scene_count=count)
+
+    def save_image_prompts(self, story_dir, prompts: Dict[int, str], revision: Optional[int] = None):
+        with self._sessions.begin() as session:
+            story_id = self._story_id(session, story_dir)
+            if story_id is None or not prompts:
+                return
+            session.execute(delete(ImagePromptRecord).where(
+                ImagePromptRecord.story_id == story_id, ImagePromptRecord.number.in_(list(prompts))
+            ))
+            session.execute(insert(ImagePromptRecord), [
+                {"story_id": story_id, "number": number, "prompt": prompt} for number, prompt in prompts.items()
+            ])
+            self._touch(session, story_id, revision)
+
+    def forget(self, story_dir, artifacts: Iterable[str], revision: Optional[int] = None):
+        """Drop invalidated artifacts ("plot", "scene:7", "image_prompt:7") in one transaction"""
+        stages, scenes, prompts = [], [], []
+        for artifact in artifacts:
+            kind, _, number = artifact.partition(":")
+            if kind == "scene":
+                scenes.append(int(number))
+            elif kind == "image_prompt":
+                prompts.append(int(number))
+            else:
+                stages.append(kind)
+        with self._sessions.begin() as session:
+            story_id = self._story_id(session, story_dir)
+            if story_id is None:
+                return
+            session.execute(delete(StageOutput).where(StageOutput.story_id == story_id, StageOutput.name.in_(stages)))
+            session.execute(delete(SceneRecord).where(SceneRecord.story_id == story_id, SceneRecord.number.in_(scenes)))
+            session.execute(delete(ImagePromptRecord).where(
+                ImagePromptRecord.story_id == story_id, ImagePromptRecord.number.in_(prompts)
+            ))
+            session.execute(delete(SearchDocument).where(SearchDocument.story_id == story_id, (
+                SearchDocument.kind.in_(stages) | ((SearchDocument.kind == "scene") & SearchDocument.number.in_(scenes))
+            )))
+            session.flush()
+            count = session.scalar(select(func.count()).select_from(SceneRecord).where(SceneRecord.story_id == story_id))
+            self._touch(session, story_id, revision, status="running", scene_count=count)
+
+    def mark_complete(self, story_dir, title: Optional[str] = None, runtime_seconds: Optional[int] = None,
+                      revision: Optional[int] = None):
+        with self._sessions.begin() as session:
+            story_id = self._story_id(session, story_dir)
+            if story_id is None:
+                return
+            fields = {"status": "complete"}
+            if title is not None:
+                fields["title"] = title
+            if runtime_seconds is not None:
+                fields["runtime_seconds"] = runtime_seconds
+            self._touch(session, story_id, revision, **fields)
+
+    def record_calls(self, story_dir, calls: List[dict]):
+        """Store a run's per-call metrics in one batched insert"""
+        if not calls:
+            return
+        now = time.time()
+        columns = ("agent", "stage", "model", "requested_model", "outcome", "seconds", "retries",
+                   "prompt_tokens", "completion_tokens", "total_tokens", "cost_usd")
+        with self._sessions.begin() as session:
+            story_id = self._story_id(session, story_dir)
+            if story_id is None:
+                return
+            session.execute(insert(CallRecord), [
+                dict(
+                    {name: call.get(name) for name in columns},
+                    story_id=story_id, fallbacks=len(call.get("fallbacks", [])), recorded_at=now
+                )
+                for call in calls
+            ])
+
+    def delete_story(self, story_dir):
+        with self._sessions.begin() as session:
+            session.execute(delete(Story).where(Story.story_dir == _key(story_dir)))
+
+    def list_stories(self, page: int = 0, page_size: int = 20, status: Optional[str] = None) -> Tuple[List[dict], int]:
+        """One page of stories, most recently updated first, and the total count"""
+        query = select(Story)
+        count = select(func.count()).select_from(Story)
+        if status is not None:
+            query = query.where(Story.status == status)
+            count = count.where(Story.status == status)
+        query = query.order_by(Story.updated_at.desc()).limit(page_size).offset(page * page_size)
+        with self._sessions() as session:
+            stories = session.scalars(query).all()
+            total = session.scalar(count)
+        return [self._summary(story) for story in stories], total
+
+    @staticmethod
+    def _summary(story: Story) -> dict:
+        return {
+            "id": story.id,
+            "story_dir": story.story_dir,
+            "story_idea": story.story_idea,
+            "length_minutes": story.length_minutes,
+            "title": story.title,
+            "status": story.status,
+            "scene_count": story.scene_count,
+            "runtime_seconds": story.runtime_seconds,
+            "created_at": story.created_at,
+            "updated_at": story.updated_at
+        }
+
+    def get_story(self, story_id: int) -> Optional[dict]:
+        """A story with its stages, scenes and image prompts"""
+        with self._sessions() as session:
+            story = session.get(Story, story_id)
+            if story is None:
+                return None
+            result = self._summary(story)
+            result["stages"] = {
+                row.name: row.content
+                for row in session.scalars(select(StageOutput).where(StageOutput.story_id == story_id))
+            }
+            result["scenes"] = [
+                {"number": row.number, "text": row.text, "timestamp": row.timestamp, "additional": row.additional}
+                for row in session.scalars(
+                    select(SceneRecord).where(SceneRecord.story_id == story_id).order_by(SceneRecord.number)
+                )
+            ]
+            result["image_prompts"] = {
+                row.number: row.prompt
+                for row in session.scalars(select(ImagePromptRecord).where(ImagePromptRecord.story_id == story_id))
+            }
+        return result
+
+    def export_story(self, story_id: int, story_dir=None) -> Path:
+        """Rebuild the text view of a complete story (scene files, package, JSON) from the database"""
+        story = self.get_story(story_id)
+        if story is None:
+            raise ValueError(f"No story {story_id}")
+        story_dir = Path(story_dir or story["story_dir"])
+        outline, _ = parse_scene_outline(story["stages"].get("scene_outlines", ""))
+        assembler = ScreenplayAssembler(
+            story_dir, story["title"] or make_title(story["story_idea"]), story["length_minutes"],
+            story["stages"].get("characters", ""), story["stages"].get("plot", "")
+        )
+        try:
+            for scene in story["scenes"]:
+                number = scene["number"]
+                scene_file = story_dir / "scenes" / f"scene_{number:02d}.txt"
+                atomic_write(scene_file, scene["text"])
+                assembler.add_scene(number, scene_file, scene["timestamp"], outline[number - 1] if number <= len(outline) else None)
+            assembler.add_prompts(story["image_prompts"])
+            return assembler.finish()
+        except BaseException:
+            assembler.abort()
+            raise
+
+    def search(self, query: str, limit: int = 20, kinds: Optional[Iterable[str]] = None,
+               highlight: Tuple[str, str] = ("**", "**")) -> List[dict]:
+        """Best-matching ideas, character sheets, plots and scenes, each with a highlighted snippet.
+
+        Results are ranked by BM25 (most relevant first) and kinds limits
+        them to some of "idea", "characters", "plot" and "scene".
+        """
+        match = search_query(query)
+        if match is None:
+            return []
+        params = {"match": match, "start": highlight[0], "end": highlight[1], "limit": limit}
+        where = ""
+        if kinds is not None:
+            kinds = list(kinds)
+            names = [f"kind{i}" for i in range(len(kinds))]
+            where = f"AND d.kind IN ({', '.join(':' + name for name in names)})"
+            params.update(zip(names, kinds))
+        statement = text(f"""
+            SELECT d.id, d.story_id, d.kind, d.number, s.title, s.story_dir,
+                   snippet(story_search, 0, :start, :end, '…', 16) AS snippet,
+                   bm25(story_search) AS rank
+            FROM story_search
+            JOIN search_documents d ON d.id = story_search.rowid
+            JOIN stories s ON s.id = d.story_id
+            WHERE story_search MATCH :match {where}
+            ORDER BY rank
+            LIMIT :limit
+        """)
+        with self.engine.connect() as connection:
+            return [dict(row._mapping) for row in connection.execute(statement, params)]
+
+    def document(self, document_id: int) -> Optional[dict]:
+        """Full text of a search result, for reuse as a seed"""
+        with self._sessions() as session:
+            document = session.get(SearchDocument, document_id)
+            if document is None:
+                return None
+            return {
+                "id": document.id, "story_id": document.story_id, "kind": document.kind,
+                "number": document.number, "content": document.content
+            }
+
+    def reindex(self):
+        """Rebuild the search documents from the stored stories in one transaction"""
+        with self._sessions.begin() as session:
+            session.execute(delete(SearchDocument))
+            session.execute(insert(SearchDocument).from_select(
+                ["story_id", "kind", "number", "content"],
+                select(Story.id, text("'idea'"), text("0"), Story.story_idea)
+            ))
+            session.execute(insert(SearchDocument).from_select(
+                ["story_id", "kind", "number", "content"],
+                select(StageOutput.story_id, StageOutput.name, text("0"), StageOutput.content)
+                .where(StageOutput.name.in_(SEARCHED_STAGES))
+            ))
+            session.execute(insert(SearchDocument).from_select(
+                ["story_id", "kind", "number", "content"],
+                select(SceneRecord.story_id, text("'scene'"), SceneRecord.number, SceneRecord.text)
+            ))
+
+    def import_story_dirs(self, data_dir) -> int:
+        """Add story directories that predate the store; returns how many were imported"""
+        data_dir = Path(data_dir)
+        if not data_dir.exists():
+            return 0
+        with self._sessions() as session:
+            known = set(session.scalars(select(Story.story_dir)))
+        imported = 0
+        for manifest_path in sorted(data_dir.glob("*/manifest.json")):
+            story_dir = manifest_path.parent
+            if _key(story_dir) in known:
+                continue
+            try:
+                manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            if manifest.get("story_idea"):
+                self.sync_story(story_dir, manifest)
+                imported += 1
+        return imported
+
+_lock = threading.Lock()
+_store = None
+_loaded = False
+
+def get_story_store() -> Optional[StoryStore]:
+    """Process-wide story store (None when STORY_DB=off)"""
+    global _store, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                _store = StoryStore.from_env()
+                _loaded = True
+    return _store
@@ -0,0 +1,29 @@
+import json
+import re
+from typing import Any
+
+# response_format asking the API for a single JSON object
+JSON_RESPONSE = {"type": "json_object"}
+
+FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+def extract_json(text: str) -> Any:
+    """Parse the JSON value in a model reply, tolerating code fences and surrounding prose.
+
+    Raises ValueError if no JSON object or array can be decoded.
+    """
+    text = FENCE_RE.sub("", text.strip())
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    # Fall back to the outermost {...} or [...] span
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON found in reply")
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]")
+    if end <= start:
+        raise ValueError("Unterminated JSON in reply")
+    return json.loads(text[start:end + 1])
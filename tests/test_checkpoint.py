@@ -0,0 +1,112 @@
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from services.checkpoint import PipelineCheckpoint
+from services.story_store import StoryStore
+
+@pytest.fixture
+def store(tmp_path):
+    return StoryStore(str(tmp_path / "stories.db"))
+
+def started(tmp_path, store) -> PipelineCheckpoint:
+    story_dir = tmp_path / "story_a"
+    (story_dir / "scenes").mkdir(parents=True)
+    checkpoint = PipelineCheckpoint(story_dir, store=store)
+    checkpoint.start("A girl finds a robot", 1)
+    return checkpoint
+
+def add_scene(checkpoint: PipelineCheckpoint, i: int):
+    scene_file = checkpoint.story_dir / "scenes" / f"scene_{i:02d}.txt"
+    scene_file.write_text(f"INT. ROOM {i} - DAY", encoding="utf-8")
+    checkpoint.set_scene(i, scene_file, "0:30")
+
+def stored(store: StoryStore) -> dict:
+    [summary], _ = store.list_stories()
+    return store.get_story(summary["id"])
+
+def test_store_records_the_manifest_revision(tmp_path, store):
+    checkpoint = started(tmp_path, store)
+    checkpoint.set_stage("plot", "A plot")
+    add_scene(checkpoint, 1)
+    assert store.revision(checkpoint.story_dir) == checkpoint.revision == checkpoint.data["revision"]
+    checkpoint.add_fill_round()
+    assert store.revision(checkpoint.story_dir) == checkpoint.revision
+
+def test_writes_on_an_event_loop_run_in_order_off_the_loop(tmp_path, store):
+    checkpoint = started(tmp_path, store)
+
+    async def run():
+        checkpoint.set_stage("plot", "A plot")
+        add_scene(checkpoint, 1)
+        add_scene(checkpoint, 2)
+        checkpoint.invalidate("scene:2")
+        assert checkpoint._writes is not None
+        await checkpoint.synced()
+
+    asyncio.run(run())
+    story = stored(store)
+    assert story["stages"] == {"plot": "A plot"}
+    assert [scene["number"] for scene in story["scenes"]] == [1]
+    assert store.revision(checkpoint.story_dir) == checkpoint.revision
+
+def test_failed_write_is_recovered_from_the_manifest(tmp_path, store, monkeypatch):
+    checkpoint = started(tmp_path, store)
+
+    def locked(*args, **kwargs):
+        raise OperationalError("UPDATE stories", {}, Exception("database is locked"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(store, "save_stage", locked)
+        checkpoint.set_stage("plot", "A plot")
+        # Skipped: the store already missed a change
+        checkpoint.set_stage("characters", "Maya")
+    assert isinstance(checkpoint.store_error, OperationalError)
+    assert stored(store)["stages"] == {}
+
+    asyncio.run(checkpoint.synced())
+    assert checkpoint.store_error is None
+    assert stored(store)["stages"] == {"plot": "A plot", "characters": "Maya"}
+    assert store.revision(checkpoint.story_dir) == checkpoint.revision
+
+def test_opening_a_story_upserts_it_from_the_manifest(tmp_path, store):
+    checkpoint = started(tmp_path, store)
+    checkpoint.set_stage("plot", "A plot")
+    add_scene(checkpoint, 1)
+    checkpoint.mark_complete("A Girl Finds a Robot", 30)
+    store.delete_story(checkpoint.story_dir)
+
+    opened = PipelineCheckpoint(checkpoint.story_dir, store=store)
+    opened.sync_store()
+    story = stored(store)
+    assert story["status"] == "complete"
+    assert story["title"] == "A Girl Finds a Robot"
+    assert [scene["text"] for scene in story["scenes"]] == ["INT. ROOM 1 - DAY"]
+
+def test_invalidating_a_stage_drops_everything_after_it(tmp_path, store):
+    checkpoint = started(tmp_path, store)
+    for stage in ("creative_direction", "characters", "plot", "scene_outlines"):
+        checkpoint.set_stage(stage, stage)
+    add_scene(checkpoint, 1)
+    checkpoint.set_image_prompts({1: "A robot"})
+
+    assert checkpoint.invalidate("plot") == ["plot", "scene_outlines", "scene:1", "image_prompt:1"]
+    assert checkpoint.stage("characters") == "characters"
+    assert checkpoint.stage("plot") is None
+    assert checkpoint.scene(1) is None
+    assert checkpoint.image_prompts() == {}
+    assert not (checkpoint.story_dir / "scenes" / "scene_01.txt").exists()
+    story = stored(store)
+    assert set(story["stages"]) == {"creative_direction", "characters"}
+    assert story["scenes"] == [] and story["image_prompts"] == {}
+
+def test_library_from_before_revisions_is_migrated(tmp_path):
+    db_path = tmp_path / "stories.db"
+    StoryStore(str(db_path)).engine.dispose()
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("ALTER TABLE stories DROP COLUMN manifest_revision")
+    store = StoryStore(str(db_path))
+    checkpoint = started(tmp_path, store)
+    assert store.revision(checkpoint.story_dir) == checkpoint.revision
@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+from services.completion_cache import CacheMissError, CompletionCache
+
+MESSAGES = [{"role": "user", "content": "Write a scene"}]
+
+def test_key_depends_on_model_messages_and_temperature():
+    key = CompletionCache.key("gpt-4o", MESSAGES, 0.7)
+    assert key == CompletionCache.key("gpt-4o", list(MESSAGES), 0.7)
+    assert key != CompletionCache.key("gpt-4o-mini", MESSAGES, 0.7)
+    assert key != CompletionCache.key("gpt-4o", MESSAGES, 0.2)
+
+def test_key_separates_json_mode_from_plain_requests():
+    plain = CompletionCache.key("gpt-4o", MESSAGES, 0.7)
+    assert plain == CompletionCache.key("gpt-4o", MESSAGES, 0.7, None)
+    assert plain != CompletionCache.key("gpt-4o", MESSAGES, 0.7, {"type": "json_object"})
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    cache = CompletionCache(str(tmp_path))
+    key = cache.key("gpt-4o", MESSAGES, 0.7)
+    cache.set(key, "INT. LAB - NIGHT")
+    assert cache.get(key) == "INT. LAB - NIGHT"
+    assert cache.memory_hits == 1
+
+    reopened = CompletionCache(str(tmp_path))
+    assert reopened.get(key) == "INT. LAB - NIGHT"
+    assert reopened.disk_hits == 1
+
+def test_expired_entries_are_dropped(tmp_path, monkeypatch):
+    cache = CompletionCache(str(tmp_path), ttl_seconds=60)
+    cache.set("a" * 64, "old")
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("a" * 64) is None
+    assert not cache._path("a" * 64).exists()
+    assert cache.stats()["disk_bytes"] == 0
+
+def test_replay_ignores_ttl_and_raises_on_a_miss(tmp_path, monkeypatch):
+    CompletionCache(str(tmp_path), ttl_seconds=60).set("a" * 64, "recorded")
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    replay = CompletionCache(str(tmp_path), mode="replay", ttl_seconds=60)
+    assert replay.get("a" * 64) == "recorded"
+    with pytest.raises(CacheMissError):
+        replay.get("b" * 64)
+    replay.set("b" * 64, "ignored")
+    assert not replay._path("b" * 64).exists()
+
+def test_memory_tier_is_lru_bounded(tmp_path):
+    cache = CompletionCache(str(tmp_path), max_memory_items=2)
+    for key in ("a", "b"):
+        cache.set(key * 64, key)
+    cache.get("a" * 64)
+    cache.set("c" * 64, "c")
+    assert list(cache._memory) == ["a" * 64, "c" * 64]
+
+def test_disk_eviction_drops_least_recently_used(tmp_path):
+    cache = CompletionCache(str(tmp_path), max_disk_bytes=10**6)
+    entry_bytes = None
+    for i, key in enumerate(("a", "b", "c")):
+        cache.set(key * 64, "x" * 100)
+        entry_bytes = entry_bytes or cache.stats()["disk_bytes"]
+        # Distinct mtimes so the eviction order does not depend on timer resolution
+        path = cache._path(key * 64)
+        stamp = path.stat().st_mtime - 100 + i
+        os.utime(path, (stamp, stamp))
+    cache._memory.clear()
+    cache.get("a" * 64)  # touched: now the most recently used
+
+    cache.max_disk_bytes = entry_bytes * 3 - 1
+    cache.set("d" * 64, "x" * 100)
+    remaining = sorted(p.stem[0] for p in tmp_path.glob("*/*.json"))
+    assert remaining == ["a", "d"]
+    assert cache.stats()["disk_bytes"] <= cache.max_disk_bytes * 0.9
@@ -0,0 +1,29 @@
+from services.console import AgentConsole
+
+def test_streamed_message_is_written_to_disk_once_final(tmp_path):
+    console = AgentConsole(max_chars=10, log_dir=str(tmp_path), echo=False)
+    message_id = console.append("short")
+    for length in (20, 40, 80):
+        console.replace(message_id, "x" * length)
+    assert not console.log_dir.exists()
+    assert "70 more characters so far" in console.html()
+
+    console.replace(message_id, "y" * 100, final=True)
+    [log] = console.log_dir.iterdir()
+    assert log.read_text() == "y" * 100
+    assert "90 more characters in" in console.html()
+
+def test_final_text_of_a_scrolled_out_message_is_kept(tmp_path):
+    console = AgentConsole(max_messages=1, max_chars=10, log_dir=str(tmp_path), echo=False)
+    first = console.append("streaming")
+    console.append("newer")
+    console.replace(first, "z" * 50, final=True)
+    [log] = console.log_dir.iterdir()
+    assert log.read_text() == "z" * 50
+    assert "z" not in console.html()
+
+def test_long_appended_message_is_shortened(tmp_path):
+    console = AgentConsole(max_chars=10, log_dir=str(tmp_path), echo=False)
+    console.append("a" * 25)
+    assert "15 more characters in" in console.html()
+    assert len(list(console.log_dir.iterdir())) == 1
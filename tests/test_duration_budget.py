@@ -0,0 +1,65 @@
+import pytest
+
+from services.duration_budget import (
+    MAX_RUNTIME_RATIO, MAX_SCENE_SECONDS, MIN_SCENE_SECONDS, accept_fill, plan_fill, plan_scene_durations
+)
+
+def outline(*sizes):
+    return [{"action": "x" * size} for size in sizes]
+
+@pytest.mark.parametrize("sizes, target", [
+    ((100, 100, 100), 180),
+    ((50, 100, 400, 80, 120), 300),
+    ((10, 1000, 10, 10), 200),
+    ((300,) * 10, 600),
+    ((100, 200, 300, 400, 500, 600), 487),
+])
+def test_budgets_are_clamped_rounded_and_sum_to_the_target(sizes, target):
+    budgets = plan_scene_durations(outline(*sizes), target)
+    assert len(budgets) == len(sizes)
+    assert all(MIN_SCENE_SECONDS <= b <= MAX_SCENE_SECONDS and b % 5 == 0 for b in budgets)
+    assert sum(budgets) == 5 * round(target / 5)
+
+def test_longer_outlines_get_larger_budgets():
+    budgets = plan_scene_durations(outline(50, 100, 200), 180)
+    assert budgets[0] < budgets[1] < budgets[2]
+
+def test_budgets_stay_at_the_limits_when_the_target_is_out_of_reach():
+    assert plan_scene_durations(outline(100, 100), 600) == [MAX_SCENE_SECONDS] * 2
+    assert plan_scene_durations(outline(100, 100, 100), 20) == [MIN_SCENE_SECONDS] * 3
+    assert plan_scene_durations([], 300) == []
+
+def test_no_fill_at_or_above_ninety_percent():
+    assert plan_fill(270, 300, 6) == []
+    assert plan_fill(300, 300, 6) == []
+    assert plan_fill(330, 300, 6) == []
+    assert plan_fill(100, 300, 0) == []
+
+def test_fill_covers_the_shortfall_within_the_scene_cap():
+    durations = plan_fill(120, 300, 6)
+    assert durations and all(MIN_SCENE_SECONDS <= d <= MAX_SCENE_SECONDS and d % 5 == 0 for d in durations)
+    assert 300 * 0.9 <= 120 + sum(durations) <= 300 * MAX_RUNTIME_RATIO
+
+@pytest.mark.parametrize("max_scenes", [1, 2, 6])
+def test_fill_respects_the_scene_limit(max_scenes):
+    durations = plan_fill(0, 1800, max_scenes)
+    assert len(durations) == max_scenes
+    assert all(d <= MAX_SCENE_SECONDS for d in durations)
+
+def test_accept_fill_stops_once_in_range():
+    assert accept_fill(200, 300, [45, 45, 45]) == 2
+    assert accept_fill(280, 300, [30]) == 0
+
+@pytest.mark.parametrize("current, durations", [
+    (150, [120, 120]),
+    (250, [120]),
+    (100, [60, 60, 120, 60]),
+    (10, [120, 120, 120]),
+])
+def test_accept_fill_never_passes_the_overshoot_cap(current, durations):
+    kept = accept_fill(current, 300, durations)
+    assert current + sum(durations[:kept]) <= 300 * MAX_RUNTIME_RATIO
+
+def test_accept_fill_drops_a_scene_that_overshoots_even_if_nearer_the_target():
+    # 150 + 195 = 345 is nearer 300 than 150 is, but past 330
+    assert accept_fill(150, 300, [195]) == 0
@@ -0,0 +1,99 @@
+import sqlite3
+import time
+
+import pytest
+
+from services import job_queue
+from services.job_queue import JobQueue
+
+@pytest.fixture
+def started(monkeypatch):
+    """Job ids handed to the worker pool, instead of running the pipeline"""
+    ids = []
+    monkeypatch.setattr(JobQueue, "_run", lambda self, job_id: ids.append(job_id))
+    return ids
+
+def make_queue(tmp_path, **kwargs) -> JobQueue:
+    queue = JobQueue(tmp_path / "jobs.db", max_jobs=1, heartbeat_seconds=3600, **kwargs)
+    return queue
+
+def insert_job(db_path, job_id: str, owner: str, heartbeat_at: float, status: str = "running"):
+    db = sqlite3.connect(db_path)
+    with db:
+        db.execute(
+            "INSERT INTO jobs (id, story_idea, length_minutes, story_dir, status, owner, heartbeat_at, created_at) "
+            "VALUES (?, 'idea', 1, 'data/story', ?, ?, ?, ?)",
+            (job_id, status, owner, heartbeat_at, heartbeat_at)
+        )
+    db.close()
+
+def wait_for(ids, count: int):
+    deadline = time.monotonic() + 5
+    while len(ids) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_owner_differs_between_process_starts():
+    # A restarted container has the same hostname and PID
+    assert job_queue._owner() != job_queue._owner()
+
+def test_expired_lease_is_recovered(tmp_path, started):
+    first = make_queue(tmp_path)
+    insert_job(first.db_path, "orphan", first.owner, time.time() - 600)
+    first.stop()
+
+    second = make_queue(tmp_path, lease_seconds=60)
+    wait_for(started, 1)
+    assert started == ["orphan"]
+    job = second.get("orphan")
+    assert job["status"] == "queued"
+    assert job["owner"] == second.owner
+    second.stop()
+
+def test_live_lease_is_left_alone(tmp_path, started):
+    queue = make_queue(tmp_path)
+    insert_job(queue.db_path, "busy", "other-host:1:abcd", time.time())
+    queue._recover()
+    assert started == []
+    assert queue.get("busy")["owner"] == "other-host:1:abcd"
+    queue.stop()
+
+def test_heartbeat_renews_own_active_jobs_only(tmp_path, started):
+    queue = make_queue(tmp_path)
+    insert_job(queue.db_path, "mine", queue.owner, 0)
+    insert_job(queue.db_path, "done", queue.owner, 0, status="done")
+    queue.heartbeat()
+    assert queue.get("mine")["heartbeat_at"] > time.time() - 5
+    assert queue.get("done")["heartbeat_at"] == 0
+    queue.stop()
+
+def test_events_since_returns_only_changed_lines(tmp_path, started):
+    queue = make_queue(tmp_path)
+    queue.record_events("job", {0: "first", 1: "streaming"})
+    lines, version = queue.events_since("job")
+    assert lines == {0: "first", 1: "streaming"}
+    assert queue.events_since("job", version) == ({}, version)
+
+    queue.record_events("job", {1: "streamed", 2: "next"})
+    lines, newer = queue.events_since("job", version)
+    assert lines == {1: "streamed", 2: "next"}
+    assert newer > version
+    assert queue.events("job") == ["first", "streamed", "next"]
+    queue.stop()
+
+def test_old_database_is_migrated(tmp_path, started):
+    db = sqlite3.connect(tmp_path / "jobs.db")
+    db.executescript(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, story_idea TEXT NOT NULL, length_minutes INTEGER NOT NULL, "
+        "story_dir TEXT NOT NULL, status TEXT NOT NULL, error TEXT, result_path TEXT, owner TEXT, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL);"
+        "CREATE TABLE job_events (job_id TEXT NOT NULL, seq INTEGER NOT NULL, created_at REAL NOT NULL, "
+        "message TEXT NOT NULL, PRIMARY KEY (job_id, seq));"
+        "INSERT INTO jobs VALUES ('old', 'idea', 1, 'data/story', 'running', NULL, NULL, 'host:1', 0, 0, NULL);"
+    )
+    db.close()
+    queue = make_queue(tmp_path)
+    wait_for(started, 1)
+    assert started == ["old"]
+    queue.record_events("old", {0: "hello"})
+    assert queue.events_since("old")[0] == {0: "hello"}
+    queue.stop()
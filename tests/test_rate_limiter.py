@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from services.rate_limiter import LimiterTimeout, RateLimiter
+
+def rate_limit_error() -> RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": "30"})
+    return RateLimitError("rate limited", response=response, body=None)
+
+def test_every_acquire_is_released():
+    limiter = RateLimiter(initial_concurrency=2)
+    limiter.acquire(10)
+    limiter.acquire(10)
+    assert limiter.in_flight == 2
+    limiter.release()
+    limiter.release(completed=False)
+    assert limiter.in_flight == 0
+
+def test_abandoned_request_does_not_grow_concurrency():
+    limiter = RateLimiter(initial_concurrency=2)
+    limiter.acquire(10)
+    limiter.release(completed=False)
+    assert limiter.concurrency == 2
+    limiter.acquire(10)
+    limiter.release()
+    assert limiter.concurrency > 2
+
+def test_acquire_gives_up_at_the_deadline():
+    limiter = RateLimiter(initial_concurrency=1)
+    limiter.acquire(10)
+    started = time.monotonic()
+    with pytest.raises(LimiterTimeout):
+        limiter.acquire(10, deadline=time.monotonic() + 0.2)
+    assert time.monotonic() - started < 1
+    assert limiter.in_flight == 1
+
+def test_aacquire_gives_up_at_the_deadline():
+    limiter = RateLimiter(initial_concurrency=1)
+    limiter.acquire(10)
+    with pytest.raises(LimiterTimeout):
+        asyncio.run(limiter.aacquire(10, deadline=time.monotonic() + 0.2))
+
+def test_rate_limit_pauses_only_that_model():
+    limiter = RateLimiter(initial_concurrency=4)
+    limiter.acquire(10, "gpt-a")
+    error = rate_limit_error()
+    limiter.release(error.response.headers, error, "gpt-a")
+    assert limiter.pause_remaining("gpt-a") > 20
+    assert limiter.pause_remaining("gpt-b") == 0
+    assert limiter.concurrency == 2
+    with pytest.raises(LimiterTimeout):
+        limiter.acquire(10, "gpt-a", deadline=time.monotonic() + 0.1)
+    limiter.acquire(10, "gpt-b")
+
+def test_cancelled_completion_frees_its_slot(monkeypatch):
+    from agents import BaseAgent
+
+    agent = BaseAgent("Tester", "Test")
+    agent.cache = None
+    agent.limiter = RateLimiter(initial_concurrency=2)
+    started = asyncio.Event()
+
+    async def hang(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(agent, "_aget_response", hang)
+
+    async def run():
+        task = asyncio.create_task(agent.aget_completion([{"role": "user", "content": "hi"}]))
+        await started.wait()
+        assert agent.limiter.in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert agent.limiter.in_flight == 0
@@ -0,0 +1,62 @@
+import json
+
+from services.scene_outline import count_in_range, format_scene_outline, parse_scene_outline
+
+def scene(number, setting="INT. LAB - DAY", action="Maya packs.", **fields):
+    return dict(scene_number=number, setting=setting, action=action, **fields)
+
+def test_plain_json():
+    reply = json.dumps({"scenes": [scene(1, characters=["Maya"]), scene(2, "EXT. PIER - NIGHT", "Omar waits.")]})
+    scenes, broken = parse_scene_outline(reply)
+    assert [(s["scene_number"], s["setting"]) for s in scenes] == [(1, "INT. LAB - DAY"), (2, "EXT. PIER - NIGHT")]
+    assert scenes[0]["characters"] == ["Maya"]
+    assert broken == []
+
+def test_fenced_json_with_surrounding_prose():
+    reply = "Here is the outline:\n```json\n" + json.dumps([scene(1), scene(2)]) + "\n```\nLet me know!"
+    scenes, broken = parse_scene_outline(reply)
+    assert len(scenes) == 2 and broken == []
+
+def test_text_fallback_splits_only_at_line_leading_headings():
+    reply = """Scene 1: INT. LAB - DAY
+Maya packs. The scene shifts as the alarm sounds, a scene of chaos.
+
+**Scene 2**
+EXT. PIER - NIGHT
+Omar waits for the last boat.
+
+## Scene 3 - INT. BOAT - NIGHT
+They argue about the scene at the lab."""
+    scenes, broken = parse_scene_outline(reply)
+    assert [s["setting"] for s in scenes] == ["INT. LAB - DAY", "EXT. PIER - NIGHT", "INT. BOAT - NIGHT"]
+    assert "a scene of chaos" in scenes[0]["action"]
+    assert scenes[1]["action"] == "Omar waits for the last boat."
+    assert broken == []
+
+def test_scenes_are_sorted_and_renumbered():
+    reply = json.dumps([scene(4, "C"), scene(2, "A"), scene(None, "D"), scene(3, "B")])
+    scenes, _ = parse_scene_outline(reply)
+    assert [(s["scene_number"], s["setting"]) for s in scenes] == [(1, "A"), (2, "B"), (3, "C"), (4, "D")]
+    kept, _ = parse_scene_outline(reply, renumber=False)
+    assert [s["scene_number"] for s in kept] == [2, 3, 4, None]
+
+def test_scenes_missing_setting_or_action_are_reported():
+    reply = json.dumps([scene(1), scene(2, setting=""), scene(3, action=None, description="Omar waits."), scene(4, action="")])
+    scenes, broken = parse_scene_outline(reply)
+    assert len(scenes) == 4
+    # A "description" stands in for the action
+    assert scenes[2]["action"] == "Omar waits."
+    assert broken == [2, 4]
+
+def test_unparseable_reply_gives_no_scenes():
+    assert parse_scene_outline("I could not write an outline.") == ([], [])
+
+def test_count_window_is_three_quarters_to_one_and_a_half_times_the_target():
+    assert not count_in_range(5, 8)
+    assert count_in_range(6, 8)
+    assert count_in_range(12, 8)
+    assert not count_in_range(13, 8)
+
+def test_format_scene_outline_includes_optional_fields():
+    text = format_scene_outline(dict(scene(1), characters=["Maya", "Omar"], visuals="Fog", dialogue_summary=""))
+    assert text == "Scene 1: INT. LAB - DAY\nCharacters: Maya, Omar\nMaya packs.\nVisuals: Fog"
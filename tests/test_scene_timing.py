@@ -0,0 +1,63 @@
+import pytest
+
+from agents.time_stamper import TimeStamper
+from services.scene_timing import (
+    ACTION_LINE_WIDTH, DIALOGUE_LINE_WIDTH, estimate_seconds, format_timestamp, parse_screenplay, parse_timestamp
+)
+
+SCENE = """FADE IN:
+
+INT. LIGHTHOUSE - NIGHT
+
+Rain hammers the glass. MAYA climbs the stairs.
+
+MAYA
+(whispering)
+Is anyone up here?
+
+OMAR: Only me.
+
+CUT TO:"""
+
+def kinds(text: str) -> list:
+    return [element.kind for element in parse_screenplay(text)]
+
+def test_elements_are_recognised():
+    assert kinds(SCENE) == [
+        "transition", "heading", "action", "character", "parenthetical", "dialogue",
+        "character", "dialogue", "transition"
+    ]
+
+def test_markdown_emphasis_is_ignored():
+    assert kinds("**INT. LAB - DAY**\n\n**MAYA**\nHello.") == ["heading", "character", "dialogue"]
+
+@pytest.mark.parametrize("text, seconds", [
+    ("INT. LAB - DAY", 10),
+    ("EXT. PIER - NIGHT\n\nESTABLISHING - THE HARBOUR", 20),
+    ("Maya packs a bag.", 5),
+    ("MAYA\nHello.", 3),
+    ("MAYA\nHello.\nAnyone there?", 6),
+    ("OMAR (softly): Late again.", 3),
+    ("FADE OUT.", 5),
+    ("DISSOLVE TO:", 5),
+    (SCENE, 5 + 10 + 5 + 3 + 3 + 5),
+])
+def test_per_element_rates(text, seconds):
+    assert estimate_seconds(text) == seconds
+
+def test_long_lines_count_as_several():
+    assert estimate_seconds("a" * ACTION_LINE_WIDTH) == 5
+    assert estimate_seconds("a" * (ACTION_LINE_WIDTH * 2 + 1)) == 15
+    assert estimate_seconds("MAYA\n" + "b" * (DIALOGUE_LINE_WIDTH + 1)) == 6
+
+@pytest.mark.parametrize("seconds", [0, 5, 59, 60, 61, 754, 3599])
+def test_timestamps_round_trip(seconds):
+    assert parse_timestamp(format_timestamp(seconds)) == seconds
+
+def test_timestamp_formats():
+    assert format_timestamp(75) == "01:15"
+    assert parse_timestamp("1:02:03") == 3723
+
+@pytest.mark.parametrize("reply, timestamp", [("1:5", "01:05"), (" 00:45\n", "00:45"), ("about a minute", "00:45"), ("1:2:3", "00:45")])
+def test_model_durations_are_normalised(reply, timestamp):
+    assert TimeStamper.parse_duration(reply) == timestamp
@@ -0,0 +1,49 @@
+import json
+
+from services.screenplay_assembler import ScreenplayAssembler
+
+CHARACTERS = """## Maya Chen
+**Appearance:** Tall, cropped hair.
+**Motivation:** Clear her name.
+
+## Omar Reyes
+The harbour master."""
+
+def write_scene(story_dir, i: int, text: str):
+    path = story_dir / "scenes" / f"scene_{i:02d}.txt"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+def assemble(tmp_path) -> dict:
+    (tmp_path / "scenes").mkdir()
+    assembler = ScreenplayAssembler(tmp_path, "Tides", 1, CHARACTERS, "Maya returns home.")
+    # Out of order: scene 2 is held until scene 1 and the prompts arrive
+    assembler.add_scene(2, write_scene(tmp_path, 2, 'EXT. PIER - NIGHT\nOmar: "Late again."'), "00:30")
+    assert assembler.written == 0
+    assembler.add_prompts({1: "A lab at dawn", 2: "A pier at night"})
+    assembler.add_scene(1, write_scene(tmp_path, 1, "INT. LAB - DAY\nMaya packs."), "00:20", {"setting": "INT. LAB - DAY"})
+    assert assembler.written == 2
+    assembler.finish()
+    with open(tmp_path / "screenplay.json", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_export_has_the_prd_required_fields(tmp_path):
+    screenplay = assemble(tmp_path)
+    for key in ("title", "length_minutes", "characters", "plot", "scenes", "timestamps"):
+        assert key in screenplay
+    assert [c["name"] for c in screenplay["characters"]] == ["Maya Chen", "Omar Reyes"]
+    assert screenplay["characters"][0]["physical_description"] == "Tall, cropped hair."
+    assert screenplay["characters"][0]["motivations"] == "Clear her name."
+    assert screenplay["characters"][1]["physical_description"] == "The harbour master."
+    assert screenplay["plot"] == {"synopsis": "Maya returns home.", "major_events": []}
+    assert [(s["scene_number"], s["setting"]) for s in screenplay["scenes"]] == [
+        (1, "INT. LAB - DAY"), (2, "EXT. PIER - NIGHT")
+    ]
+    assert "characters_text" not in screenplay
+
+def test_export_carries_the_final_script_and_timeline(tmp_path):
+    screenplay = assemble(tmp_path)
+    assert screenplay["final_script_text"] == (tmp_path / "screenplay_package.txt").read_text(encoding="utf-8")
+    assert '"Late again."' in screenplay["final_script_text"]
+    assert [(t["start_time"], t["end_time"]) for t in screenplay["timestamps"]] == [("00:00", "00:20"), ("00:20", "00:50")]
+    assert screenplay["runtime"] == "00:50"
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from services.stage_graph import StageGraph
+
+def run(graph: StageGraph) -> dict:
+    return asyncio.run(graph.run())
+
+def test_tasks_get_their_inputs_in_declared_order():
+    graph = StageGraph(2)
+
+    async def value(v):
+        return v
+
+    async def join(*parts):
+        return "".join(parts)
+
+    graph.add("a", lambda: value("a"))
+    graph.add("b", lambda: value("b"))
+    graph.add("ab", join, ("b", "a"))
+    assert run(graph)["ab"] == "ba"
+
+def test_unknown_and_duplicate_tasks_are_rejected():
+    graph = StageGraph(1)
+
+    async def noop():
+        return None
+
+    graph.add("a", noop)
+    with pytest.raises(ValueError):
+        graph.add("a", noop)
+    with pytest.raises(ValueError):
+        graph.add("b", noop, ("missing",))
+
+def test_budgeted_tasks_respect_max_concurrency():
+    graph = StageGraph(2)
+    active = peak = 0
+
+    async def work():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    for i in range(6):
+        graph.add(f"call_{i}", work)
+    # Unbudgeted tasks do not take a slot
+    graph.add("local", work, budget=False)
+    run(graph)
+    assert peak == 3
+
+def test_deeper_ready_tasks_start_first():
+    graph = StageGraph(1)
+    order = []
+
+    def step(name):
+        async def call(*_):
+            order.append(name)
+            return name
+        return call
+
+    graph.add("outline", step("outline"))
+    graph.add("scene_1", step("scene_1"), ("outline",))
+    graph.add("scene_2", step("scene_2"), ("outline",))
+    graph.add("timestamp_1", step("timestamp_1"), ("scene_1",))
+    run(graph)
+    assert order == ["outline", "scene_1", "timestamp_1", "scene_2"]
+
+def test_tasks_added_while_running_are_run():
+    graph = StageGraph(2)
+
+    async def child(parent):
+        return parent + 1
+
+    async def parent():
+        graph.add("child", child, ("parent",))
+        return 1
+
+    graph.add("parent", parent)
+    assert run(graph)["child"] == 2
+    assert graph.tasks["child"].added_by == "parent"
+    assert [task.name for task in graph.critical_path()] == ["parent", "child"]
+
+def test_first_failure_cancels_the_rest():
+    graph = StageGraph(2)
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    graph.add("slow", slow)
+    graph.add("fail", fail)
+    with pytest.raises(RuntimeError, match="boom"):
+        run(graph)
+    assert cancelled.is_set()
+    assert "slow" not in graph.results
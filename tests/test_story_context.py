@@ -0,0 +1,67 @@
+from services.story_context import SceneContextBuilder, profile_fields, split_character_profiles
+
+NESTED_PROFILES = """# Character Profiles
+
+## Maya Chen
+A marine biologist who left academia after a scandal.
+
+### Strengths and Weaknesses
+Brilliant in a crisis, careless with people.
+
+### Fears
+Deep water at night.
+
+### Internal Conflict
+Wants to be trusted but keeps secrets.
+
+## Omar Reyes
+The harbour master who knows everyone's business.
+
+### Fears
+Losing the harbour to developers.
+"""
+
+FLAT_PROFILES = """**1. Maya Chen**
+**Background:** Marine biologist.
+**Personality:** Driven.
+
+**2. Omar Reyes**
+**Background:** Harbour master.
+"""
+
+def test_sub_headers_stay_inside_their_profile():
+    profiles = split_character_profiles(NESTED_PROFILES)
+    assert list(profiles) == ["Maya Chen", "Omar Reyes"]
+    assert "### Strengths and Weaknesses" in profiles["Maya Chen"]
+    assert "### Internal Conflict" in profiles["Maya Chen"]
+    assert "Deep water at night." in profiles["Maya Chen"]
+    assert profiles["Omar Reyes"].startswith("## Omar Reyes")
+    assert "Losing the harbour" in profiles["Omar Reyes"]
+    assert "Deep water" not in profiles["Omar Reyes"]
+
+def test_bold_headers_with_field_labels():
+    profiles = split_character_profiles(FLAT_PROFILES)
+    assert list(profiles) == ["Maya Chen", "Omar Reyes"]
+    assert "Driven." in profiles["Maya Chen"]
+
+def test_no_names_gives_no_profiles():
+    assert split_character_profiles("Just a paragraph about the cast.\n### Key Themes") == {}
+
+def test_scene_context_keeps_only_named_characters():
+    builder = SceneContextBuilder(NESTED_PROFILES, "Noir mood.")
+    assert builder.names_in("Maya dives under the pier at night.") == ["Maya Chen"]
+
+def test_profile_fields_map_labelled_sections():
+    profile = """## Maya Chen
+**Physical Description:** Tall, cropped hair.
+Wears a faded wetsuit.
+- Background: Left academia after a scandal.
+### Fears
+Deep water."""
+    assert profile_fields(profile) == {
+        "physical_description": "Tall, cropped hair. Wears a faded wetsuit.",
+        "history": "Left academia after a scandal."
+    }
+
+def test_profile_without_appearance_is_its_own_description():
+    assert profile_fields("## Omar Reyes\nThe **harbour** master.") == {"physical_description": "The harbour master."}
@@ -0,0 +1,39 @@
+import pytest
+
+from services.story_store import StoryStore, search_query
+
+def test_search_query_quotes_words_and_prefixes_the_last():
+    assert search_query("robot desert") == '"robot" "desert"*'
+    assert search_query('  "lab" OR NEAR(x) -- ') == '"lab" "OR" "NEAR" "x"*'
+    assert search_query("?!") is None
+
+@pytest.fixture
+def store(tmp_path):
+    store = StoryStore(str(tmp_path / "stories.db"))
+    for name, idea, plot in (
+        ("story_a", "A girl finds a robot in the desert", "The robot teaches her to read the stars."),
+        ("story_b", "A lighthouse keeper hears voices", "Storms bring a stranger to the island."),
+    ):
+        store.sync_story(tmp_path / name, {
+            "story_idea": idea, "length_minutes": 1, "stages": {"plot": plot, "scene_outlines": "robot robot robot"}
+        })
+    return store
+
+def test_search_matches_prefixes_and_skips_unsearched_stages(store):
+    results = store.search("rob")
+    assert sorted(hit["kind"] for hit in results) == ["idea", "plot"]
+    assert {hit["story_dir"].rsplit("/", 1)[-1] for hit in results} == {"story_a"}
+    assert all("**" in hit["snippet"] for hit in results)
+
+def test_search_filters_kinds_and_survives_operators(store):
+    assert [hit["kind"] for hit in store.search("stranger", kinds=["plot"])] == ["plot"]
+    assert store.search("stranger", kinds=["idea"]) == []
+    # OR is searched as a word, not parsed as an operator, so this does not match both plots
+    assert store.search('stranger" OR "robot') == []
+    assert len(store.search("desert (")) == 1
+
+def test_deleting_a_story_removes_it_from_the_index(store, tmp_path):
+    store.delete_story(tmp_path / "story_a")
+    assert store.search("robot") == []
+    store.reindex()
+    assert [hit["kind"] for hit in store.search("lighthouse")] == ["idea"]